@@ -0,0 +1,271 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+from configuracoes import (
+    COLUNA_PACIENTE, COLUNA_PROCEDIMENTO, COLUNA_STATUS,
+    STATUS_PRESENTE, STATUS_FALTOU, STATUS_CANCELADO,
+)
+
+# Posição de cada status nas contagens. Qualquer outro status (ex: 'Agendado')
+# cai na última posição, que não entra em nenhum total.
+ORDEM_STATUS = [STATUS_PRESENTE, STATUS_FALTOU, STATUS_CANCELADO]
+POSICAO_OUTROS = len(ORDEM_STATUS)
+
+
+@dataclass
+class IndiceAgregado:
+    """
+    Resultado de uma única passada sobre o DataFrame limpo.
+
+    As linhas ficam agrupadas por paciente e, dentro de cada paciente, por
+    procedimento (na ordem em que aparecem na planilha). Cada par
+    (paciente, procedimento) guarda onde começam suas linhas e as contagens
+    de presenças, faltas, cancelados e outros status.
+    """
+    pacientes: pd.Index           # pacientes na ordem de primeira aparição
+    procedimentos: pd.Index       # procedimentos na ordem de primeira aparição
+    ordem_linhas: np.ndarray      # posições (iloc) das linhas, já agrupadas
+    par_procedimento: np.ndarray  # código do procedimento de cada par
+    par_inicio: np.ndarray        # início de cada par em 'ordem_linhas' (+ fim)
+    paciente_inicio: np.ndarray   # primeiro par de cada paciente (+ fim)
+    contagens: np.ndarray         # (n_pares, 4): presenças, faltas, cancelados, outros
+    totais: np.ndarray            # (4,): presenças, faltas, cancelados, outros de todas as linhas
+    status: pd.Index              # todos os status distintos da coluna Status
+    contagens_status: np.ndarray  # (n_pares, n_status): contagem de cada status por par
+    # Linhas com paciente mas sem procedimento (e vice-versa) não formam par,
+    # mas entram nos resumos por paciente/procedimento do relatório consolidado.
+    avulsas_paciente: np.ndarray       # (n_pacientes, n_status)
+    avulsas_procedimento: np.ndarray   # (n_procedimentos, n_status)
+
+    def __post_init__(self):
+        self._codigo_paciente = {nome: i for i, nome in enumerate(self.pacientes)}
+
+    def linhas_do_paciente(self, nome_do_paciente):
+        """Posições (iloc) de todas as linhas do paciente, agrupadas por procedimento."""
+        codigo = self._codigo_paciente.get(nome_do_paciente)
+        if codigo is None:
+            return self.ordem_linhas[:0]
+        inicio = self.par_inicio[self.paciente_inicio[codigo]]
+        fim = self.par_inicio[self.paciente_inicio[codigo + 1]]
+        return self.ordem_linhas[inicio:fim]
+
+    def fatias_do_paciente(self, nome_do_paciente):
+        """
+        Devolve uma lista de (procedimento, posições das linhas, presenças,
+        faltas, cancelados) para o paciente, ou lista vazia se ele não existir.
+        """
+        codigo = self._codigo_paciente.get(nome_do_paciente)
+        if codigo is None:
+            return []
+
+        fatias = []
+        for par in range(self.paciente_inicio[codigo], self.paciente_inicio[codigo + 1]):
+            linhas = self.ordem_linhas[self.par_inicio[par]:self.par_inicio[par + 1]]
+            presencas, faltas, cancelados = self.contagens[par, :POSICAO_OUTROS]
+            procedimento = self.procedimentos[self.par_procedimento[par]]
+            fatias.append((procedimento, linhas, presencas, faltas, cancelados))
+        return fatias
+
+
+def taxa_de_falta(presencas, faltas):
+    """Faltas sobre as consultas válidas (presenças + faltas), em %, como nos kits."""
+    total_valido = presencas + faltas
+    return (faltas / total_valido) * 100 if total_valido > 0 else 0
+
+
+def resumo_do_paciente(indice, nome_do_paciente):
+    """
+    Os números do kit do paciente (por procedimento e no total) como
+    dicionário, sem gerar arquivos. Devolve None se o paciente não existir.
+    """
+    fatias = indice.fatias_do_paciente(nome_do_paciente)
+    if not fatias:
+        return None
+
+    procedimentos = []
+    for procedimento, linhas, presencas, faltas, cancelados in fatias:
+        procedimentos.append({
+            'procedimento': str(procedimento),
+            'consultas': len(linhas),
+            'presencas': int(presencas),
+            'faltas': int(faltas),
+            'cancelados': int(cancelados),
+            'taxa_falta_pct': round(taxa_de_falta(int(presencas), int(faltas)), 2),
+        })
+    total = {chave: sum(p[chave] for p in procedimentos)
+             for chave in ('consultas', 'presencas', 'faltas', 'cancelados')}
+    return {
+        'paciente': str(nome_do_paciente),
+        **total,
+        'taxa_falta_pct': round(taxa_de_falta(total['presencas'], total['faltas']), 2),
+        'procedimentos': procedimentos,
+    }
+
+
+def codificar_categorias(serie):
+    """
+    Devolve (códigos, valores) da coluna, com -1 para vazios, como pd.factorize.
+    Em colunas categóricas (como as do arquivo .arrow) os códigos já existem e
+    são só reaproveitados, sem comparar nem hashear textos; categorias sem
+    nenhuma linha ficam de fora.
+    """
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return pd.factorize(serie)
+
+    codigos = serie.cat.codes.to_numpy().astype(np.int64)
+    categorias = serie.cat.categories
+    if len(categorias) == 0:
+        return codigos, categorias
+    usadas = np.bincount(codigos[codigos >= 0], minlength=len(categorias)) > 0
+    novo_codigo = np.cumsum(usadas) - 1
+    return np.where(codigos >= 0, novo_codigo[codigos], -1), categorias[usadas]
+
+
+def codificar_status(serie_status):
+    """
+    Converte a coluna de status na posição usada em 'ORDEM_STATUS'. A
+    comparação com os apelidos é feita uma vez por valor distinto, e não
+    uma vez por linha.
+    """
+    return _posicoes_status(*codificar_categorias(serie_status))
+
+
+def _posicoes_status(codigos, valores):
+    tabela = np.array(
+        [ORDEM_STATUS.index(v) if v in ORDEM_STATUS else POSICAO_OUTROS for v in valores] + [POSICAO_OUTROS],
+        dtype=np.int64,
+    )
+    # Código -1 (status vazio) cai na última posição da tabela, a de 'outros'.
+    return tabela[codigos]
+
+
+def contar_status(serie_status):
+    """Presenças, faltas e cancelados da coluna inteira, por contagem dos códigos."""
+    contagens = np.bincount(codificar_status(serie_status), minlength=POSICAO_OUTROS + 1)
+    return contagens[0], contagens[1], contagens[2]
+
+
+def tabela_cruzada(df, coluna):
+    """
+    Equivalente a df.groupby([coluna, COLUNA_STATUS]).size().unstack(fill_value=0),
+    mas contando os códigos inteiros com bincount: linhas e colunas em ordem
+    alfabética e só com os valores que aparecem.
+    """
+    codigo_linha, valores_linha = codificar_categorias(df[coluna])
+    codigo_status, valores_status = codificar_categorias(df[COLUNA_STATUS])
+    contagens = _contar_pares(codigo_linha, len(valores_linha), codigo_status, len(valores_status))
+    return _tabela_ordenada(contagens, valores_linha, valores_status, coluna)
+
+
+def _contar_pares(codigo_linha, n_linhas, codigo_status, n_status):
+    """Matriz (n_linhas, n_status) de contagens, ignorando códigos -1."""
+    validas = (codigo_linha >= 0) & (codigo_status >= 0)
+    largura = max(n_status, 1)
+    return np.bincount(
+        codigo_linha[validas] * largura + codigo_status[validas],
+        minlength=n_linhas * largura,
+    ).reshape(n_linhas, largura)[:, :n_status]
+
+
+def _tabela_ordenada(contagens, valores_linha, valores_status, coluna):
+    """Monta a tabela cruzada com linhas e colunas em ordem alfabética, sem as vazias."""
+    valores_linha = pd.Index(valores_linha, name=coluna)
+    valores_status = pd.Index(valores_status, name=COLUNA_STATUS)
+    ordem_linhas = valores_linha.argsort()
+    ordem_status = valores_status.argsort()
+    contagens = contagens[ordem_linhas][:, ordem_status]
+    com_linhas = contagens.sum(axis=1) > 0
+    com_status = contagens.sum(axis=0) > 0
+
+    return pd.DataFrame(
+        contagens[com_linhas][:, com_status],
+        index=valores_linha.take(ordem_linhas)[com_linhas],
+        columns=valores_status.take(ordem_status)[com_status],
+    )
+
+
+def tabelas_do_indice(indice):
+    """
+    Os mesmos resumos de tabela_cruzada(df, COLUNA_PACIENTE) e
+    tabela_cruzada(df, COLUNA_PROCEDIMENTO), somados a partir das contagens
+    do índice, sem passar pelo DataFrame de novo.
+    """
+    par_paciente = np.repeat(np.arange(len(indice.pacientes)), np.diff(indice.paciente_inicio))
+
+    por_paciente = indice.avulsas_paciente.copy()
+    np.add.at(por_paciente, par_paciente, indice.contagens_status)
+    por_procedimento = indice.avulsas_procedimento.copy()
+    np.add.at(por_procedimento, indice.par_procedimento, indice.contagens_status)
+
+    return (
+        _tabela_ordenada(por_paciente, indice.pacientes, indice.status, COLUNA_PACIENTE),
+        _tabela_ordenada(por_procedimento, indice.procedimentos, indice.status, COLUNA_PROCEDIMENTO),
+    )
+
+
+def construir_indice(df):
+    """
+    Agrupa o DataFrame por (Paciente, Procedimento, Status) em uma só passada.
+
+    Linhas sem paciente ou sem procedimento ficam de fora dos pares, como já
+    acontecia na busca por nome; elas só entram nos resumos de tabelas_do_indice.
+    """
+    codigo_paciente, pacientes = codificar_categorias(df[COLUNA_PACIENTE])
+    codigo_procedimento, procedimentos = codificar_categorias(df[COLUNA_PROCEDIMENTO])
+    codigo_status_original, status = codificar_categorias(df[COLUNA_STATUS])
+    codigo_status = _posicoes_status(codigo_status_original, status)
+    totais = np.bincount(codigo_status, minlength=POSICAO_OUTROS + 1)
+
+    sem_procedimento = codigo_procedimento < 0
+    sem_paciente = codigo_paciente < 0
+    avulsas_paciente = _contar_pares(np.where(sem_procedimento, codigo_paciente, -1), len(pacientes),
+                                     codigo_status_original, len(status))
+    avulsas_procedimento = _contar_pares(np.where(sem_paciente, codigo_procedimento, -1), len(procedimentos),
+                                         codigo_status_original, len(status))
+
+    validas = np.flatnonzero(~sem_paciente & ~sem_procedimento)
+    codigo_paciente = codigo_paciente[validas]
+    codigo_procedimento = codigo_procedimento[validas]
+    codigo_status = codigo_status[validas]
+    codigo_status_original = codigo_status_original[validas]
+
+    # Cada par (paciente, procedimento) recebe um código na ordem de primeira
+    # aparição, o que preserva a ordem dos procedimentos dentro do paciente.
+    chave_par = codigo_paciente.astype(np.int64) * max(len(procedimentos), 1) + codigo_procedimento
+    codigo_par, pares = pd.factorize(chave_par)
+    n_pares = len(pares)
+    par_paciente = pares // max(len(procedimentos), 1)
+    par_procedimento = pares % max(len(procedimentos), 1)
+
+    # Ordenação estável: paciente, depois par, depois a ordem original.
+    ordem = np.lexsort((codigo_par, codigo_paciente))
+    ordem_linhas = validas[ordem]
+
+    # Pares na mesma ordem em que aparecem em 'ordem_linhas'.
+    sequencia_pares = np.lexsort((np.arange(n_pares), par_paciente))
+    linhas_por_par = np.bincount(codigo_par, minlength=n_pares)[sequencia_pares]
+    par_inicio = np.concatenate(([0], np.cumsum(linhas_por_par)))
+
+    pares_por_paciente = np.bincount(par_paciente, minlength=len(pacientes))
+    paciente_inicio = np.concatenate(([0], np.cumsum(pares_por_paciente)))
+
+    largura = POSICAO_OUTROS + 1
+    contagens = np.bincount(codigo_par * largura + codigo_status, minlength=n_pares * largura)
+    contagens = contagens.reshape(n_pares, largura)[sequencia_pares]
+    contagens_status = _contar_pares(codigo_par, n_pares, codigo_status_original, len(status))[sequencia_pares]
+
+    return IndiceAgregado(
+        pacientes=pacientes,
+        procedimentos=procedimentos,
+        ordem_linhas=ordem_linhas,
+        par_procedimento=par_procedimento[sequencia_pares],
+        par_inicio=par_inicio,
+        paciente_inicio=paciente_inicio,
+        contagens=contagens,
+        totais=totais,
+        status=status,
+        contagens_status=contagens_status,
+        avulsas_paciente=avulsas_paciente,
+        avulsas_procedimento=avulsas_procedimento,
+    )
@@ -1,55 +1,105 @@
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 import os
 import re
+import argparse
+import hashlib
+import shutil
+
+from configuracoes import (
+    ARQUIVO_ENTRADA_LIMPO, ARQUIVO_HISTORICO, PASTA_RELATORIOS, PASTA_GRAFICOS,
+    COLUNA_PACIENTE, COLUNA_STATUS, COLUNA_PROCEDIMENTO,
+    STATUS_FALTOU, STATUS_PRESENTE, STATUS_CANCELADO,
+)
+from agregacao import construir_indice, tabelas_do_indice
+from carregamento import carregar_dados_limpos
+from historico import HistoricoConsultas
+from duplicados import COLUNAS_DUPLICADOS, possiveis_duplicados, duplicados_por_paciente, texto_aviso_duplicados
+from paralelo import gerar_kits_em_paralelo
+from manifesto import (
+    OPCOES_PADRAO, calcular_manifesto, carregar_manifesto, salvar_manifesto, comparar_manifestos, opcoes_alteradas,
+)
+from graficos import MODOS_GRAFICOS, DPI_PADRAO
+from exportacao_excel import MODOS_EXCEL, salvar_planilhas
+from painel_html import ARQUIVO_PAINEL, salvar_painel_html
+from saidas import MODOS_SAIDA, ARQUIVO_PACOTE, ARQUIVO_INDICE_PACOTE, PacoteZip, criar_saida
+from instrumentacao import (
+    ARQUIVO_METRICAS, Subtotais, medir_etapa, ativar_metricas, iniciar_perfil, encerrar_perfil,
+)
+
+CARACTERES_PROIBIDOS = r'[\\/*?:"<>|]'
+
+# Versão da regra de nome das pastas dos pacientes, gravada no manifesto dos
+# kits: quando ela muda, o modo incremental apaga as pastas com os nomes antigos.
+VERSAO_NOMES_PASTAS = 2
+
+def nome_pasta_paciente(nome_do_paciente, versao=VERSAO_NOMES_PASTAS):
+    """
+    Nome da pasta do kit: o nome em minúsculas, com '_' no lugar dos espaços.
+    Se isso não identificar o paciente sozinho (o nome já tem '_', tem
+    caracteres que não podem ir no nome de uma pasta ou termina em ponto, que
+    o Windows descarta), um trecho do hash do nome é acrescentado, para que
+    dois pacientes nunca dividam a mesma pasta. A 'versao' 1 é a regra
+    anterior ao hash, usada só para achar as pastas antigas.
+    """
+    nome = str(nome_do_paciente)
+    if versao == 1:
+        return nome.lower().replace(' ', '_')
+    pasta = re.sub(CARACTERES_PROIBIDOS, "", nome).lower().replace(' ', '_')
+    if '_' in nome or pasta != nome.lower().replace(' ', '_') or not pasta or pasta.endswith('.'):
+        pasta = f"{pasta}_{hashlib.sha1(nome.encode('utf-8')).hexdigest()[:8]}"
+    return pasta
 
-# --- CONFIGURAÇÕES DA ANÁLISE ---
-ARQUIVO_ENTRADA_LIMPO = 'dados_limpos.xlsx'
-
-# Nomes das colunas
-COLUNA_PACIENTE = 'Paciente'
-COLUNA_STATUS = 'Status'
-COLUNA_PROCEDIMENTO = 'Procedimento'
-
-# Apelidos para cada status
-STATUS_FALTOU = 'Ncompareceu'
-STATUS_PRESENTE = 'Finalizado'
-STATUS_CANCELADO = 'Cancelado'
+def nome_arquivo_procedimento(procedimento):
+    return re.sub(CARACTERES_PROIBIDOS,"", procedimento).lower().replace(' ', '_')
 
 # --- FUNÇÃO PARA RELATÓRIOS INDIVIDUAIS (ORIGINAL) ---
-def gerar_relatorios_completos(df, nome_do_paciente):
+def gerar_relatorios_completos(df, nome_do_paciente, indice=None, procedimentos_alterados=None,
+                               modo_graficos='png', dpi=DPI_PADRAO, modo_excel='por_procedimento',
+                               pasta_relatorios=PASTA_RELATORIOS, pasta_graficos=PASTA_GRAFICOS,
+                               modo_saida='pastas', duplicados=None):
     """
     Função que gera um kit completo de relatórios para um paciente específico.
+
+    Quando 'indice' (de agregacao.construir_indice) é informado, as linhas e as
+    contagens de cada procedimento vêm dele, sem varrer o DataFrame de novo.
+    Se 'procedimentos_alterados' for informado, só esses procedimentos têm
+    .txt/.xlsx/.png refeitos; o resumo da chefia é sempre reescrito.
+    'modo_graficos' é um de graficos.MODOS_GRAFICOS e 'modo_excel' um de
+    exportacao_excel.MODOS_EXCEL. O kit é gravado numa subpasta do paciente
+    dentro de 'pasta_relatorios' e 'pasta_graficos'; com modo_saida='zip'
+    nada é gravado e os arquivos do kit são devolvidos como lista de
+    (caminho no pacote, bytes), para saidas.PacoteZip.
+    'duplicados' ({paciente: [(nome parecido, semelhança %)]}, ver
+    duplicados.py) acrescenta ao resumo da chefia o aviso de possível
+    cadastro duplicado.
     """
     print(f"\n🔎 --- GERANDO KIT COMPLETO DE RELATÓRIOS PARA: {nome_do_paciente} --- 🔎")
+    subtotais = Subtotais()
     
     # 1. PREPARAÇÃO
-    df_paciente = df[df[COLUNA_PACIENTE] == nome_do_paciente].copy()
+    if indice is None:
+        df = df[df[COLUNA_PACIENTE] == nome_do_paciente]
+        indice = construir_indice(df)
+    fatias_procedimentos = indice.fatias_do_paciente(nome_do_paciente)
 
-    if df_paciente.empty:
+    if not fatias_procedimentos:
         print(f"Paciente '{nome_do_paciente}' não encontrado.")
         return
 
-    nome_pasta_paciente = nome_do_paciente.lower().replace(' ', '_')
-    caminho_pasta_relatorios = os.path.join('..', 'relatorios', nome_pasta_paciente)
-    caminho_pasta_graficos = os.path.join('..', 'graficos', nome_pasta_paciente)
-    os.makedirs(caminho_pasta_relatorios, exist_ok=True)
-    os.makedirs(caminho_pasta_graficos, exist_ok=True)
-    
-    procedimentos_unicos = df_paciente[COLUNA_PROCEDIMENTO].unique()
+    pasta_paciente = nome_pasta_paciente(nome_do_paciente)
+    saida = criar_saida(modo_saida, pasta_relatorios, pasta_graficos)
+    saida.preparar(pasta_paciente)
     
     resumos_para_chefia = []
+    abas_do_paciente = []
     total_presencas_geral = 0
     total_faltas_geral = 0
     total_cancelados_geral = 0
 
     # 2. LOOP POR PROCEDIMENTO
-    for procedimento in procedimentos_unicos:
-        df_procedimento = df_paciente[df_paciente[COLUNA_PROCEDIMENTO] == procedimento]
-
-        presencas = (df_procedimento[COLUNA_STATUS] == STATUS_PRESENTE).sum()
-        faltas = (df_procedimento[COLUNA_STATUS] == STATUS_FALTOU).sum()
-        cancelados = (df_procedimento[COLUNA_STATUS] == STATUS_CANCELADO).sum()
+    for procedimento, linhas, presencas, faltas, cancelados in fatias_procedimentos:
+        df_procedimento = df.iloc[linhas]
         total_valido = presencas + faltas
         taxa_de_falta = (faltas / total_valido) * 100 if total_valido > 0 else 0
 
@@ -69,27 +119,35 @@ Consultas canceladas: {cancelados}
 📊 Taxa de Falta (sobre consultas válidas): {taxa_de_falta:.2f}%
 """
         resumos_para_chefia.append(texto_relatorio_procedimento)
+        if modo_excel == 'por_paciente':
+            abas_do_paciente.append((procedimento, df_procedimento, False))
 
-        nome_arquivo_base = re.sub(r'[\\/*?:"<>|]',"", procedimento).lower().replace(' ', '_')
+        if procedimentos_alterados is not None and str(procedimento) not in procedimentos_alterados:
+            continue
+
+        nome_arquivo_base = nome_arquivo_procedimento(procedimento)
         
         try:
-            caminho_txt = os.path.join(caminho_pasta_relatorios, f'relatorio_{nome_arquivo_base}.txt')
-            with open(caminho_txt, 'w', encoding='utf-8') as f:
-                f.write(texto_relatorio_procedimento.strip())
+            with subtotais.medir('txt'):
+                saida.texto(pasta_paciente, f'relatorio_{nome_arquivo_base}.txt', texto_relatorio_procedimento.strip())
         except Exception as e:
             print(f"     [ERRO] Falha ao salvar .txt: {e}")
 
-        caminho_excel = os.path.join(caminho_pasta_relatorios, f'relatorio_{nome_arquivo_base}.xlsx')
-        df_procedimento.to_excel(caminho_excel, index=False, engine='openpyxl')
+        if modo_excel == 'por_procedimento':
+            with subtotais.medir('excel'):
+                saida.planilhas(pasta_paciente, f'relatorio_{nome_arquivo_base}.xlsx', [('Sheet1', df_procedimento, False)])
 
         if total_valido > 0:
-            caminho_grafico = os.path.join(caminho_pasta_graficos, f'grafico_{nome_arquivo_base}.png')
-            fig, ax = plt.subplots()
-            ax.pie([presencas, faltas, cancelados], labels=['Presenças', 'Faltas', 'Cancelados'], colors=['#2E8B57', '#DC143C', '#A9A9A9'], autopct='%1.1f%%', startangle=90)
-            ax.axis('equal')
-            plt.title(f'Resumo de: {procedimento}\nPaciente: {nome_do_paciente}')
-            plt.savefig(caminho_grafico)
-            plt.close(fig)
+            with subtotais.medir('grafico'):
+                saida.grafico_pizza(
+                    pasta_paciente, nome_arquivo_base, [presencas, faltas, cancelados],
+                    f'Resumo de: {procedimento}\nPaciente: {nome_do_paciente}', modo_graficos, dpi,
+                )
+
+    # Planilha única do paciente, com uma aba por procedimento
+    if abas_do_paciente:
+        with subtotais.medir('excel'):
+            saida.planilhas(pasta_paciente, f'relatorio_procedimentos_{pasta_paciente}.xlsx', abas_do_paciente)
 
     # 3. GERAÇÃO DO RELATÓRIO MESTRE PARA A CHEFIA (DO PACIENTE)
     total_valido_geral = total_presencas_geral + total_faltas_geral
@@ -113,47 +171,105 @@ Consultas canceladas: {total_cancelados_geral}
 --- DETALHAMENTO POR PROCEDIMENTO ---
 """
     texto_chefe_final = texto_chefe_cabecalho + "\n".join(resumos_para_chefia)
+    if duplicados and str(nome_do_paciente) in duplicados:
+        texto_chefe_final += "\n" + texto_aviso_duplicados(duplicados[str(nome_do_paciente)])
     
     try:
-        nome_arquivo_seguro = nome_do_paciente.lower().replace(' ', '_')
-        caminho_chefe_txt = os.path.join(caminho_pasta_relatorios, f'resumo_chefe_{nome_arquivo_seguro}.txt')
-        with open(caminho_chefe_txt, 'w', encoding='utf-8') as f:
-            f.write(texto_chefe_final.strip())
+        with subtotais.medir('txt'):
+            caminho_chefe_txt = saida.texto(pasta_paciente, f'resumo_chefe_{pasta_paciente}.txt', texto_chefe_final.strip())
         print(f"\n✅ Relatório para a chefia salvo com sucesso em: '{caminho_chefe_txt}'")
     except Exception as e:
         print(f"\n[ERRO] Falha ao salvar relatório da chefia: {e}")
 
+    subtotais.registrar('kit', paciente=str(nome_do_paciente), procedimentos=len(fatias_procedimentos),
+                        linhas=int(sum(len(linhas) for _, linhas, *_ in fatias_procedimentos)))
+    return saida.artefatos
+
 
 # --- FUNÇÃO PARA RELATÓRIO GERAL (COM TODAS AS MELHORIAS) ---
-def gerar_relatorio_geral_consolidado(df):
+def centralizar(textos, largura):
+    """Versão vetorizada de f"{texto:^largura}" (a sobra vai para a direita)."""
+    esquerda = (largura - textos.str.len()).clip(lower=0) // 2
+    return (pd.Series(' ', index=textos.index).str.repeat(esquerda) + textos).str.ljust(largura)
+
+def linhas_da_tabela(df_resumo):
+    """
+    Monta, de uma vez para a tabela toda, as linhas de largura fixa do
+    relatório consolidado: nome truncado em 39 caracteres, faltas, presenças
+    e taxa de falta. Os números saem como float (ex: '6.0'), como sempre saíram.
+    """
+    if df_resumo.empty:
+        return []
+    nomes = pd.Series(df_resumo.index.astype(str), index=df_resumo.index).str[:39].str.ljust(40)
+    faltas = centralizar(df_resumo[STATUS_FALTOU].astype('float64').astype(str), 10)
+    presencas = centralizar(df_resumo[STATUS_PRESENTE].astype('float64').astype(str), 11)
+    taxas = centralizar(pd.Series(np.char.mod('%.1f%%', df_resumo['Taxa_Falta_%'].to_numpy(dtype='float64')),
+                                  index=df_resumo.index), 15)
+    return (nomes + ' | ' + faltas + ' | ' + presencas + ' | ' + taxas + '\n').tolist()
+
+def escrever_texto_em_blocos(caminho, blocos):
+    """
+    Grava uma sequência de listas de trechos de texto num arquivo com buffer,
+    sem concatenar tudo numa string só. Espaços e quebras de linha do fim do
+    último trecho são removidos, como o antigo texto.strip().
+    """
+    trechos = [trecho for bloco in blocos for trecho in bloco]
+    with open(caminho, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+        if trechos:
+            f.writelines(trechos[:-1])
+            f.write(trechos[-1].rstrip())
+
+def gerar_relatorio_geral_consolidado(df, indice=None, pasta_relatorios=PASTA_RELATORIOS, historico=None,
+                                      duplicados=None, painel=False):
     """
     Gera um relatório consolidado com a análise de todos os pacientes.
     Cria um relatório .txt formatado para fácil leitura pela gestão.
+
+    Se 'indice' (de agregacao.construir_indice) já tiver sido calculado para
+    os kits, os resumos saem das contagens dele. Com 'historico' (um
+    historico.HistoricoConsultas), 'df' pode ser None: as contagens são feitas
+    pelo SQLite e a aba Dados_Completos é gravada direto do cursor.
+    Os pacientes com nomes muito parecidos ('duplicados', de
+    procurar_duplicados, ou procurados aqui) ganham uma seção e uma aba.
+    Com 'painel', grava também um .html interativo (painel_html) com os
+    mesmos resumos, sem gerar gráficos por paciente.
+    Devolve True se o .txt e o .xlsx (e o painel, se pedido) foram salvos.
     """
     print("\n🔎 --- GERANDO RELATÓRIO GERAL CONSOLIDADO (TODOS OS PACIENTES) --- 🔎")
+    subtotais = Subtotais()
 
     # 1. PREPARAÇÃO DOS CAMINHOS
-    caminho_pasta_relatorios = os.path.join('..', 'relatorios', 'FALTAS_TOTAIS_PACIENTES')
+    caminho_pasta_relatorios = os.path.join(pasta_relatorios, 'FALTAS_TOTAIS_PACIENTES')
     os.makedirs(caminho_pasta_relatorios, exist_ok=True)
     
     # 2. CÁLCULO GERAL
-    total_presencas = (df[COLUNA_STATUS] == STATUS_PRESENTE).sum()
-    total_faltas = (df[COLUNA_STATUS] == STATUS_FALTOU).sum()
-    total_cancelados = (df[COLUNA_STATUS] == STATUS_CANCELADO).sum()
+    with subtotais.medir('agregacao'):
+        if historico is not None:
+            df_pacientes, df_procedimentos = historico.tabelas()
+            total_presencas, total_faltas, total_cancelados = historico.totais()
+            total_linhas = historico.contar()
+            dados_completos = historico.dados_completos()
+        else:
+            if indice is None:
+                indice = construir_indice(df)
+            df_pacientes, df_procedimentos = tabelas_do_indice(indice)
+            total_presencas, total_faltas, total_cancelados = (int(total) for total in indice.totais[:3])
+            total_linhas = len(df)
+            dados_completos = df
     total_valido = total_presencas + total_faltas
     taxa_falta_geral = (total_faltas / total_valido) * 100 if total_valido > 0 else 0
 
     # 3. ANÁLISE POR PACIENTE
-    df_pacientes = df.groupby([COLUNA_PACIENTE, COLUNA_STATUS]).size().unstack(fill_value=0)
     for status in [STATUS_PRESENTE, STATUS_FALTOU, STATUS_CANCELADO]:
         if status not in df_pacientes.columns:
             df_pacientes[status] = 0
     df_pacientes['Total_Valido'] = df_pacientes[STATUS_PRESENTE] + df_pacientes[STATUS_FALTOU]
     df_pacientes['Taxa_Falta_%'] = (df_pacientes[STATUS_FALTOU] / df_pacientes['Total_Valido'] * 100).fillna(0)
     df_pacientes = df_pacientes.sort_values(by=STATUS_FALTOU, ascending=False)
+    if duplicados is None:
+        duplicados = procurar_duplicados(df_pacientes.index)
 
     # 4. ANÁLISE POR PROCEDIMENTO
-    df_procedimentos = df.groupby([COLUNA_PROCEDIMENTO, COLUNA_STATUS]).size().unstack(fill_value=0)
     for status in [STATUS_PRESENTE, STATUS_FALTOU, STATUS_CANCELADO]:
         if status not in df_procedimentos.columns:
             df_procedimentos[status] = 0
@@ -168,24 +284,15 @@ def gerar_relatorio_geral_consolidado(df):
     header_pac = f"{'PACIENTE':<40} | {'FALTAS':^10} | {'PRESENÇAS':^11} | {'TAXA DE FALTA':^15}\n"
     separator_pac = f"{'-'*40}+{'-'*12}+{'-'*13}+{'-'*17}\n"
     texto_desempenho_pacientes += header_pac + separator_pac
-    for nome, row in df_pacientes.iterrows():
-        nome_paciente_trunc = str(nome)[:39]
-        linha = f"{nome_paciente_trunc:<40} | {row[STATUS_FALTOU]:^10} | {row[STATUS_PRESENTE]:^11} | {f'{row["Taxa_Falta_%"]:.1f}%':^15}\n"
-        texto_desempenho_pacientes += linha
 
     # Bloco de Análise por Procedimento
     texto_analise_procedimentos = "--- ANÁLISE POR PROCEDIMENTO (ORDENADO POR TAXA DE FALTA) ---\n\n"
     header_proc = f"{'PROCEDIMENTO':<40} | {'FALTAS':^10} | {'PRESENÇAS':^11} | {'TAXA DE FALTA':^15}\n"
     separator_proc = f"{'-'*40}+{'-'*12}+{'-'*13}+{'-'*17}\n"
     texto_analise_procedimentos += header_proc + separator_proc
-    for nome, row in df_procedimentos.iterrows():
-        nome_proc_trunc = str(nome)[:39]
-        linha = f"{nome_proc_trunc:<40} | {row[STATUS_FALTOU]:^10} | {row[STATUS_PRESENTE]:^11} | {f'{row["Taxa_Falta_%"]:.1f}%':^15}\n"
-        texto_analise_procedimentos += linha
         
-    # Montagem do texto final
-    texto_relatorio_geral = f"""
-=====================================================
+    # Montagem do texto final (as linhas das tabelas entram na gravação)
+    texto_cabecalho_geral = f"""=====================================================
     RELATÓRIO CONSOLIDADO GERAL PARA A CHEFIA
 =====================================================
 Data da Geração: {pd.Timestamp.now().strftime('%d/%m/%Y %H:%M')}
@@ -198,67 +305,292 @@ Consultas canceladas: {total_cancelados}
 📊 Taxa de Falta GERAL (sobre consultas válidas): {taxa_falta_geral:.2f}%
 =====================================================
 
-{texto_desempenho_pacientes}
-=====================================================
-
-{texto_analise_procedimentos}
 """
+    blocos_relatorio_geral = [
+        [texto_cabecalho_geral, texto_desempenho_pacientes],
+        linhas_da_tabela(df_pacientes),
+        ["\n=====================================================\n\n", texto_analise_procedimentos],
+        linhas_da_tabela(df_procedimentos),
+    ]
+    if len(duplicados):
+        blocos_relatorio_geral.append([
+            "\n=====================================================\n\n",
+            "--- POSSÍVEIS CADASTROS DUPLICADOS (NOMES MUITO PARECIDOS) ---\n\n",
+            f"{'PACIENTE':<40} | {'PARECIDO COM':<40} | {'SEMELHANÇA':^10}\n",
+            f"{'-'*40}+{'-'*42}+{'-'*12}\n",
+        ])
+        blocos_relatorio_geral.append([
+            f"{str(nome_a)[:39]:<40} | {str(nome_b)[:39]:<40} | {f'{semelhanca:.1f}%':^10}\n"
+            for nome_a, nome_b, semelhanca in duplicados[COLUNAS_DUPLICADOS].itertuples(index=False)
+        ])
     
+    sucesso = True
     try:
         caminho_txt_geral = os.path.join(caminho_pasta_relatorios, 'relatorio_consolidado_geral.txt')
-        with open(caminho_txt_geral, 'w', encoding='utf-8') as f:
-            f.write(texto_relatorio_geral.strip())
+        with subtotais.medir('txt'):
+            escrever_texto_em_blocos(caminho_txt_geral, blocos_relatorio_geral)
         print(f"\n✅ Relatório .txt consolidado e formatado salvo com sucesso em: '{caminho_txt_geral}'")
     except Exception as e:
         print(f"\n[ERRO] Falha ao salvar relatório .txt consolidado: {e}")
+        sucesso = False
 
     # 6. GERAÇÃO DO EXCEL (.xlsx)
     try:
         caminho_excel_geral = os.path.join(caminho_pasta_relatorios, 'relatorio_consolidado_completo.xlsx')
-        with pd.ExcelWriter(caminho_excel_geral, engine='openpyxl') as writer:
-            df_pacientes_excel = df_pacientes.rename(columns={
-                STATUS_FALTOU: 'Faltas',
-                STATUS_PRESENTE: 'Presenças',
-                STATUS_CANCELADO: 'Cancelados'
-            })
-            df_procedimentos_excel = df_procedimentos.rename(columns={
-                STATUS_FALTOU: 'Faltas',
-                STATUS_PRESENTE: 'Presenças',
-                STATUS_CANCELADO: 'Cancelados'
-            })
-            df_pacientes_excel.to_excel(writer, sheet_name='Resumo_por_Paciente')
-            df_procedimentos_excel.to_excel(writer, sheet_name='Resumo_por_Procedimento')
-            df.to_excel(writer, sheet_name='Dados_Completos', index=False)
+        df_pacientes_excel = df_pacientes.rename(columns={
+            STATUS_FALTOU: 'Faltas',
+            STATUS_PRESENTE: 'Presenças',
+            STATUS_CANCELADO: 'Cancelados'
+        })
+        df_procedimentos_excel = df_procedimentos.rename(columns={
+            STATUS_FALTOU: 'Faltas',
+            STATUS_PRESENTE: 'Presenças',
+            STATUS_CANCELADO: 'Cancelados'
+        })
+        abas = [
+            ('Resumo_por_Paciente', df_pacientes_excel, True),
+            ('Resumo_por_Procedimento', df_procedimentos_excel, True),
+        ]
+        if len(duplicados):
+            abas.append(('Possiveis_Duplicados', duplicados[COLUNAS_DUPLICADOS], False))
+        # A aba Dados_Completos é gravada linha a linha, sem montar a planilha em memória.
+        abas.append(('Dados_Completos', dados_completos, False))
+        with subtotais.medir('excel'):
+            salvar_planilhas(abas, caminho_excel_geral)
         print(f"✅ Relatório .xlsx consolidado salvo com sucesso em: '{caminho_excel_geral}'")
     except Exception as e:
         print(f"[ERRO] Falha ao salvar relatório .xlsx consolidado: {e}")
+        sucesso = False
+
+    # 7. PAINEL INTERATIVO (.html), OPCIONAL
+    if painel:
+        try:
+            caminho_painel = os.path.join(caminho_pasta_relatorios, ARQUIVO_PAINEL)
+            with subtotais.medir('painel'):
+                salvar_painel_html(caminho_painel, df_pacientes, df_procedimentos,
+                                   (total_presencas, total_faltas, total_cancelados), duplicados)
+            print(f"✅ Painel .html consolidado salvo com sucesso em: '{caminho_painel}'")
+        except Exception as e:
+            print(f"[ERRO] Falha ao salvar painel .html consolidado: {e}")
+            sucesso = False
+
+    subtotais.registrar('consolidado', linhas=total_linhas, pacientes=len(df_pacientes),
+                        procedimentos=len(df_procedimentos))
+    return sucesso
 
 
 # --- FUNÇÕES PARA RODAR AS ANÁLISES ---
-def rodar_analise_individual():
+def carregar_base(caminho_dados=ARQUIVO_ENTRADA_LIMPO):
+    """Carrega a base limpa, registrando a etapa nas métricas. Lança FileNotFoundError."""
+    with medir_etapa('carregar', arquivo=caminho_dados) as metricas:
+        df = carregar_dados_limpos(caminho_dados)
+        metricas['linhas'] = len(df)
+    return df
+
+def procurar_duplicados(nomes):
+    """Pares de pacientes com nomes muito parecidos (ver duplicados.py), registrando a etapa nas métricas."""
+    with medir_etapa('duplicados', pacientes=len(nomes)) as metricas:
+        pares = possiveis_duplicados(nomes)
+        metricas['pares'] = len(pares)
+    return pares
+
+def agregar_base(df):
+    """Monta o índice usado pelos kits e pelo relatório consolidado."""
+    with medir_etapa('agregar', linhas=len(df)) as metricas:
+        indice = construir_indice(df)
+        metricas['pacientes'] = len(indice.pacientes)
+    return indice
+
+def remover_saidas_obsoletas(pacientes_removidos, procedimentos_removidos,
+                             pasta_relatorios=PASTA_RELATORIOS, pasta_graficos=PASTA_GRAFICOS,
+                             versao_pastas=VERSAO_NOMES_PASTAS):
+    """
+    Apaga os kits de pacientes que saíram da base e os arquivos de
+    procedimentos que deixaram de existir para um paciente. As pastas dos
+    pacientes removidos são procuradas pela regra de nome 'versao_pastas'.
+    """
+    for nome_paciente in pacientes_removidos:
+        pasta_paciente = nome_pasta_paciente(nome_paciente, versao_pastas)
+        # Pela regra antiga um nome podia virar '..' ou um caminho com barras.
+        if pasta_paciente in ('', '.', '..') or os.path.basename(pasta_paciente) != pasta_paciente:
+            continue
+        for pasta in (pasta_relatorios, pasta_graficos):
+            shutil.rmtree(os.path.join(pasta, pasta_paciente), ignore_errors=True)
+
+    for nome_paciente, procedimentos in procedimentos_removidos.items():
+        pasta_paciente = nome_pasta_paciente(nome_paciente)
+        for procedimento in procedimentos:
+            nome_arquivo_base = nome_arquivo_procedimento(procedimento)
+            for caminho in (
+                os.path.join(pasta_relatorios, pasta_paciente, f'relatorio_{nome_arquivo_base}.txt'),
+                os.path.join(pasta_relatorios, pasta_paciente, f'relatorio_{nome_arquivo_base}.xlsx'),
+                os.path.join(pasta_graficos, pasta_paciente, f'grafico_{nome_arquivo_base}.png'),
+                os.path.join(pasta_graficos, pasta_paciente, f'grafico_{nome_arquivo_base}.svg'),
+            ):
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+
+def rodar_analise_individual(workers=1, incremental=False, modo_graficos='png', dpi=DPI_PADRAO,
+                             modo_excel='por_procedimento', df=None, indice=None,
+                             caminho_dados=ARQUIVO_ENTRADA_LIMPO,
+                             pasta_relatorios=PASTA_RELATORIOS, pasta_graficos=PASTA_GRAFICOS,
+                             modo_saida='pastas', duplicados=None):
     """
     Roda a análise original, gerando um kit de relatório para cada paciente.
+    Com 'workers' maior que 1, os pacientes são divididos entre processos.
+    Com 'incremental', só os pacientes/procedimentos cujas linhas mudaram desde
+    a última execução (segundo o manifesto) são refeitos; se as opções dos
+    kits mudaram (ver manifesto.OPCOES_DO_MANIFESTO), todos são refeitos.
+    'modo_graficos' e 'dpi' controlam os gráficos de pizza (ver graficos.py) e
+    'modo_excel' as planilhas dos kits (ver exportacao_excel.py).
+    Com modo_saida='zip', os kits vão para um único 'kits.zip' na pasta de
+    relatórios (ver saidas.py); no modo incremental, os pacientes sem
+    alterações são copiados do pacote anterior.
+
+    'df' e 'indice' podem vir já carregados (ex: para reaproveitá-los no
+    relatório consolidado); senão a base é lida de 'caminho_dados'. O mesmo
+    vale para 'duplicados' (de procurar_duplicados).
+    Devolve a lista de (paciente, erro) dos kits que falharam, ou None se a
+    base não foi encontrada.
     """
     print("--- INICIANDO ANÁLISE INDIVIDUAL PARA CADA PACIENTE ---")
-    try:
-        df = pd.read_excel(ARQUIVO_ENTRADA_LIMPO)
-    except FileNotFoundError:
-        print(f"[ERRO] O arquivo '{ARQUIVO_ENTRADA_LIMPO}' não foi encontrado.")
-        return
+    if df is None:
+        try:
+            df = carregar_base(caminho_dados)
+        except FileNotFoundError:
+            print(f"[ERRO] O arquivo '{caminho_dados}' não foi encontrado.")
+            return None
     
-    lista_de_pacientes = df[COLUNA_PACIENTE].unique()
+    if indice is None:
+        indice = agregar_base(df)
+    lista_de_pacientes = indice.pacientes
     print(f"Encontrados {len(lista_de_pacientes)} pacientes únicos na planilha.")
+
+    if modo_saida == 'zip' and modo_graficos == 'adiado':
+        print("[AVISO] Os gráficos adiados não vão para o pacote .zip; gerando os gráficos em 'png'.")
+        modo_graficos = 'png'
+
+    if duplicados is None:
+        duplicados = procurar_duplicados(lista_de_pacientes)
+    semelhantes = duplicados_por_paciente(duplicados)
+    if semelhantes:
+        print(f"[AVISO] {len(duplicados)} par(es) de pacientes com nomes muito parecidos; "
+              "o aviso vai no resumo da chefia de cada um.")
+
+    with medir_etapa('manifesto', linhas=len(df)):
+        manifesto = calcular_manifesto(df, indice, {nome: repr(lista) for nome, lista in semelhantes.items()})
+    manifesto['saida'] = modo_saida
+    manifesto['graficos'] = modo_graficos
+    # O DPI só muda os gráficos .png (os adiados também viram .png).
+    manifesto['dpi'] = dpi if modo_graficos in ('png', 'adiado') else None
+    manifesto['excel'] = modo_excel
+    manifesto['pastas'] = VERSAO_NOMES_PASTAS
+    pacote = None
+    if modo_saida == 'zip':
+        pacote = PacoteZip(os.path.join(pasta_relatorios, ARQUIVO_PACOTE), reaproveitar_anterior=incremental)
+    if incremental:
+        anterior = carregar_manifesto(pasta_relatorios)
+        if pacote is not None and not pacote.tem_anterior:
+            anterior = None  # sem o pacote anterior não há de onde copiar os kits sem alterações
+        if anterior is not None and opcoes_alteradas(anterior, manifesto):
+            print(f"[AVISO] Opções dos kits alteradas desde a última execução "
+                  f"({', '.join(opcoes_alteradas(anterior, manifesto))}); todos os kits serão refeitos.")
+            if pacote is None:
+                # Os arquivos no formato antigo (ex: os .png ao mudar para svg) não seriam sobrescritos.
+                remover_saidas_obsoletas(anterior.get('pacientes', {}), {}, pasta_relatorios, pasta_graficos,
+                                         versao_pastas=anterior.get('pastas', OPCOES_PADRAO['pastas']))
+        alteracoes, procedimentos_removidos, pacientes_removidos = comparar_manifestos(anterior, manifesto)
+        print(f"Modo incremental: {len(alteracoes)} paciente(s) com alterações, "
+              f"{len(lista_de_pacientes) - len(alteracoes)} sem alterações, "
+              f"{len(pacientes_removidos)} removido(s) da base.")
+        if pacote is None:
+            remover_saidas_obsoletas(pacientes_removidos, procedimentos_removidos, pasta_relatorios, pasta_graficos)
+        else:
+            # No pacote o kit é sempre refeito inteiro; os removidos só não são copiados.
+            alteracoes = dict.fromkeys(alteracoes)
+    else:
+        alteracoes = {str(nome_paciente): None for nome_paciente in lista_de_pacientes}
     
-    for nome_paciente in lista_de_pacientes:
-        print("-" * 50)
-        gerar_relatorios_completos(df, nome_paciente)
+    opcoes_kit = dict(modo_graficos=modo_graficos, dpi=dpi, modo_excel=modo_excel,
+                      pasta_relatorios=pasta_relatorios, pasta_graficos=pasta_graficos, modo_saida=modo_saida,
+                      duplicados=semelhantes)
+    gravar_artefatos = pacote.gravar if pacote is not None else None
+    with medir_etapa('kits', pacientes=len(alteracoes), workers=workers,
+                     graficos=modo_graficos, excel=modo_excel, saida=modo_saida) as metricas:
+        try:
+            if workers > 1:
+                print(f"Gerando os kits em {workers} processos paralelos.")
+                falhas = gerar_kits_em_paralelo(df, indice, workers, alteracoes, gravar_artefatos, **opcoes_kit)
+            else:
+                falhas = []
+                for nome_paciente in lista_de_pacientes:
+                    if str(nome_paciente) not in alteracoes:
+                        continue
+                    print("-" * 50)
+                    artefatos = gerar_relatorios_completos(df, nome_paciente, indice, alteracoes[str(nome_paciente)],
+                                                           **opcoes_kit)
+                    if gravar_artefatos is not None and artefatos is not None:
+                        gravar_artefatos(nome_paciente, artefatos)
+            if pacote is not None:
+                copiados = pacote.copiar_do_anterior(
+                    nome_paciente for nome_paciente in lista_de_pacientes if str(nome_paciente) not in alteracoes)
+                if copiados:
+                    print(f"{copiados} kit(s) sem alterações copiados do pacote anterior.")
+        except BaseException:
+            if pacote is not None:
+                pacote.fechar(sucesso=False)
+            raise
+        if pacote is not None:
+            pacote.fechar()
+            print(f"\n✅ Kits salvos no pacote '{pacote.caminho}' (índice em '{ARQUIVO_INDICE_PACOTE}').")
+        metricas['falhas'] = len(falhas)
+
+    # Pacientes que falharam ficam fora do manifesto e são refeitos na próxima execução.
+    for nome_paciente, _ in falhas:
+        manifesto['pacientes'].pop(str(nome_paciente), None)
+    salvar_manifesto(pasta_relatorios, manifesto)
+
+    if modo_graficos == 'adiado':
+        print(f"\nGráficos adiados: rode 'python graficos.py --pasta {pasta_graficos}' para desenhá-los.")
 
     print("-" * 50)
+    if falhas:
+        print(f"\n[AVISO] {len(falhas)} paciente(s) não tiveram o kit gerado:")
+        for nome_paciente, erro in falhas:
+            print(f"     - {nome_paciente}: {erro}")
     print("\nAnálise individual finalizada para todos os pacientes!")
+    return falhas
 
 
 # --- BLOCO PRINCIPAL COM MENU DE ESCOLHA ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Análise de faltas de pacientes.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processos usados para gerar os kits individuais (padrão: 1).")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Refaz apenas os kits dos pacientes cujos dados mudaram desde a última execução.")
+    parser.add_argument('--graficos', choices=MODOS_GRAFICOS, default='png',
+                        help="Como gerar os gráficos de pizza dos kits (padrão: png).")
+    parser.add_argument('--dpi', type=int, default=DPI_PADRAO,
+                        help=f"Resolução dos gráficos .png (padrão: {DPI_PADRAO}).")
+    parser.add_argument('--excel', choices=MODOS_EXCEL, default='por_procedimento',
+                        help="Uma planilha por procedimento, uma por paciente (uma aba por procedimento) ou nenhuma.")
+    parser.add_argument('--saida', choices=MODOS_SAIDA, default='pastas',
+                        help=f"Grava os kits em pastas por paciente ou num único '{ARQUIVO_PACOTE}' com índice (padrão: pastas).")
+    parser.add_argument('--painel', action='store_true',
+                        help=f"O relatório consolidado também gera o '{ARQUIVO_PAINEL}', um painel interativo num único arquivo.")
+    parser.add_argument('--metricas', nargs='?', const=ARQUIVO_METRICAS, default=None, metavar='ARQUIVO',
+                        help=f"Grava tempo, linhas e memória de cada etapa em JSON lines (padrão: {ARQUIVO_METRICAS}).")
+    parser.add_argument('--profile', action='store_true',
+                        help="Perfila a execução com cProfile e salva os .prof na pasta de métricas.")
+    parser.add_argument('--historico', nargs='?', const=ARQUIVO_HISTORICO, default=None, metavar='ARQUIVO',
+                        help=f"Analisa o histórico acumulado (padrão: {ARQUIVO_HISTORICO}) em vez do .arrow.")
+    args = parser.parse_args()
+
+    if args.metricas:
+        ativar_metricas(args.metricas)
+    perfil = iniciar_perfil() if args.profile else None
+
     while True:
         print("\n" + "="*30)
         print("   MENU DE ANÁLISE DE FALTAS")
@@ -269,13 +601,27 @@ if __name__ == "__main__":
         
         escolha = input("\nDigite sua opção (1, 2 ou 3): ")
 
-        if escolha == '1':
-            rodar_analise_individual()
+        if escolha in ('1', '2') and args.historico:
+            try:
+                with HistoricoConsultas(args.historico) as historico:
+                    if escolha == '1':
+                        rodar_analise_individual(workers=args.workers, incremental=args.incremental,
+                                                 modo_graficos=args.graficos, dpi=args.dpi, modo_excel=args.excel,
+                                                 modo_saida=args.saida, df=historico.carregar())
+                    else:
+                        gerar_relatorio_geral_consolidado(None, historico=historico, painel=args.painel)
+            except FileNotFoundError:
+                print(f"[ERRO] O histórico '{args.historico}' não foi encontrado.")
+            break
+        elif escolha == '1':
+            rodar_analise_individual(workers=args.workers, incremental=args.incremental,
+                                     modo_graficos=args.graficos, dpi=args.dpi, modo_excel=args.excel,
+                                     modo_saida=args.saida)
             break
         elif escolha == '2':
             try:
-                df_geral = pd.read_excel(ARQUIVO_ENTRADA_LIMPO)
-                gerar_relatorio_geral_consolidado(df_geral)
+                df_geral = carregar_base()
+                gerar_relatorio_geral_consolidado(df_geral, painel=args.painel)
             except FileNotFoundError:
                 print(f"[ERRO] O arquivo '{ARQUIVO_ENTRADA_LIMPO}' não foi encontrado.")
             break
@@ -283,4 +629,7 @@ if __name__ == "__main__":
             print("Saindo do programa.")
             break
         else:
-            print("[AVISO] Opção inválida. Por favor, escolha 1, 2 ou 3.")
\ No newline at end of file
+            print("[AVISO] Opção inválida. Por favor, escolha 1, 2 ou 3.")
+
+    if perfil is not None:
+        encerrar_perfil(perfil)
@@ -0,0 +1,228 @@
+import argparse
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from configuracoes import (
+    ARQUIVO_ENTRADA_LIMPO, PASTA_DADOS_POR_MES, COLUNA_PARTICAO, PARTICAO_SEM_DATA, PASTA_RELATORIOS,
+    COLUNA_PACIENTE, COLUNA_PROCEDIMENTO, COLUNA_STATUS, COLUNA_DATA,
+)
+from agregacao import codificar_status
+from carregamento import carregar_dados_limpos
+from exportacao_excel import salvar_planilhas
+
+# Períodos aceitos: frequência do pandas e formato do rótulo de cada período
+# (as semanas começam na segunda-feira e são rotuladas pela data de início).
+PERIODOS = {
+    'diario': ('D', '%Y-%m-%d'),
+    'semanal': ('W-SUN', '%Y-%m-%d'),
+    'mensal': ('M', '%Y-%m'),
+}
+DIAS_DA_SEMANA = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
+JANELA_PADRAO_DIAS = 30
+
+COLUNAS_CONTAGEM = ['Presenças', 'Faltas', 'Cancelados']
+
+
+# --- LEITURA POR PERÍODO ---
+def carregar_periodo(inicio=None, fim=None, pasta_dados='.'):
+    """
+    Carrega as consultas com data entre 'inicio' (inclusive) e 'fim' (exclusive).
+
+    Com a cópia particionada por mês gravada pelo limpador, só os arquivos dos
+    meses do intervalo são lidos. Sem ela, a base inteira é carregada e filtrada.
+    """
+    inicio = pd.Timestamp(inicio) if inicio is not None else None
+    fim = pd.Timestamp(fim) if fim is not None else None
+
+    pasta_particionada = os.path.join(pasta_dados, PASTA_DADOS_POR_MES)
+    if not os.path.isdir(pasta_particionada):
+        caminho = os.path.join(pasta_dados, ARQUIVO_ENTRADA_LIMPO)
+        print(f"[AVISO] '{pasta_particionada}' não encontrada, lendo a base inteira de '{caminho}'.")
+        df = carregar_dados_limpos(caminho)
+        if COLUNA_DATA not in df.columns:
+            return df
+        dentro = df[COLUNA_DATA].notna()
+        if inicio is not None:
+            dentro &= df[COLUNA_DATA] >= inicio
+        if fim is not None:
+            dentro &= df[COLUNA_DATA] < fim
+        return df[dentro].reset_index(drop=True)
+
+    dataset = ds.dataset(pasta_particionada, format='ipc', partitioning='hive')
+    tipo_data = dataset.schema.field(COLUNA_DATA).type
+    # O filtro pela partição descarta os meses fora do intervalo sem abrir os
+    # arquivos; o filtro pela data acerta os dias dentro dos meses das pontas.
+    filtro = ds.field(COLUNA_PARTICAO) != PARTICAO_SEM_DATA
+    if inicio is not None:
+        filtro &= ds.field(COLUNA_PARTICAO) >= inicio.strftime('%Y-%m')
+        filtro &= ds.field(COLUNA_DATA) >= pa.scalar(inicio.to_pydatetime(), type=tipo_data)
+    if fim is not None:
+        filtro &= ds.field(COLUNA_PARTICAO) <= fim.strftime('%Y-%m')
+        filtro &= ds.field(COLUNA_DATA) < pa.scalar(fim.to_pydatetime(), type=tipo_data)
+
+    colunas = [nome for nome in dataset.schema.names if nome != COLUNA_PARTICAO]
+    return dataset.to_table(columns=colunas, filter=filtro).to_pandas()
+
+
+def carregar_ultimos_dias(dias, referencia=None, pasta_dados='.'):
+    """Consultas dos últimos 'dias' dias até 'referencia' (padrão: hoje, inclusive)."""
+    fim = (pd.Timestamp(referencia) if referencia is not None else pd.Timestamp.now()).normalize()
+    fim += pd.Timedelta(days=1)
+    return carregar_periodo(fim - pd.Timedelta(days=dias), fim, pasta_dados)
+
+
+# --- AGREGAÇÕES ---
+def _contagens(df):
+    """Uma coluna 0/1 por status (presença, falta, cancelado) para cada linha."""
+    posicao = codificar_status(df[COLUNA_STATUS])
+    return pd.DataFrame(
+        {coluna: (posicao == i).astype('int64') for i, coluna in enumerate(COLUNAS_CONTAGEM)},
+        index=df.index,
+    )
+
+
+def _com_taxas(contagens):
+    contagens['Total_Valido'] = contagens['Presenças'] + contagens['Faltas']
+    contagens['Taxa_Falta_%'] = (contagens['Faltas'] / contagens['Total_Valido'] * 100).fillna(0)
+    return contagens
+
+
+def taxas_por_periodo(df, periodo='mensal', por=None):
+    """
+    Presenças, faltas, cancelados e taxa de falta por período ('diario',
+    'semanal' ou 'mensal'). Com 'por' (ex: COLUNA_PACIENTE), uma linha para
+    cada (valor, período) com consultas. Linhas sem data ficam de fora.
+    """
+    frequencia, formato = PERIODOS[periodo]
+    periodos = df[COLUNA_DATA].dt.to_period(frequencia).rename('Periodo')
+    chaves = [periodos] if por is None else [df[por], periodos]
+
+    contagens = _contagens(df).groupby(chaves, observed=True, sort=True).sum()
+    rotulos = contagens.index.get_level_values('Periodo').start_time.strftime(formato)
+    if por is None:
+        contagens.index = pd.Index(rotulos, name='Periodo')
+    else:
+        contagens.index = pd.MultiIndex.from_arrays(
+            [contagens.index.get_level_values(por), rotulos], names=[por, 'Periodo'])
+    return _com_taxas(contagens)
+
+
+def taxas_dia_hora(df, por=None):
+    """
+    Tabela dia da semana x hora com a taxa de falta (%) de cada horário. Com
+    'por' (ex: COLUNA_PROCEDIMENTO), uma linha para cada (valor, dia da
+    semana) com consultas, e as horas nas colunas.
+    """
+    datas = df[COLUNA_DATA]
+    chaves = [datas.dt.dayofweek.rename('Dia'), datas.dt.hour.rename('Hora')]
+    if por is not None:
+        chaves.insert(0, df[por])
+    contagens = _contagens(df).groupby(chaves, observed=True, sort=True).sum()
+    taxas = _com_taxas(contagens)['Taxa_Falta_%'].unstack('Hora')
+    dias = [DIAS_DA_SEMANA[int(dia)] for dia in taxas.index.get_level_values('Dia')]
+    if por is None:
+        taxas.index = pd.Index(dias, name='Dia')
+    else:
+        taxas.index = pd.MultiIndex.from_arrays([taxas.index.get_level_values(por), dias], names=[por, 'Dia'])
+    taxas.columns = [f'{int(hora):02d}h' for hora in taxas.columns]
+    return taxas
+
+
+def taxa_movel(df, janela_dias=JANELA_PADRAO_DIAS, por=None):
+    """
+    Taxa de falta numa janela móvel de 'janela_dias' dias, calculada para cada
+    dia entre a primeira e a última consulta. Com 'por', a janela é aplicada a
+    todos os valores da coluna de uma vez (uma coluna por valor) e o resultado
+    volta em formato longo, só com os dias em que a janela tem consultas.
+    """
+    datas = df[COLUNA_DATA].dt.normalize()
+    if datas.notna().sum() == 0:
+        return _com_taxas(pd.DataFrame(columns=COLUNAS_CONTAGEM, dtype='int64'))
+    dias = pd.date_range(datas.min(), datas.max(), freq='D', name='Dia')
+
+    chaves = [datas.rename('Dia')] if por is None else [datas.rename('Dia'), df[por]]
+    diario = _contagens(df).groupby(chaves, observed=True).sum()
+    if por is not None:
+        diario = diario.unstack(por, fill_value=0)
+    movel = diario.reindex(dias, fill_value=0).rolling(janela_dias, min_periods=1).sum().astype('int64')
+
+    if por is None:
+        return _com_taxas(movel)
+    movel = movel.stack(por, future_stack=True).reorder_levels([por, 'Dia']).sort_index()
+    return _com_taxas(movel[movel[COLUNAS_CONTAGEM].sum(axis=1) > 0])
+
+
+# --- RELATÓRIO ---
+def _aba(nome, tabela):
+    """O índice de várias colunas (ex: procedimento + período) vira colunas comuns na planilha."""
+    if tabela.index.nlevels > 1:
+        return nome, tabela.reset_index(), False
+    return nome, tabela, True
+
+
+def gerar_relatorio_temporal(df, pasta_relatorios=PASTA_RELATORIOS, janela_dias=JANELA_PADRAO_DIAS,
+                             descricao_periodo='todo o histórico'):
+    """
+    Grava 'ANALISE_TEMPORAL/relatorio_temporal.xlsx' com as taxas de falta por
+    mês, semana, dia da semana x hora e janela móvel, no geral e por
+    procedimento/paciente.
+    Devolve True se a planilha foi salva.
+    """
+    print(f"\n🔎 --- GERANDO ANÁLISE TEMPORAL DE FALTAS ({descricao_periodo}) --- 🔎")
+    if COLUNA_DATA not in df.columns:
+        print(f"[ERRO] A base não tem a coluna '{COLUNA_DATA}'. Rode o 'limpador.py' novamente para mantê-la.")
+        return False
+
+    com_data = int(df[COLUNA_DATA].notna().sum())
+    print(f"{com_data} consulta(s) com data, de {len(df)} no total.")
+
+    abas = [
+        _aba('Mensal', taxas_por_periodo(df, 'mensal')),
+        _aba('Semanal', taxas_por_periodo(df, 'semanal')),
+        _aba('Dia_x_Hora', taxas_dia_hora(df)),
+        _aba(f'Movel_{janela_dias}d', taxa_movel(df, janela_dias)),
+        _aba('Mensal_por_Procedimento', taxas_por_periodo(df, 'mensal', COLUNA_PROCEDIMENTO)),
+        _aba(f'Movel_{janela_dias}d_por_Procedimento', taxa_movel(df, janela_dias, COLUNA_PROCEDIMENTO)),
+        _aba('Mensal_por_Paciente', taxas_por_periodo(df, 'mensal', COLUNA_PACIENTE)),
+        _aba('Dia_x_Hora_por_Procedimento', taxas_dia_hora(df, COLUNA_PROCEDIMENTO)),
+        _aba('Dia_x_Hora_por_Paciente', taxas_dia_hora(df, COLUNA_PACIENTE)),
+    ]
+
+    try:
+        pasta = os.path.join(pasta_relatorios, 'ANALISE_TEMPORAL')
+        os.makedirs(pasta, exist_ok=True)
+        caminho = os.path.join(pasta, 'relatorio_temporal.xlsx')
+        salvar_planilhas(abas, caminho)
+        print(f"✅ Relatório temporal salvo com sucesso em: '{caminho}'")
+        return True
+    except Exception as e:
+        print(f"[ERRO] Falha ao salvar o relatório temporal: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Taxas de falta por mês, semana, dia da semana e hora.")
+    parser.add_argument('--dias', type=int, help="Analisa só os últimos N dias (ex: 90).")
+    parser.add_argument('--inicio', help="Data inicial (AAAA-MM-DD), inclusive.")
+    parser.add_argument('--fim', help="Data final (AAAA-MM-DD), exclusive.")
+    parser.add_argument('--janela', type=int, default=JANELA_PADRAO_DIAS,
+                        help=f"Tamanho da janela móvel em dias (padrão: {JANELA_PADRAO_DIAS}).")
+    args = parser.parse_args()
+
+    try:
+        if args.dias:
+            df = carregar_ultimos_dias(args.dias)
+            descricao = f"últimos {args.dias} dias"
+        elif args.inicio or args.fim:
+            df = carregar_periodo(args.inicio, args.fim)
+            descricao = f"de {args.inicio or 'início'} a {args.fim or 'hoje'}"
+        else:
+            df = carregar_dados_limpos()
+            descricao = 'todo o histórico'
+    except FileNotFoundError:
+        print(f"[ERRO] O arquivo '{ARQUIVO_ENTRADA_LIMPO}' não foi encontrado.")
+    else:
+        gerar_relatorio_temporal(df, janela_dias=args.janela, descricao_periodo=descricao)
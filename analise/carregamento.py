@@ -0,0 +1,56 @@
+import os
+
+import pandas as pd
+
+from configuracoes import (
+    ARQUIVO_ENTRADA_LIMPO, ARQUIVO_ENTRADA_LIMPO_XLSX,
+    COLUNA_PACIENTE, COLUNA_ID_PACIENTE, COLUNA_PROCEDIMENTO, COLUNA_STATUS,
+    STATUS_PRESENTE, STATUS_FALTOU, STATUS_CANCELADO,
+)
+
+
+def para_esquema_compacto(df):
+    """
+    Converte Paciente, Paciente_ID, Procedimento e Status de uma planilha
+    antiga (ou do histórico) para o mesmo esquema do arquivo .arrow:
+    categorias na ordem de aparição, com os status presente/faltou/cancelado
+    fixos nos códigos 0, 1 e 2.
+    """
+    for coluna in (COLUNA_PACIENTE, COLUNA_ID_PACIENTE, COLUNA_PROCEDIMENTO, COLUNA_STATUS):
+        if coluna not in df.columns or isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            continue
+        categorias = list(pd.unique(df[coluna].dropna()))
+        if coluna == COLUNA_STATUS:
+            fixos = [STATUS_PRESENTE, STATUS_FALTOU, STATUS_CANCELADO]
+            categorias = fixos + [c for c in categorias if c not in fixos]
+        df[coluna] = pd.Categorical(df[coluna], categories=categorias)
+    return df
+
+
+def carregar_dados_limpos(caminho=ARQUIVO_ENTRADA_LIMPO, mapear_memoria=True):
+    """
+    Carrega a base limpa gerada pelo 'limpador.py'.
+
+    O arquivo .arrow (Arrow IPC / Feather sem compressão) é mapeado em memória,
+    sem passar por um parser de planilha, e Paciente/Procedimento/Status já
+    chegam como categorias (códigos inteiros). Se ele não existir, cai para a
+    planilha .xlsx antiga, convertida para o mesmo esquema. Lança
+    FileNotFoundError se nenhum dos dois existir.
+
+    Com 'mapear_memoria=False' o arquivo é lido de uma vez e não fica aberto,
+    para processos que continuam rodando enquanto o limpador grava uma nova
+    versão (no Windows, um arquivo mapeado não pode ser substituído).
+    """
+    if caminho.endswith(('.xlsx', '.xls')):
+        return para_esquema_compacto(pd.read_excel(caminho, engine='calamine'))
+
+    if not os.path.exists(caminho):
+        caminho_xlsx = os.path.join(os.path.dirname(caminho), ARQUIVO_ENTRADA_LIMPO_XLSX)
+        if os.path.exists(caminho_xlsx):
+            print(f"[AVISO] '{caminho}' não encontrado, lendo a planilha '{caminho_xlsx}'.")
+            return para_esquema_compacto(pd.read_excel(caminho_xlsx, engine='calamine'))
+        raise FileNotFoundError(caminho)
+
+    import pyarrow.feather as feather
+    tabela = feather.read_table(caminho, memory_map=mapear_memoria)
+    return tabela.to_pandas(split_blocks=True, self_destruct=True)
@@ -0,0 +1,32 @@
+import os
+
+# --- CONFIGURAÇÕES DA ANÁLISE ---
+# Constantes compartilhadas pelos scripts e módulos da pasta 'analise'.
+ARQUIVO_ENTRADA_LIMPO = 'dados_limpos.arrow'
+# Planilha antiga, usada apenas se o arquivo .arrow ainda não existir.
+ARQUIVO_ENTRADA_LIMPO_XLSX = 'dados_limpos.xlsx'
+# Cópia da base particionada por mês (ano_mes=AAAA-MM), gravada pelo limpador,
+# usada pelas consultas por período para ler só os meses necessários.
+PASTA_DADOS_POR_MES = 'dados_por_mes'
+COLUNA_PARTICAO = 'ano_mes'
+PARTICAO_SEM_DATA = 'sem_data'
+# Banco SQLite com o histórico acumulado das exportações (limpador.py --historico).
+ARQUIVO_HISTORICO = 'historico.sqlite'
+
+# Pastas de saída padrão, relativas à pasta 'analise' (de onde o menu é rodado).
+# O 'rodar_pipeline.py' da raiz do projeto permite escolher outras.
+PASTA_RELATORIOS = os.path.join('..', 'relatorios')
+PASTA_GRAFICOS = os.path.join('..', 'graficos')
+
+# Nomes das colunas
+COLUNA_PACIENTE = 'Paciente'
+# Identificador estável do paciente, calculado pelo limpador a partir do nome normalizado.
+COLUNA_ID_PACIENTE = 'Paciente_ID'
+COLUNA_STATUS = 'Status'
+COLUNA_PROCEDIMENTO = 'Procedimento'
+COLUNA_DATA = 'Data e Hora agendada'
+
+# Apelidos para cada status
+STATUS_FALTOU = 'Ncompareceu'
+STATUS_PRESENTE = 'Finalizado'
+STATUS_CANCELADO = 'Cancelado'
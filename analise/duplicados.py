@@ -0,0 +1,97 @@
+import argparse
+import re
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+from configuracoes import ARQUIVO_ENTRADA_LIMPO, COLUNA_PACIENTE
+from carregamento import carregar_dados_limpos
+from nomes import chave_do_nome
+
+# Pacientes com nomes muito parecidos (ex: 'Marina Silva' e 'Mariana Silva')
+# podem ser o mesmo cadastro digitado de dois jeitos. O limpador já junta os
+# nomes que só diferem em acentos, maiúsculas e espaços; aqui são apontados os
+# que ainda ficaram parecidos, para alguém conferir (nada é juntado sozinho).
+LIMIAR_SEMELHANCA = 0.9
+
+# Quantos vizinhos, em cada ordenação, cada nome é comparado.
+JANELA_VIZINHANCA = 6
+
+COLUNAS_DUPLICADOS = [COLUNA_PACIENTE, 'Possivel_Duplicado', 'Semelhanca_%']
+
+
+def possiveis_duplicados(nomes, limiar=LIMIAR_SEMELHANCA, janela=JANELA_VIZINHANCA):
+    """
+    Pares de pacientes cujos nomes têm semelhança (difflib) de pelo menos
+    'limiar', sem pontuação e com as palavras em ordem alfabética (então
+    'Silva, Ana' e 'Ana Silva' são iguais).
+
+    Comparar todos os pares seria quadrático. Os nomes são ordenados duas
+    vezes, pelas palavras em ordem alfabética e por esse mesmo texto de trás
+    para frente, e cada um só é comparado com os 'janela' seguintes em cada
+    ordem: um erro de digitação no fim ou no começo do nome deixa os dois
+    vizinhos em pelo menos uma delas. Nomes com números diferentes (ex:
+    'Paciente 3' e 'Paciente 8') não contam como parecidos.
+    Devolve um DataFrame com COLUNAS_DUPLICADOS, dos mais parecidos para os menos.
+    """
+    chaves = {}
+    for nome in nomes:
+        if not pd.isna(nome):
+            chaves[str(nome)] = ' '.join(sorted(re.sub(r'[\W_]+', ' ', chave_do_nome(str(nome))).split()))
+    numeros = {nome: re.findall(r'\d+', chave) for nome, chave in chaves.items()}
+
+    comparados = set()
+    pares = []
+    comparador = SequenceMatcher(autojunk=False)
+    for ordem in (lambda item: item[1], lambda item: item[1][::-1]):
+        ordenados = sorted(chaves.items(), key=ordem)
+        for i, (nome_a, chave_a) in enumerate(ordenados):
+            # O SequenceMatcher prepara o segundo texto; ele é trocado só uma vez por nome.
+            comparador.set_seq2(chave_a)
+            for nome_b, chave_b in ordenados[i + 1:i + 1 + janela]:
+                par = (nome_a, nome_b) if nome_a < nome_b else (nome_b, nome_a)
+                if par in comparados or numeros[nome_a] != numeros[nome_b]:
+                    continue
+                comparados.add(par)
+                comparador.set_seq1(chave_b)
+                if comparador.real_quick_ratio() < limiar or comparador.quick_ratio() < limiar:
+                    continue
+                semelhanca = comparador.ratio()
+                if semelhanca >= limiar:
+                    pares.append((*par, round(semelhanca * 100, 1)))
+
+    return (pd.DataFrame(pares, columns=COLUNAS_DUPLICADOS)
+            .sort_values(['Semelhanca_%', COLUNA_PACIENTE], ascending=[False, True], ignore_index=True))
+
+
+def duplicados_por_paciente(pares):
+    """{paciente: [(nome parecido, semelhança %), ...]}, nos dois sentidos de cada par."""
+    semelhantes = {}
+    for nome_a, nome_b, semelhanca in pares.itertuples(index=False):
+        semelhantes.setdefault(nome_a, []).append((nome_b, semelhanca))
+        semelhantes.setdefault(nome_b, []).append((nome_a, semelhanca))
+    return semelhantes
+
+
+def texto_aviso_duplicados(semelhantes):
+    """Trecho do resumo da chefia de um paciente com nomes parecidos."""
+    linhas = [f"  - {nome} (semelhança de {semelhanca:.1f}%)" for nome, semelhanca in semelhantes]
+    return ("--- ATENÇÃO: POSSÍVEL CADASTRO DUPLICADO ---\n"
+            "O nome deste paciente é muito parecido com:\n" + "\n".join(linhas) + "\n"
+            "Confira se é a mesma pessoa: as consultas dela podem estar divididas entre os cadastros.\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lista pacientes com nomes muito parecidos (possíveis duplicados).")
+    parser.add_argument('--limiar', type=float, default=LIMIAR_SEMELHANCA,
+                        help=f"Semelhança mínima, de 0 a 1 (padrão: {LIMIAR_SEMELHANCA}).")
+    args = parser.parse_args()
+    try:
+        df = carregar_dados_limpos()
+    except FileNotFoundError:
+        print(f"[ERRO] O arquivo '{ARQUIVO_ENTRADA_LIMPO}' não foi encontrado.")
+    else:
+        pares = possiveis_duplicados(df[COLUNA_PACIENTE].unique(), args.limiar)
+        print(f"{len(pares)} par(es) de nomes parecidos entre {df[COLUNA_PACIENTE].nunique()} pacientes.")
+        if len(pares):
+            print(pares.to_string(index=False))
@@ -0,0 +1,138 @@
+import itertools
+import math
+import re
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+try:
+    import xlsxwriter
+except ImportError:  # sem xlsxwriter, usamos o modo write_only do openpyxl
+    xlsxwriter = None
+
+# Como as planilhas dos kits são gravadas:
+# - 'por_procedimento': um .xlsx por procedimento (layout original);
+# - 'por_paciente': um único .xlsx por paciente, com uma aba por procedimento;
+# - 'nenhum': não grava planilhas nos kits.
+MODOS_EXCEL = ['por_procedimento', 'por_paciente', 'nenhum']
+
+# Linhas convertidas por vez ao gravar um DataFrame grande.
+LINHAS_POR_BLOCO = 10_000
+
+FORMATO_DATA = 'dd/mm/yyyy hh:mm'
+
+
+def _valor_celula(valor):
+    """Converte valores do pandas/numpy para tipos que os escritores aceitam."""
+    if valor is None or valor is pd.NA or valor is pd.NaT:
+        return None
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.tz_localize(None).to_pydatetime() if valor.tzinfo else valor.to_pydatetime()
+    if isinstance(valor, np.generic):
+        return _valor_celula(valor.item())
+    return valor
+
+
+@dataclass
+class LinhasEmStreaming:
+    """Conteúdo de uma aba vindo direto de um iterador de linhas (ex: um cursor do SQLite), sem DataFrame."""
+    cabecalho: list
+    linhas: Iterable
+
+
+def nome_de_aba(nome, usados):
+    """Nome de aba válido no Excel (até 31 caracteres, sem []:*?/\\) e sem repetir."""
+    base = re.sub(r'[\[\]:*?/\\]', '', str(nome)).strip() or 'Aba'
+    candidato = base[:31]
+    sufixo = 2
+    while candidato.lower() in usados:
+        marca = f' ({sufixo})'
+        candidato = base[:31 - len(marca)] + marca
+        sufixo += 1
+    usados.add(candidato.lower())
+    return candidato
+
+
+class _LivroXlsxWriter:
+    def __init__(self, destino):
+        em_memoria = not isinstance(destino, str)
+        # constant_memory grava cada linha no disco assim que a próxima começa.
+        self.livro = xlsxwriter.Workbook(destino, {
+            'constant_memory': not em_memoria,
+            'in_memory': em_memoria,
+            'default_date_format': FORMATO_DATA,
+        })
+
+    def nova_aba(self, nome):
+        aba = self.livro.add_worksheet(nome)
+        numero_linha = itertools.count()
+        return lambda valores: aba.write_row(next(numero_linha), 0, valores)
+
+    def fechar(self):
+        self.livro.close()
+
+
+class _LivroOpenpyxl:
+    def __init__(self, destino):
+        from openpyxl import Workbook
+        self.destino = destino
+        self.livro = Workbook(write_only=True)
+
+    def nova_aba(self, nome):
+        return self.livro.create_sheet(nome).append
+
+    def fechar(self):
+        self.livro.save(self.destino)
+
+
+def abrir_livro(destino):
+    """'destino' pode ser um caminho ou um arquivo binário aberto (ex: BytesIO)."""
+    return _LivroXlsxWriter(destino) if xlsxwriter is not None else _LivroOpenpyxl(destino)
+
+
+def escrever_linhas(escrever_linha, cabecalho, linhas):
+    """Grava o cabeçalho e as linhas, uma por vez, na aba."""
+    escrever_linha(list(cabecalho))
+    for linha in linhas:
+        escrever_linha([_valor_celula(valor) for valor in linha])
+
+
+def linhas_do_dataframe(df, incluir_indice=False):
+    """Percorre o DataFrame em blocos, sem materializar todas as linhas de uma vez."""
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+        yield from df.iloc[inicio:inicio + LINHAS_POR_BLOCO].itertuples(index=incluir_indice, name=None)
+
+
+def cabecalho_do_dataframe(df, incluir_indice=False):
+    colunas = [str(c) for c in df.columns]
+    if incluir_indice:
+        colunas.insert(0, str(df.index.name) if df.index.name is not None else '')
+    return colunas
+
+
+def salvar_planilhas(abas, destino):
+    """
+    Grava várias abas num único .xlsx. 'abas' é uma lista de
+    (nome_da_aba, DataFrame ou LinhasEmStreaming, incluir_indice).
+    """
+    livro = abrir_livro(destino)
+    usados = set()
+    try:
+        for nome, df, incluir_indice in abas:
+            escrever_linha = livro.nova_aba(nome_de_aba(nome, usados))
+            if isinstance(df, LinhasEmStreaming):
+                escrever_linhas(escrever_linha, df.cabecalho, df.linhas)
+            else:
+                escrever_linhas(escrever_linha, cabecalho_do_dataframe(df, incluir_indice),
+                                linhas_do_dataframe(df, incluir_indice))
+    finally:
+        livro.fechar()
+
+
+def salvar_planilha(df, destino, nome_aba='Sheet1'):
+    """Equivalente a df.to_excel(destino, index=False), gravando em streaming."""
+    salvar_planilhas([(nome_aba, df, False)], destino)
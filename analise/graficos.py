@@ -0,0 +1,205 @@
+import argparse
+import io
+import json
+import math
+import os
+from html import escape
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from configuracoes import PASTA_GRAFICOS
+
+# Modos aceitos para os gráficos de pizza dos kits:
+# - 'png': imagem via matplotlib, reaproveitando uma única figura por processo;
+# - 'svg': SVG montado por template de texto, sem passar pelo matplotlib;
+# - 'nenhum': não gera gráficos (execuções que só precisam dos números);
+# - 'adiado': só anota o que precisa ser desenhado, para rodar depois com
+#   'python graficos.py'.
+MODOS_GRAFICOS = ['png', 'svg', 'nenhum', 'adiado']
+DPI_PADRAO = 100
+
+ROTULOS = ['Presenças', 'Faltas', 'Cancelados']
+CORES = ['#2E8B57', '#DC143C', '#A9A9A9']
+
+ARQUIVO_PENDENTES = 'graficos_pendentes.jsonl'
+
+
+class RenderizadorPizza:
+    """
+    Mantém uma figura e um canvas Agg prontos. A pizza é desenhada uma vez
+    e, nos gráficos seguintes, só os ângulos das fatias, a posição e o texto
+    dos rótulos e o título são atualizados, sem criar artistas novos (como
+    fariam eixo.clear() e eixo.pie() a cada gráfico). A pizza só é refeita
+    quando muda o número de fatias não vazias.
+    """
+
+    # Os mesmos padrões do Axes.pie: rótulos a 1.1 raio e percentuais a 0.6.
+    DISTANCIA_ROTULO = 1.1
+    DISTANCIA_PERCENTUAL = 0.6
+    ANGULO_INICIAL = 90
+
+    def __init__(self, dpi=DPI_PADRAO):
+        self.dpi = dpi
+        self.figura = Figure()
+        FigureCanvasAgg(self.figura)
+        self.eixo = self.figura.add_subplot()
+        self.fatias = self.rotulos = self.percentuais = None
+        self.nao_vazias = None
+
+    def _desenhar(self, valores):
+        self.eixo.clear()
+        self.fatias, self.rotulos, self.percentuais = self.eixo.pie(
+            valores, labels=ROTULOS, colors=CORES, autopct='%1.1f%%', startangle=self.ANGULO_INICIAL)
+        self.eixo.axis('equal')
+
+    def _atualizar(self, valores):
+        """Mesmas contas do Axes.pie, aplicadas aos artistas já desenhados."""
+        valores = np.asarray(valores)
+        fracoes = valores / valores.sum()
+        theta1 = self.ANGULO_INICIAL / 360
+        for fatia, rotulo, percentual, fracao in zip(self.fatias, self.rotulos, self.percentuais, fracoes):
+            theta2 = theta1 + fracao
+            fatia.set_theta1(360. * theta1)
+            fatia.set_theta2(360. * theta2)
+            thetam = 2 * np.pi * 0.5 * (fatia.theta1 + fatia.theta2) / 360
+            xr = self.DISTANCIA_ROTULO * fatia.r * math.cos(thetam)
+            rotulo.set_position((xr, self.DISTANCIA_ROTULO * fatia.r * math.sin(thetam)))
+            rotulo.set_horizontalalignment('left' if xr > 0 else 'right')
+            percentual.set_position((self.DISTANCIA_PERCENTUAL * fatia.r * math.cos(thetam),
+                                     self.DISTANCIA_PERCENTUAL * fatia.r * math.sin(thetam)))
+            percentual.set_text('%1.1f%%' % (100. * fracao))
+            theta1 = theta2
+
+    def salvar(self, valores, titulo, destino):
+        """'destino' pode ser um caminho ou um arquivo binário aberto (ex: BytesIO)."""
+        if sum(valores) <= 0:
+            raise ValueError('All wedge sizes are zero')
+        nao_vazias = sum(1 for valor in valores if valor > 0)
+        if self.fatias is None or nao_vazias != self.nao_vazias or len(valores) != len(self.fatias):
+            self._desenhar(valores)
+            self.nao_vazias = nao_vazias
+        else:
+            self._atualizar(valores)
+        self.eixo.set_title(titulo)
+        self.figura.savefig(destino, format='png', dpi=self.dpi)
+
+
+_renderizadores = {}
+
+def obter_renderizador(dpi=DPI_PADRAO):
+    """Um renderizador por processo (e por DPI), criado na primeira chamada."""
+    if dpi not in _renderizadores:
+        _renderizadores[dpi] = RenderizadorPizza(dpi)
+    return _renderizadores[dpi]
+
+
+def montar_svg_pizza(valores, titulo, largura=640, altura=480):
+    """
+    Desenha a pizza direto em SVG: três fatias, percentuais e rótulos,
+    começando em 90° e no sentido anti-horário, como no gráfico do matplotlib.
+    """
+    total = sum(valores)
+    cx, cy = largura / 2, altura / 2 + 20
+    raio = min(largura, altura - 60) * 0.38
+    partes = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{largura}" height="{altura}" '
+        f'viewBox="0 0 {largura} {altura}" font-family="DejaVu Sans, Arial, sans-serif">',
+        f'<rect width="{largura}" height="{altura}" fill="white"/>',
+    ]
+    for i, linha in enumerate(str(titulo).split('\n')):
+        partes.append(f'<text x="{cx}" y="{24 + i * 18}" font-size="14" text-anchor="middle">{escape(linha)}</text>')
+
+    angulo = 90.0
+    for valor, rotulo, cor in zip(valores, ROTULOS, CORES):
+        if valor <= 0 or total <= 0:
+            continue
+        fracao = valor / total
+        inicio, fim = angulo, angulo + fracao * 360
+        angulo = fim
+        if fracao >= 1:
+            partes.append(f'<circle cx="{cx}" cy="{cy}" r="{raio:.2f}" fill="{cor}"/>')
+        else:
+            x1, y1 = cx + raio * math.cos(math.radians(inicio)), cy - raio * math.sin(math.radians(inicio))
+            x2, y2 = cx + raio * math.cos(math.radians(fim)), cy - raio * math.sin(math.radians(fim))
+            arco_grande = 1 if fracao > 0.5 else 0
+            partes.append(
+                f'<path d="M{cx:.2f},{cy:.2f} L{x1:.2f},{y1:.2f} '
+                f'A{raio:.2f},{raio:.2f} 0 {arco_grande} 0 {x2:.2f},{y2:.2f} Z" fill="{cor}"/>'
+            )
+        meio = math.radians((inicio + fim) / 2)
+        xp, yp = cx + 0.6 * raio * math.cos(meio), cy - 0.6 * raio * math.sin(meio)
+        xr, yr = cx + 1.1 * raio * math.cos(meio), cy - 1.1 * raio * math.sin(meio)
+        ancora = 'start' if math.cos(meio) >= 0 else 'end'
+        partes.append(f'<text x="{xp:.2f}" y="{yp:.2f}" font-size="12" text-anchor="middle" dominant-baseline="middle">{fracao * 100:.1f}%</text>')
+        partes.append(f'<text x="{xr:.2f}" y="{yr:.2f}" font-size="12" text-anchor="{ancora}" dominant-baseline="middle">{rotulo}</text>')
+
+    partes.append('</svg>')
+    return '\n'.join(partes)
+
+
+def caminho_do_grafico(pasta, nome_arquivo_base, modo):
+    extensao = 'svg' if modo == 'svg' else 'png'
+    return os.path.join(pasta, f'grafico_{nome_arquivo_base}.{extensao}')
+
+
+def gerar_grafico_pizza(valores, titulo, modo='png', dpi=DPI_PADRAO):
+    """Conteúdo do gráfico ('png' ou 'svg') em bytes, sem gravar arquivo."""
+    valores = [int(v) for v in valores]
+    if modo == 'svg':
+        return montar_svg_pizza(valores, titulo).encode('utf-8')
+    destino = io.BytesIO()
+    obter_renderizador(dpi).salvar(valores, titulo, destino)
+    return destino.getvalue()
+
+
+def salvar_grafico_pizza(valores, titulo, pasta, nome_arquivo_base, modo='png', dpi=DPI_PADRAO):
+    """
+    Gera (ou anota para depois) o gráfico de pizza de um procedimento conforme
+    o modo escolhido. Devolve o caminho do arquivo, ou None se nada foi gerado.
+    """
+    if modo == 'nenhum':
+        return None
+
+    valores = [int(v) for v in valores]
+    caminho = caminho_do_grafico(pasta, nome_arquivo_base, modo)
+    if modo == 'svg':
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(montar_svg_pizza(valores, titulo))
+    elif modo == 'adiado':
+        # Cada paciente tem sua própria lista, então processos paralelos não disputam o arquivo.
+        with open(os.path.join(pasta, ARQUIVO_PENDENTES), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'caminho': caminho, 'valores': valores, 'titulo': titulo}, ensure_ascii=False) + '\n')
+    else:
+        obter_renderizador(dpi).salvar(valores, titulo, caminho)
+    return caminho
+
+
+def renderizar_pendentes(pasta_graficos=PASTA_GRAFICOS, dpi=DPI_PADRAO):
+    """Desenha os gráficos anotados no modo 'adiado' e apaga as listas de pendências."""
+    renderizador = obter_renderizador(dpi)
+    total = 0
+    for pasta, _, arquivos in os.walk(pasta_graficos):
+        if ARQUIVO_PENDENTES not in arquivos:
+            continue
+        caminho_lista = os.path.join(pasta, ARQUIVO_PENDENTES)
+        pendentes = {}
+        with open(caminho_lista, 'r', encoding='utf-8') as f:
+            for linha in f:
+                if linha.strip():
+                    item = json.loads(linha)
+                    pendentes[item['caminho']] = item
+        for item in pendentes.values():
+            renderizador.salvar(item['valores'], item['titulo'], item['caminho'])
+        total += len(pendentes)
+        os.remove(caminho_lista)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Desenha os gráficos deixados pendentes no modo 'adiado'.")
+    parser.add_argument('--dpi', type=int, default=DPI_PADRAO)
+    parser.add_argument('--pasta', default=PASTA_GRAFICOS, help=f"Pasta dos gráficos (padrão: {PASTA_GRAFICOS}).")
+    args = parser.parse_args()
+    print(f"✅ {renderizar_pendentes(args.pasta, dpi=args.dpi)} gráfico(s) pendente(s) gerado(s).")
@@ -0,0 +1,142 @@
+import os
+import sqlite3
+from datetime import datetime
+from urllib.request import pathname2url
+
+import pandas as pd
+
+from configuracoes import (
+    ARQUIVO_HISTORICO, COLUNA_PACIENTE, COLUNA_PROCEDIMENTO, COLUNA_STATUS, COLUNA_DATA,
+    STATUS_PRESENTE, STATUS_FALTOU, STATUS_CANCELADO,
+)
+from carregamento import para_esquema_compacto
+from exportacao_excel import LinhasEmStreaming
+
+# Tabela e colunas gravadas pelo 'limpador.py --historico' (ver GravadorHistorico).
+TABELA_CONSULTAS = 'consultas'
+COLUNAS_INTERNAS = {'ocorrencia', 'exportacao_id'}
+
+# Linhas buscadas do cursor por vez ao gravar a aba Dados_Completos.
+LINHAS_POR_LOTE = 10_000
+
+
+def nome_sql(nome):
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+class HistoricoConsultas:
+    """
+    Consultas ao banco do histórico. As contagens por paciente, procedimento
+    e status são feitas pelo próprio SQLite (GROUP BY sobre os índices), e só
+    as tabelas de resumo chegam ao pandas. O banco é aberto só para leitura.
+    """
+
+    def __init__(self, caminho=ARQUIVO_HISTORICO):
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(caminho)
+        self.caminho = caminho
+        self.conexao = sqlite3.connect(f'file:{pathname2url(os.path.abspath(caminho))}?mode=ro', uri=True)
+        self.colunas = [linha[1] for linha in self.conexao.execute(f'PRAGMA table_info({TABELA_CONSULTAS})')
+                        if linha[1] not in COLUNAS_INTERNAS]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+    def fechar(self):
+        self.conexao.close()
+
+    def contar(self):
+        return self.conexao.execute(f'SELECT COUNT(*) FROM {TABELA_CONSULTAS}').fetchone()[0]
+
+    def tabela_cruzada(self, coluna):
+        """
+        O mesmo que agregacao.tabela_cruzada(df, coluna): contagem de cada
+        status por valor da coluna, com linhas e colunas em ordem alfabética.
+        """
+        contagens = pd.DataFrame(
+            self.conexao.execute(
+                f'SELECT {nome_sql(coluna)}, {nome_sql(COLUNA_STATUS)}, COUNT(*) FROM {TABELA_CONSULTAS} '
+                f'WHERE {nome_sql(coluna)} IS NOT NULL AND {nome_sql(COLUNA_STATUS)} IS NOT NULL '
+                f'GROUP BY 1, 2').fetchall(),
+            columns=[coluna, COLUNA_STATUS, 'n'],
+        )
+        tabela = contagens.set_index([coluna, COLUNA_STATUS])['n'].unstack(fill_value=0)
+        return tabela.sort_index().sort_index(axis=1).astype('int64')
+
+    def tabelas(self):
+        """(por paciente, por procedimento), como agregacao.tabelas_do_indice."""
+        return self.tabela_cruzada(COLUNA_PACIENTE), self.tabela_cruzada(COLUNA_PROCEDIMENTO)
+
+    def totais(self):
+        """Presenças, faltas e cancelados de todo o histórico."""
+        por_status = dict(self.conexao.execute(
+            f'SELECT {nome_sql(COLUNA_STATUS)}, COUNT(*) FROM {TABELA_CONSULTAS} GROUP BY 1').fetchall())
+        return tuple(por_status.get(status, 0) for status in (STATUS_PRESENTE, STATUS_FALTOU, STATUS_CANCELADO))
+
+    def _filtro(self, inicio, fim, pacientes):
+        condicoes, parametros = [], []
+        if inicio is not None:
+            condicoes.append(f'{nome_sql(COLUNA_DATA)} >= ?')
+            parametros.append(pd.Timestamp(inicio).isoformat(sep=' '))
+        if fim is not None:
+            condicoes.append(f'{nome_sql(COLUNA_DATA)} < ?')
+            parametros.append(pd.Timestamp(fim).isoformat(sep=' '))
+        if pacientes is not None:
+            pacientes = list(pacientes)
+            condicoes.append(f'{nome_sql(COLUNA_PACIENTE)} IN ({", ".join("?" * len(pacientes))})')
+            parametros.extend(pacientes)
+        return (' WHERE ' + ' AND '.join(condicoes)) if condicoes else '', parametros
+
+    def dados_completos(self, inicio=None, fim=None):
+        """As consultas, na ordem em que entraram no histórico, lidas do cursor em lotes (para a planilha)."""
+        filtro, parametros = self._filtro(inicio, fim, None)
+        cursor = self.conexao.execute(
+            f'SELECT {", ".join(nome_sql(c) for c in self.colunas)} FROM {TABELA_CONSULTAS}{filtro} ORDER BY rowid',
+            parametros)
+        posicao_data = self.colunas.index(COLUNA_DATA) if COLUNA_DATA in self.colunas else None
+
+        def linhas():
+            while True:
+                lote = cursor.fetchmany(LINHAS_POR_LOTE)
+                if not lote:
+                    return
+                for linha in lote:
+                    if posicao_data is not None and linha[posicao_data] is not None:
+                        linha = list(linha)
+                        linha[posicao_data] = datetime.fromisoformat(linha[posicao_data])
+                    yield linha
+
+        return LinhasEmStreaming(list(self.colunas), linhas())
+
+    def carregar(self, inicio=None, fim=None, pacientes=None):
+        """
+        Carrega as consultas (opcionalmente só de um período e/ou de alguns
+        pacientes, filtradas pelo SQLite) no mesmo esquema de
+        carregamento.carregar_dados_limpos, para os kits e a análise temporal.
+        """
+        filtro, parametros = self._filtro(inicio, fim, pacientes)
+        df = pd.read_sql_query(
+            f'SELECT {", ".join(nome_sql(c) for c in self.colunas)} FROM {TABELA_CONSULTAS}{filtro} ORDER BY rowid',
+            self.conexao, params=parametros)
+        if COLUNA_DATA in df.columns:
+            df[COLUNA_DATA] = pd.to_datetime(df[COLUNA_DATA], format='ISO8601').astype('datetime64[s]')
+        return para_esquema_compacto(df)
+
+    def exportacoes(self):
+        """Uma linha por exportação acrescentada, com as consultas novas e atualizadas de cada uma."""
+        return pd.read_sql_query('SELECT * FROM exportacoes ORDER BY id', self.conexao)
+
+
+if __name__ == "__main__":
+    try:
+        with HistoricoConsultas() as historico:
+            print(f"{historico.contar()} consulta(s) no histórico '{historico.caminho}'.")
+            presencas, faltas, cancelados = historico.totais()
+            print(f"Presenças: {presencas} | Faltas: {faltas} | Cancelados: {cancelados}")
+            print("\nExportações acrescentadas:")
+            print(historico.exportacoes().to_string(index=False))
+    except FileNotFoundError:
+        print(f"[ERRO] O histórico '{ARQUIVO_HISTORICO}' não foi encontrado. Rode 'python limpador.py --historico'.")
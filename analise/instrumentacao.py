@@ -0,0 +1,208 @@
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+from datetime import datetime
+
+# As métricas ficam numa pasta própria, ao lado de 'relatorios' e 'graficos',
+# com um objeto JSON por linha. Cada execução ganha um identificador, então
+# várias execuções podem ser acumuladas no mesmo arquivo.
+PASTA_METRICAS = os.path.join('..', 'metricas')
+ARQUIVO_METRICAS = os.path.join(PASTA_METRICAS, 'metricas.jsonl')
+
+# Quantas funções o resumo do --profile mostra no terminal.
+LINHAS_RESUMO_PERFIL = 25
+
+_estado = {
+    'execucao': None,   # identificador da execução atual
+    'arquivo': None,    # arquivo .jsonl das métricas, ou None se desativadas
+    'coletor': None,    # lista que recebe os registros dentro de um trabalhador
+    'perfil': False,    # se os trabalhadores também devem ser perfilados
+    'pasta_perfis': PASTA_METRICAS,
+}
+_perfil_trabalhador = None
+
+
+def pico_memoria_mb():
+    """
+    Pico de memória (RSS) do processo até agora, em MB, ou None se não der
+    para medir.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / 2**20, 1)
+        except (ImportError, AttributeError):
+            return None
+    return _em_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def pico_memoria_filhos_mb():
+    """
+    Maior pico de memória (RSS) entre os processos filhos já encerrados (ex:
+    os trabalhadores), em MB, ou None se não der para medir (Windows). É o
+    pico do maior filho, não a soma deles, e não inclui o processo atual.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return _em_mb(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def _em_mb(maxrss):
+    # ru_maxrss vem em KB no Linux e em bytes no macOS.
+    return round(maxrss / 2**20 if sys.platform == 'darwin' else maxrss / 2**10, 1)
+
+
+def _nova_execucao():
+    return datetime.now().strftime('%Y%m%d_%H%M%S') + f'_{os.getpid()}'
+
+
+def ativar_metricas(caminho=ARQUIVO_METRICAS):
+    """Passa a gravar as métricas das etapas em 'caminho' (JSON lines)."""
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    _estado['arquivo'] = caminho
+    _estado['execucao'] = _estado['execucao'] or _nova_execucao()
+
+
+def metricas_ativas():
+    return _estado['arquivo'] is not None or _estado['coletor'] is not None
+
+
+def configuracao():
+    """Estado a repassar aos processos trabalhadores (ver coletar_metricas)."""
+    return {'execucao': _estado['execucao'], 'metricas': metricas_ativas(),
+            'perfil': _estado['perfil'], 'pasta_perfis': _estado['pasta_perfis']}
+
+
+def registrar(etapa, **campos):
+    """Grava um registro de métrica, se as métricas estiverem ativas."""
+    if not metricas_ativas():
+        return
+    registro = {
+        'execucao': _estado['execucao'],
+        'instante': datetime.now().isoformat(timespec='milliseconds'),
+        'pid': os.getpid(),
+        'etapa': etapa,
+        **campos,
+        'pico_memoria_mb': pico_memoria_mb(),
+    }
+    if _estado['coletor'] is not None:
+        _estado['coletor'].append(registro)
+    else:
+        gravar_registros([registro])
+
+
+def gravar_registros(registros):
+    """Acrescenta registros (ex: vindos dos trabalhadores) ao arquivo de métricas."""
+    if _estado['arquivo'] is None or not registros:
+        return
+    with open(_estado['arquivo'], 'a', encoding='utf-8') as f:
+        f.writelines(json.dumps(registro, ensure_ascii=False) + '\n' for registro in registros)
+
+
+@contextlib.contextmanager
+def medir_etapa(etapa, **campos):
+    """
+    Mede o tempo de um bloco e registra a etapa ao sair dele. O dicionário
+    devolvido pode receber mais campos dentro do bloco (ex: dados['linhas']).
+    Se o bloco lançar uma exceção, ela é registrada e relançada.
+    """
+    dados = dict(campos)
+    inicio = time.perf_counter()
+    try:
+        yield dados
+    except BaseException as e:
+        dados['erro'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        registrar(etapa, duracao_s=round(time.perf_counter() - inicio, 4), **dados)
+
+
+class Subtotais:
+    """Acumula o tempo gasto em cada tipo de tarefa repetida (ex: txt, excel, gráfico)."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.tempos = {}
+        self.quantidades = {}
+
+    @contextlib.contextmanager
+    def medir(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tempos[nome] = self.tempos.get(nome, 0.0) + time.perf_counter() - inicio
+            self.quantidades[nome] = self.quantidades.get(nome, 0) + 1
+
+    def registrar(self, etapa, **campos):
+        registrar(
+            etapa,
+            duracao_s=round(time.perf_counter() - self.inicio, 4),
+            subtotais_s={nome: round(tempo, 4) for nome, tempo in self.tempos.items()},
+            quantidades=dict(self.quantidades),
+            **campos,
+        )
+
+
+@contextlib.contextmanager
+def coletar_metricas(config):
+    """
+    Dentro de um processo trabalhador: guarda os registros numa lista, que é
+    devolvida ao processo principal junto com o resultado e gravada por ele,
+    e perfila o bloco se a execução principal estiver com --profile.
+    """
+    global _perfil_trabalhador
+    _estado['execucao'] = config['execucao']
+    _estado['pasta_perfis'] = config['pasta_perfis']
+    _estado['coletor'] = [] if config['metricas'] else None
+    registros = _estado['coletor'] if _estado['coletor'] is not None else []
+
+    if config['perfil'] and _perfil_trabalhador is None:
+        _perfil_trabalhador = cProfile.Profile()
+    if config['perfil']:
+        _perfil_trabalhador.enable()
+    try:
+        yield registros
+    finally:
+        _estado['coletor'] = None
+        if config['perfil']:
+            _perfil_trabalhador.disable()
+            # O perfil acumula todos os lotes do trabalhador; o arquivo é sobrescrito a cada lote.
+            _perfil_trabalhador.dump_stats(_caminho_perfil(f'trabalhador_{os.getpid()}'))
+
+
+def _caminho_perfil(sufixo):
+    return os.path.join(_estado['pasta_perfis'], f"perfil_{_estado['execucao']}_{sufixo}.prof")
+
+
+def iniciar_perfil(pasta=PASTA_METRICAS):
+    """
+    Começa a perfilar (cProfile) o processo principal e, depois, os
+    trabalhadores. Os arquivos .prof são gravados em 'pasta'.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    _estado['pasta_perfis'] = pasta
+    _estado['execucao'] = _estado['execucao'] or _nova_execucao()
+    _estado['perfil'] = True
+    perfil = cProfile.Profile()
+    perfil.enable()
+    return perfil
+
+
+def encerrar_perfil(perfil):
+    """Para o perfil, grava o .prof e mostra as funções com maior tempo acumulado."""
+    perfil.disable()
+    caminho = _caminho_perfil('principal')
+    perfil.dump_stats(caminho)
+    print(f"\n--- PERFIL DA EXECUÇÃO (top {LINHAS_RESUMO_PERFIL} por tempo acumulado) ---")
+    pstats.Stats(perfil, stream=sys.stdout).sort_stats('cumulative').print_stats(LINHAS_RESUMO_PERFIL)
+    print(f"✅ Perfil completo salvo em: '{caminho}' (abra com 'python -m pstats' ou snakeviz).")
+    print(f"   Perfis dos processos trabalhadores, se houver: '{_caminho_perfil('trabalhador_*')}'")
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+# Fica dentro da pasta de relatórios, ao lado dos kits que descreve.
+ARQUIVO_MANIFESTO = 'manifesto_kits.json'
+
+# Opções da execução gravadas no manifesto ao lado dos hashes. Se alguma
+# mudar (ex: de gráficos png para svg, ou de uma planilha por procedimento
+# para uma por paciente), os kits antigos estão no formato errado e todos são
+# refeitos. 'saida' ausente é de um manifesto anterior ao
+# modo zip, que só gravava em pastas, e 'pastas' (a versão da regra dos nomes
+# das pastas dos pacientes, ver analise_faltas_completas.nome_pasta_paciente)
+# ausente é da primeira regra; as demais, ausentes, contam como mudança.
+OPCOES_DO_MANIFESTO = ['saida', 'graficos', 'dpi', 'excel', 'pastas']
+OPCOES_PADRAO = {'saida': 'pastas', 'pastas': 1}
+
+
+def _resumo(hashes_linhas):
+    return hashlib.sha1(hashes_linhas.tobytes()).hexdigest()
+
+
+def calcular_manifesto(df, indice, extras=None):
+    """
+    Calcula o hash do conteúdo das linhas de cada paciente e de cada fatia
+    (paciente, procedimento). As linhas são hasheadas uma única vez, de forma
+    vetorizada, e cada fatia só combina os hashes das suas posições.
+    'extras' ({paciente: texto}) entra no hash do paciente, para refazer o
+    resumo de quem teve só esse texto alterado (ex: o aviso de duplicados).
+    """
+    hashes_linhas = pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+    pacientes = {}
+    for nome_paciente in indice.pacientes:
+        procedimentos = {
+            str(procedimento): _resumo(hashes_linhas[linhas])
+            for procedimento, linhas, *_ in indice.fatias_do_paciente(nome_paciente)
+        }
+        hash_paciente = _resumo(hashes_linhas[indice.linhas_do_paciente(nome_paciente)])
+        if extras and str(nome_paciente) in extras:
+            hash_paciente = hashlib.sha1((hash_paciente + extras[str(nome_paciente)]).encode('utf-8')).hexdigest()
+        pacientes[str(nome_paciente)] = {
+            'hash': hash_paciente,
+            'procedimentos': procedimentos,
+        }
+    return {'colunas': [str(c) for c in df.columns], 'pacientes': pacientes}
+
+
+def carregar_manifesto(pasta_relatorios):
+    """Lê o manifesto da última execução, ou None se ele não existir/estiver corrompido."""
+    caminho = os.path.join(pasta_relatorios, ARQUIVO_MANIFESTO)
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[AVISO] Manifesto '{caminho}' ignorado, todos os kits serão refeitos. Erro: {e}")
+        return None
+
+
+def salvar_manifesto(pasta_relatorios, manifesto):
+    os.makedirs(pasta_relatorios, exist_ok=True)
+    caminho = os.path.join(pasta_relatorios, ARQUIVO_MANIFESTO)
+    caminho_temporario = caminho + '.tmp'
+    with open(caminho_temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, ensure_ascii=False)
+    os.replace(caminho_temporario, caminho)
+
+
+def opcoes_alteradas(antigo, novo):
+    """Nomes das opções (OPCOES_DO_MANIFESTO) que mudaram desde o manifesto salvo."""
+    return [opcao for opcao in OPCOES_DO_MANIFESTO
+            if antigo.get(opcao, OPCOES_PADRAO.get(opcao)) != novo.get(opcao, OPCOES_PADRAO.get(opcao))]
+
+
+def comparar_manifestos(antigo, novo):
+    """
+    Compara o manifesto salvo com o da base atual.
+
+    Devolve três itens:
+    - alteracoes: {paciente: conjunto de procedimentos a refazer, ou None para
+      refazer o kit inteiro}, só com os pacientes que mudaram;
+    - procedimentos_removidos: {paciente: [procedimentos que sumiram]};
+    - pacientes_removidos: pacientes que não existem mais na base.
+    """
+    pacientes_novos = novo['pacientes']
+    if antigo is None:
+        return {nome: None for nome in pacientes_novos}, {}, []
+
+    # Mesmo quando todos os kits são refeitos, os pacientes que saíram da base
+    # são devolvidos: senão as pastas deles nunca seriam apagadas.
+    pacientes_antigos = antigo.get('pacientes', {})
+    pacientes_removidos = [nome for nome in pacientes_antigos if nome not in pacientes_novos]
+    if antigo.get('colunas') != novo['colunas'] or opcoes_alteradas(antigo, novo):
+        return {nome: None for nome in pacientes_novos}, {}, pacientes_removidos
+
+    alteracoes = {}
+    procedimentos_removidos = {}
+    for nome, dados in pacientes_novos.items():
+        dados_antigos = pacientes_antigos.get(nome)
+        if dados_antigos is None:
+            alteracoes[nome] = None
+            continue
+        if dados_antigos['hash'] == dados['hash']:
+            continue
+
+        procedimentos_antigos = dados_antigos['procedimentos']
+        alteracoes[nome] = {
+            procedimento for procedimento, hash_procedimento in dados['procedimentos'].items()
+            if procedimentos_antigos.get(procedimento) != hash_procedimento
+        }
+        removidos = [p for p in procedimentos_antigos if p not in dados['procedimentos']]
+        if removidos:
+            procedimentos_removidos[nome] = removidos
+
+    return alteracoes, procedimentos_removidos, pacientes_removidos
@@ -0,0 +1,10 @@
+import unicodedata
+
+# Normalização dos nomes de pacientes, a mesma na limpeza (que junta as
+# grafias de um mesmo nome), na busca de duplicados e no servidor de consultas.
+
+
+def chave_do_nome(nome):
+    """'José  da SILVA' -> 'jose da silva': sem acentos, em minúsculas e com espaços simples."""
+    sem_acentos = ''.join(c for c in unicodedata.normalize('NFKD', nome) if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.casefold().split())
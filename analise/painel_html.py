@@ -0,0 +1,326 @@
+import json
+
+import pandas as pd
+
+from configuracoes import STATUS_FALTOU, STATUS_PRESENTE, STATUS_CANCELADO
+from duplicados import COLUNAS_DUPLICADOS
+
+# Painel do relatório consolidado: um único .html, sem dependências externas
+# (abre offline, dá para mandar por e-mail). Os resumos por paciente e por
+# procedimento vão embutidos como JSON em colunas (uma lista por campo, sem
+# repetir os nomes dos campos em cada linha) e as tabelas e os gráficos são
+# desenhados pelo navegador, em vez de um .png por paciente.
+ARQUIVO_PAINEL = 'painel_consolidado.html'
+
+# Quantos itens entram nos gráficos de barras (os demais ficam nas tabelas).
+ITENS_POR_GRAFICO = 15
+
+
+def colunas_do_resumo(df_resumo):
+    """Nomes e contagens de uma tabela de resumo, uma lista por campo."""
+    return {
+        'nomes': df_resumo.index.astype(str).tolist(),
+        'faltas': df_resumo[STATUS_FALTOU].to_numpy(dtype='int64').tolist(),
+        'presencas': df_resumo[STATUS_PRESENTE].to_numpy(dtype='int64').tolist(),
+        'cancelados': df_resumo[STATUS_CANCELADO].to_numpy(dtype='int64').tolist(),
+    }
+
+
+def montar_dados_painel(df_pacientes, df_procedimentos, totais, duplicados=None):
+    """
+    O JSON embutido no painel. 'totais' são (presenças, faltas, cancelados)
+    da clínica toda; as taxas de falta são calculadas no navegador.
+    """
+    dados = {
+        'gerado_em': pd.Timestamp.now().strftime('%d/%m/%Y %H:%M'),
+        'totais': dict(zip(['presencas', 'faltas', 'cancelados'], (int(total) for total in totais))),
+        'pacientes': colunas_do_resumo(df_pacientes),
+        'procedimentos': colunas_do_resumo(df_procedimentos),
+        'duplicados': [],
+    }
+    if duplicados is not None and len(duplicados):
+        dados['duplicados'] = [[str(nome_a), str(nome_b), float(semelhanca)] for nome_a, nome_b, semelhanca
+                               in duplicados[COLUNAS_DUPLICADOS].itertuples(index=False)]
+    # '<' só aparece dentro de textos; escapado, um nome com '</script>' não fecha o bloco.
+    return json.dumps(dados, ensure_ascii=False, separators=(',', ':')).replace('<', '\\u003c')
+
+
+def salvar_painel_html(caminho, df_pacientes, df_procedimentos, totais, duplicados=None):
+    """Grava o painel em 'caminho' e devolve o caminho."""
+    # Os dados entram por último: um nome com '__ITENS_POR_GRAFICO__' não pode ser trocado.
+    html = MODELO_PAINEL.replace('__ITENS_POR_GRAFICO__', str(ITENS_POR_GRAFICO))
+    html = html.replace('__DADOS__', montar_dados_painel(df_pacientes, df_procedimentos, totais, duplicados))
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return caminho
+
+
+MODELO_PAINEL = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Painel de Faltas - Consolidado</title>
+<style>
+  body { font-family: "DejaVu Sans", Arial, sans-serif; margin: 0; background: #f4f5f7; color: #222; }
+  header { background: #1f3b57; color: white; padding: 16px 24px; }
+  header h1 { margin: 0; font-size: 22px; }
+  header p { margin: 4px 0 0; opacity: .8; font-size: 13px; }
+  main { padding: 16px 24px; }
+  .cartoes { display: flex; flex-wrap: wrap; gap: 12px; margin-bottom: 16px; }
+  .cartao { background: white; border-radius: 6px; padding: 12px 16px; min-width: 160px; box-shadow: 0 1px 2px rgba(0,0,0,.1); }
+  .cartao span { display: block; font-size: 12px; color: #666; }
+  .cartao b { font-size: 24px; }
+  .graficos { display: grid; grid-template-columns: repeat(auto-fit, minmax(420px, 1fr)); gap: 16px; margin-bottom: 16px; }
+  section { background: white; border-radius: 6px; padding: 12px 16px; box-shadow: 0 1px 2px rgba(0,0,0,.1); margin-bottom: 16px; }
+  section h2 { font-size: 16px; margin: 0 0 8px; }
+  table { border-collapse: collapse; width: 100%; font-size: 13px; }
+  th, td { padding: 4px 8px; border-bottom: 1px solid #e3e3e3; text-align: right; }
+  th:first-child, td:first-child { text-align: left; }
+  th { cursor: pointer; user-select: none; background: #eef1f4; position: sticky; top: 0; }
+  th.ordem-asc::after { content: " \\25B2"; }
+  th.ordem-desc::after { content: " \\25BC"; }
+  .barra-taxa { display: inline-block; height: 8px; background: #DC143C; margin-left: 6px; vertical-align: middle; }
+  .controles { display: flex; gap: 12px; align-items: center; margin-bottom: 8px; font-size: 13px; }
+  .controles input { padding: 4px 8px; width: 260px; }
+  button { padding: 4px 12px; margin-top: 8px; cursor: pointer; }
+  svg text { font-size: 11px; }
+</style>
+</head>
+<body>
+<header>
+  <h1>Painel de Faltas &mdash; Todos os Pacientes</h1>
+  <p id="gerado-em"></p>
+</header>
+<main>
+  <div class="cartoes" id="cartoes"></div>
+  <div class="graficos">
+    <section><h2>Consultas por situação</h2><div id="grafico-situacao"></div></section>
+    <section><h2>Distribuição da taxa de falta dos pacientes</h2><div id="grafico-distribuicao"></div></section>
+    <section><h2>Procedimentos com maior taxa de falta</h2><div id="grafico-procedimentos"></div></section>
+    <section><h2>Pacientes com mais faltas</h2><div id="grafico-pacientes"></div></section>
+  </div>
+  <section><h2>Desempenho por paciente</h2><div id="tabela-pacientes"></div></section>
+  <section><h2>Análise por procedimento</h2><div id="tabela-procedimentos"></div></section>
+  <section id="secao-duplicados" hidden><h2>Possíveis cadastros duplicados (nomes muito parecidos)</h2><div id="tabela-duplicados"></div></section>
+</main>
+<script type="application/json" id="dados">__DADOS__</script>
+<script>
+"use strict";
+const DADOS = JSON.parse(document.getElementById("dados").textContent);
+const ITENS_POR_GRAFICO = __ITENS_POR_GRAFICO__;
+const LINHAS_POR_PAGINA = 100;
+const CORES = { presencas: "#2E8B57", faltas: "#DC143C", cancelados: "#A9A9A9" };
+const SVG = "http://www.w3.org/2000/svg";
+const numero = new Intl.NumberFormat("pt-BR");
+const percentual = valor => valor.toFixed(1).replace(".", ",") + "%";
+
+// Taxa de falta sobre as consultas válidas (presenças + faltas), como no .txt.
+function comTaxas(resumo) {
+  const n = resumo.nomes.length;
+  resumo.taxas = new Float64Array(n);
+  for (let i = 0; i < n; i++) {
+    const validas = resumo.faltas[i] + resumo.presencas[i];
+    resumo.taxas[i] = validas > 0 ? resumo.faltas[i] / validas * 100 : 0;
+  }
+  return resumo;
+}
+const PACIENTES = comTaxas(DADOS.pacientes);
+const PROCEDIMENTOS = comTaxas(DADOS.procedimentos);
+
+function elemento(tag, atributos, texto) {
+  const el = tag.startsWith("svg:") ? document.createElementNS(SVG, tag.slice(4)) : document.createElement(tag);
+  for (const [nome, valor] of Object.entries(atributos || {})) el.setAttribute(nome, valor);
+  if (texto !== undefined) el.textContent = texto;
+  return el;
+}
+
+function cartoes() {
+  const t = DADOS.totais;
+  const validas = t.presencas + t.faltas;
+  const itens = [
+    ["Pacientes", numero.format(PACIENTES.nomes.length)],
+    ["Presenças", numero.format(t.presencas)],
+    ["Faltas", numero.format(t.faltas)],
+    ["Cancelados", numero.format(t.cancelados)],
+    ["Taxa de falta geral", percentual(validas > 0 ? t.faltas / validas * 100 : 0)],
+  ];
+  const destino = document.getElementById("cartoes");
+  for (const [rotulo, valor] of itens) {
+    const cartao = elemento("div", { class: "cartao" });
+    cartao.append(elemento("span", {}, rotulo), elemento("b", {}, valor));
+    destino.append(cartao);
+  }
+  document.getElementById("gerado-em").textContent = "Gerado em " + DADOS.gerado_em;
+}
+
+function graficoPizza(destino, fatias) {
+  const total = fatias.reduce((soma, f) => soma + f.valor, 0);
+  const svg = elemento("svg:svg", { viewBox: "0 0 420 220", width: "100%" });
+  let angulo = -Math.PI / 2;
+  fatias.forEach((fatia, i) => {
+    const legenda = elemento("svg:g", { transform: `translate(250, ${60 + i * 28})` });
+    legenda.append(elemento("svg:rect", { width: 14, height: 14, fill: fatia.cor }),
+                   elemento("svg:text", { x: 20, y: 12 },
+                            `${fatia.rotulo}: ${numero.format(fatia.valor)} (${percentual(total ? fatia.valor / total * 100 : 0)})`));
+    svg.append(legenda);
+    if (!total || !fatia.valor) return;
+    const fim = angulo + fatia.valor / total * 2 * Math.PI;
+    const ponto = a => `${110 + 95 * Math.cos(a)},${110 + 95 * Math.sin(a)}`;
+    const forma = fatia.valor === total
+      ? elemento("svg:circle", { cx: 110, cy: 110, r: 95, fill: fatia.cor })
+      : elemento("svg:path", { d: `M110,110 L${ponto(angulo)} A95,95 0 ${fim - angulo > Math.PI ? 1 : 0} 1 ${ponto(fim)} Z`, fill: fatia.cor });
+    forma.append(elemento("svg:title", {}, fatia.rotulo));
+    svg.append(forma);
+    angulo = fim;
+  });
+  document.getElementById(destino).append(svg);
+}
+
+function graficoBarras(destino, barras, formatar, cor) {
+  const altura = 22, margem = 210, largura = 420;
+  const maximo = Math.max(...barras.map(b => b.valor), 1e-9);
+  const svg = elemento("svg:svg", { viewBox: `0 0 ${largura + 60} ${Math.max(barras.length, 1) * altura + 4}`, width: "100%" });
+  barras.forEach((barra, i) => {
+    const y = i * altura;
+    const nome = barra.rotulo.length > 32 ? barra.rotulo.slice(0, 31) + "\\u2026" : barra.rotulo;
+    const texto = elemento("svg:text", { x: margem - 6, y: y + 15, "text-anchor": "end" }, nome);
+    texto.append(elemento("svg:title", {}, barra.rotulo));
+    svg.append(texto,
+               elemento("svg:rect", { x: margem, y: y + 4, height: altura - 8, width: (largura - margem) * barra.valor / maximo, fill: cor }),
+               elemento("svg:text", { x: margem + (largura - margem) * barra.valor / maximo + 4, y: y + 15 }, formatar(barra)));
+  });
+  if (!barras.length) svg.append(elemento("svg:text", { x: 10, y: 15 }, "Sem dados."));
+  document.getElementById(destino).append(svg);
+}
+
+function maiores(resumo, chave, filtro) {
+  const ordem = [];
+  for (let i = 0; i < resumo.nomes.length; i++) if (!filtro || filtro(i)) ordem.push(i);
+  ordem.sort((a, b) => resumo[chave][b] - resumo[chave][a] || resumo.faltas[b] - resumo.faltas[a]);
+  return ordem.slice(0, ITENS_POR_GRAFICO);
+}
+
+function graficos() {
+  const t = DADOS.totais;
+  graficoPizza("grafico-situacao", [
+    { rotulo: "Presenças", valor: t.presencas, cor: CORES.presencas },
+    { rotulo: "Faltas", valor: t.faltas, cor: CORES.faltas },
+    { rotulo: "Cancelados", valor: t.cancelados, cor: CORES.cancelados },
+  ]);
+
+  // Faixas de 10 pontos da taxa de falta, só com pacientes que têm consultas válidas.
+  const faixas = new Array(10).fill(0);
+  for (let i = 0; i < PACIENTES.nomes.length; i++) {
+    if (PACIENTES.faltas[i] + PACIENTES.presencas[i] > 0) faixas[Math.min(Math.floor(PACIENTES.taxas[i] / 10), 9)]++;
+  }
+  graficoBarras("grafico-distribuicao",
+                faixas.map((valor, i) => ({ rotulo: `${i * 10}% a ${i === 9 ? "100" : i * 10 + 9.9}%`, valor })),
+                b => numero.format(b.valor) + " paciente(s)", "#1f77b4");
+
+  graficoBarras("grafico-procedimentos",
+                maiores(PROCEDIMENTOS, "taxas", i => PROCEDIMENTOS.faltas[i] + PROCEDIMENTOS.presencas[i] > 0)
+                  .map(i => ({ rotulo: PROCEDIMENTOS.nomes[i], valor: PROCEDIMENTOS.taxas[i], faltas: PROCEDIMENTOS.faltas[i] })),
+                b => `${percentual(b.valor)} (${numero.format(b.faltas)} faltas)`, CORES.faltas);
+  graficoBarras("grafico-pacientes",
+                maiores(PACIENTES, "faltas").map(i => ({ rotulo: PACIENTES.nomes[i], valor: PACIENTES.faltas[i], taxa: PACIENTES.taxas[i] })),
+                b => `${numero.format(b.valor)} (${percentual(b.taxa)})`, CORES.faltas);
+}
+
+// Tabela ordenável e filtrável. Só as linhas visíveis viram elementos da
+// página (de LINHAS_POR_PAGINA em LINHAS_POR_PAGINA), então milhares de
+// pacientes não travam o navegador.
+function tabela(destino, colunas, total, ordemInicial) {
+  const caixa = document.getElementById(destino);
+  const controles = elemento("div", { class: "controles" });
+  const busca = elemento("input", { type: "search", placeholder: "Filtrar por nome..." });
+  const contador = elemento("span");
+  controles.append(busca, contador);
+  const tab = elemento("table");
+  const cabecalho = elemento("tr");
+  const corpo = elemento("tbody");
+  const mais = elemento("button", {}, "Mostrar mais");
+  tab.append(elemento("thead"), corpo);
+  tab.tHead.append(cabecalho);
+  caixa.append(controles, tab, mais);
+
+  let ordem = { coluna: ordemInicial[0], descendente: ordemInicial[1] };
+  let linhas = [], exibidas = 0;
+
+  colunas.forEach((coluna, c) => {
+    const th = elemento("th", {}, coluna.titulo);
+    th.addEventListener("click", () => {
+      ordem = { coluna: c, descendente: ordem.coluna === c ? !ordem.descendente : coluna.numerica };
+      atualizar();
+    });
+    cabecalho.append(th);
+  });
+
+  function atualizar() {
+    const filtro = busca.value.trim().toLocaleLowerCase("pt-BR");
+    const valor = colunas[ordem.coluna].valor;
+    linhas = [];
+    for (let i = 0; i < total; i++) {
+      if (!filtro || colunas[0].valor(i).toLocaleLowerCase("pt-BR").includes(filtro)) linhas.push(i);
+    }
+    const sinal = ordem.descendente ? -1 : 1;
+    linhas.sort(colunas[ordem.coluna].numerica
+      ? (a, b) => sinal * (valor(a) - valor(b))
+      : (a, b) => sinal * valor(a).localeCompare(valor(b), "pt-BR"));
+    Array.from(cabecalho.children).forEach((th, c) => {
+      th.className = c === ordem.coluna ? (ordem.descendente ? "ordem-desc" : "ordem-asc") : "";
+    });
+    corpo.replaceChildren();
+    exibidas = 0;
+    mostrarMais();
+  }
+
+  function mostrarMais() {
+    const fragmento = document.createDocumentFragment();
+    for (const i of linhas.slice(exibidas, exibidas + LINHAS_POR_PAGINA)) {
+      const tr = elemento("tr");
+      for (const coluna of colunas) {
+        const td = elemento("td", {}, coluna.formatar ? coluna.formatar(i) : coluna.valor(i));
+        if (coluna.barra) td.append(elemento("span", { class: "barra-taxa", style: `width:${coluna.valor(i) * 0.6}px` }));
+        tr.append(td);
+      }
+      fragmento.append(tr);
+    }
+    corpo.append(fragmento);
+    exibidas = Math.min(exibidas + LINHAS_POR_PAGINA, linhas.length);
+    contador.textContent = `${numero.format(exibidas)} de ${numero.format(linhas.length)}`;
+    mais.hidden = exibidas >= linhas.length;
+  }
+
+  busca.addEventListener("input", atualizar);
+  mais.addEventListener("click", mostrarMais);
+  atualizar();
+}
+
+function colunasDoResumo(titulo, resumo) {
+  return [
+    { titulo, valor: i => resumo.nomes[i] },
+    { titulo: "Faltas", numerica: true, valor: i => resumo.faltas[i], formatar: i => numero.format(resumo.faltas[i]) },
+    { titulo: "Presenças", numerica: true, valor: i => resumo.presencas[i], formatar: i => numero.format(resumo.presencas[i]) },
+    { titulo: "Cancelados", numerica: true, valor: i => resumo.cancelados[i], formatar: i => numero.format(resumo.cancelados[i]) },
+    { titulo: "Taxa de falta", numerica: true, barra: true, valor: i => resumo.taxas[i], formatar: i => percentual(resumo.taxas[i]) },
+  ];
+}
+
+cartoes();
+graficos();
+tabela("tabela-pacientes", colunasDoResumo("Paciente", PACIENTES), PACIENTES.nomes.length, [1, true]);
+tabela("tabela-procedimentos", colunasDoResumo("Procedimento", PROCEDIMENTOS), PROCEDIMENTOS.nomes.length, [4, true]);
+if (DADOS.duplicados.length) {
+  const pares = DADOS.duplicados;
+  document.getElementById("secao-duplicados").hidden = false;
+  tabela("tabela-duplicados", [
+    { titulo: "Paciente", valor: i => pares[i][0] },
+    { titulo: "Parecido com", valor: i => pares[i][1] },
+    { titulo: "Semelhança", numerica: true, valor: i => pares[i][2], formatar: i => percentual(pares[i][2]) },
+  ], pares.length, [2, true]);
+}
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,127 @@
+import contextlib
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from instrumentacao import coletar_metricas, configuracao, gravar_registros
+
+# Quantos pacientes cada tarefa leva para o processo trabalhador.
+PACIENTES_POR_LOTE = 8
+
+
+def _inicializar_trabalhador():
+    """Cada processo usa seu próprio backend Agg, sem depender de janela."""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _gerar_lote(lote, opcoes_kit, config_instrumentacao):
+    """
+    Gera os kits de um lote de pacientes dentro do processo trabalhador.
+    A saída de cada kit é capturada e devolvida ao processo principal, e
+    um erro em um paciente não interrompe os demais. As métricas dos kits
+    também voltam para o processo principal, que é quem grava o arquivo, e
+    o mesmo vale para os arquivos dos kits no modo de saída 'zip'.
+    """
+    from analise_faltas_completas import gerar_relatorios_completos
+
+    resultados = []
+    with coletar_metricas(config_instrumentacao) as metricas:
+        for nome_paciente, df_paciente, procedimentos_alterados in lote:
+            saida = io.StringIO()
+            erro = artefatos = None
+            with contextlib.redirect_stdout(saida):
+                try:
+                    artefatos = gerar_relatorios_completos(df_paciente, nome_paciente,
+                                                           procedimentos_alterados=procedimentos_alterados, **opcoes_kit)
+                except Exception as e:
+                    erro = f"{type(e).__name__}: {e}"
+            resultados.append((nome_paciente, saida.getvalue(), erro, artefatos))
+    return resultados, metricas
+
+
+def _sem_categorias(df_paciente):
+    """
+    A fatia de uma coluna categórica carrega o dicionário inteiro (todos os
+    pacientes da base); volta para texto antes de mandar para o trabalhador.
+    """
+    for coluna in df_paciente.columns:
+        serie = df_paciente[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            df_paciente[coluna] = serie.astype(serie.cat.categories.dtype)
+    return df_paciente
+
+
+def _lotes(df, indice, alteracoes):
+    lote = []
+    for nome_paciente in indice.pacientes:
+        if alteracoes is not None and str(nome_paciente) not in alteracoes:
+            continue
+        procedimentos_alterados = alteracoes[str(nome_paciente)] if alteracoes is not None else None
+        df_paciente = _sem_categorias(df.iloc[indice.linhas_do_paciente(nome_paciente)].copy())
+        lote.append((nome_paciente, df_paciente, procedimentos_alterados))
+        if len(lote) == PACIENTES_POR_LOTE:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def gerar_kits_em_paralelo(df, indice, workers, alteracoes=None, gravar_artefatos=None, **opcoes_kit):
+    """
+    Distribui os pacientes do índice entre 'workers' processos. Com 'alteracoes'
+    (ver manifesto.comparar_manifestos), só esses pacientes/procedimentos são gerados.
+    'opcoes_kit' são repassadas para gerar_relatorios_completos em cada processo.
+    Os arquivos devolvidos pelos kits (modo de saída 'zip') são entregues a
+    'gravar_artefatos(paciente, artefatos)' no processo principal, na ordem dos pacientes.
+
+    O progresso é impresso na ordem dos pacientes, com a mesma saída do modo
+    sequencial. Só alguns lotes ficam em trânsito por vez, então a memória não
+    cresce com o número de pacientes. Devolve a lista de (paciente, erro) dos
+    kits que falharam.
+    """
+    workers = workers or os.cpu_count() or 1
+    total = len(indice.pacientes) if alteracoes is None else len(alteracoes)
+    concluidos = 0
+    falhas = []
+    config_instrumentacao = configuracao()
+
+    # Os avisos de duplicados são por paciente: cada lote leva só os dos seus pacientes.
+    duplicados = opcoes_kit.pop('duplicados', None) or {}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_trabalhador) as executor:
+        pendentes = deque()
+        lotes = _lotes(df, indice, alteracoes)
+
+        for lote in lotes:
+            opcoes_lote = dict(opcoes_kit, duplicados={
+                str(nome): duplicados[str(nome)] for nome, *_ in lote if str(nome) in duplicados})
+            pendentes.append(executor.submit(_gerar_lote, lote, opcoes_lote, config_instrumentacao))
+            if len(pendentes) < workers * 2:
+                continue
+            concluidos = _imprimir_resultados(pendentes.popleft().result(), concluidos, total, falhas,
+                                              gravar_artefatos)
+
+        while pendentes:
+            concluidos = _imprimir_resultados(pendentes.popleft().result(), concluidos, total, falhas,
+                                              gravar_artefatos)
+
+    return falhas
+
+
+def _imprimir_resultados(resultado_lote, concluidos, total, falhas, gravar_artefatos=None):
+    resultados, metricas = resultado_lote
+    gravar_registros(metricas)
+    for nome_paciente, saida, erro, artefatos in resultados:
+        concluidos += 1
+        print("-" * 50 + f" [{concluidos}/{total}]")
+        print(saida, end='')
+        if erro is not None:
+            print(f"[ERRO] Falha ao gerar o kit de '{nome_paciente}': {erro}")
+            falhas.append((nome_paciente, erro))
+        elif gravar_artefatos is not None and artefatos is not None:
+            gravar_artefatos(nome_paciente, artefatos)
+    return concluidos
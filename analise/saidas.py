@@ -0,0 +1,171 @@
+import io
+import json
+import os
+import zipfile
+from datetime import datetime
+
+from graficos import caminho_do_grafico, gerar_grafico_pizza, salvar_grafico_pizza
+from exportacao_excel import salvar_planilhas
+
+# Onde os kits individuais são gravados:
+# - 'pastas': uma subpasta por paciente em 'relatorios/' e em 'graficos/',
+#   um arquivo por relatório (o layout de sempre);
+# - 'zip': um único 'kits.zip' na pasta de relatórios, com as mesmas subpastas
+#   dentro dele e um índice (indice.json) de paciente -> arquivos. Os kits são
+#   montados em memória (também nos processos paralelos) e só o processo
+#   principal escreve, em sequência, num arquivo só.
+MODOS_SAIDA = ['pastas', 'zip']
+
+ARQUIVO_PACOTE = 'kits.zip'
+ARQUIVO_INDICE_PACOTE = 'indice.json'
+
+# Buffer de escrita do pacote: poucas chamadas de sistema grandes em vez de
+# uma por arquivo do kit.
+BUFFER_PACOTE = 4 * 2**20
+
+# PNG e XLSX já são comprimidos; guardá-los sem recomprimir economiza CPU sem
+# aumentar o pacote. Textos e SVG comprimem bem.
+EXTENSOES_SEM_COMPRESSAO = ('.png', '.xlsx')
+
+
+class SaidaEmPastas:
+    """Grava cada arquivo do kit direto na subpasta do paciente."""
+
+    artefatos = None
+
+    def __init__(self, pasta_relatorios, pasta_graficos):
+        self.pasta_relatorios = pasta_relatorios
+        self.pasta_graficos = pasta_graficos
+
+    def preparar(self, pasta_paciente):
+        os.makedirs(os.path.join(self.pasta_relatorios, pasta_paciente), exist_ok=True)
+        os.makedirs(os.path.join(self.pasta_graficos, pasta_paciente), exist_ok=True)
+
+    def texto(self, pasta_paciente, nome_arquivo, texto):
+        caminho = os.path.join(self.pasta_relatorios, pasta_paciente, nome_arquivo)
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(texto)
+        return caminho
+
+    def planilhas(self, pasta_paciente, nome_arquivo, abas):
+        caminho = os.path.join(self.pasta_relatorios, pasta_paciente, nome_arquivo)
+        salvar_planilhas(abas, caminho)
+        return caminho
+
+    def grafico_pizza(self, pasta_paciente, nome_arquivo_base, valores, titulo, modo, dpi):
+        return salvar_grafico_pizza(valores, titulo, os.path.join(self.pasta_graficos, pasta_paciente),
+                                    nome_arquivo_base, modo, dpi)
+
+
+class SaidaEmPacote:
+    """
+    Monta os arquivos do kit em memória, como (caminho dentro do pacote,
+    conteúdo em bytes), para o PacoteZip gravar depois.
+    """
+
+    def __init__(self):
+        self.artefatos = []
+
+    def preparar(self, pasta_paciente):
+        pass
+
+    def _guardar(self, caminho, conteudo):
+        self.artefatos.append((caminho, conteudo))
+        return caminho
+
+    def texto(self, pasta_paciente, nome_arquivo, texto):
+        return self._guardar(f'relatorios/{pasta_paciente}/{nome_arquivo}', texto.encode('utf-8'))
+
+    def planilhas(self, pasta_paciente, nome_arquivo, abas):
+        destino = io.BytesIO()
+        salvar_planilhas(abas, destino)
+        return self._guardar(f'relatorios/{pasta_paciente}/{nome_arquivo}', destino.getvalue())
+
+    def grafico_pizza(self, pasta_paciente, nome_arquivo_base, valores, titulo, modo, dpi):
+        if modo == 'nenhum':
+            return None
+        nome_arquivo = os.path.basename(caminho_do_grafico('', nome_arquivo_base, modo))
+        return self._guardar(f'graficos/{pasta_paciente}/{nome_arquivo}', gerar_grafico_pizza(valores, titulo, modo, dpi))
+
+
+def criar_saida(modo_saida, pasta_relatorios, pasta_graficos):
+    if modo_saida == 'zip':
+        return SaidaEmPacote()
+    return SaidaEmPastas(pasta_relatorios, pasta_graficos)
+
+
+def ler_indice_do_pacote(pacote):
+    return json.loads(pacote.read(ARQUIVO_INDICE_PACOTE).decode('utf-8'))['pacientes']
+
+
+class PacoteZip:
+    """
+    Grava os kits de todos os pacientes num único .zip, em sequência e com
+    buffer grande. O pacote é montado num arquivo temporário que só substitui
+    o anterior em fechar(), então uma execução interrompida não estraga o
+    último pacote bom. Com 'reaproveitar_anterior', o pacote anterior fica
+    aberto para copiar_do_anterior() (modo incremental).
+    """
+
+    def __init__(self, caminho, reaproveitar_anterior=False):
+        self.caminho = caminho
+        self.caminho_temporario = caminho + '.tmp'
+        self.indice = {}
+        self.anterior = None
+        self.indice_anterior = {}
+        if reaproveitar_anterior and os.path.exists(caminho):
+            try:
+                self.anterior = zipfile.ZipFile(caminho)
+                self.indice_anterior = ler_indice_do_pacote(self.anterior)
+            except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+                print(f"[AVISO] Pacote anterior '{caminho}' ignorado, todos os kits serão refeitos. Erro: {e}")
+                if self.anterior is not None:
+                    self.anterior.close()
+                self.anterior = None
+
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        self.arquivo = open(self.caminho_temporario, 'wb', buffering=BUFFER_PACOTE)
+        self.zip = zipfile.ZipFile(self.arquivo, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+
+    @property
+    def tem_anterior(self):
+        return self.anterior is not None
+
+    def gravar(self, nome_paciente, artefatos):
+        for nome, conteudo in artefatos:
+            compressao = zipfile.ZIP_STORED if nome.endswith(EXTENSOES_SEM_COMPRESSAO) else zipfile.ZIP_DEFLATED
+            self.zip.writestr(nome, conteudo, compress_type=compressao)
+        self.indice[str(nome_paciente)] = [nome for nome, _ in artefatos]
+
+    def copiar_do_anterior(self, pacientes):
+        """
+        Copia do pacote anterior (com a mesma data e compressão) os arquivos
+        dos pacientes que não mudaram. Devolve quantos pacientes foram copiados.
+        """
+        copiados = 0
+        for nome_paciente in pacientes:
+            nome_paciente = str(nome_paciente)
+            arquivos = self.indice_anterior.get(nome_paciente)
+            if self.anterior is None or arquivos is None or nome_paciente in self.indice:
+                continue
+            for nome in arquivos:
+                info = self.anterior.getinfo(nome)
+                self.zip.writestr(info, self.anterior.read(info))
+            self.indice[nome_paciente] = list(arquivos)
+            copiados += 1
+        return copiados
+
+    def fechar(self, sucesso=True):
+        try:
+            if sucesso:
+                conteudo = {'gerado_em': datetime.now().isoformat(timespec='seconds'), 'pacientes': self.indice}
+                self.zip.writestr(ARQUIVO_INDICE_PACOTE, json.dumps(conteudo, ensure_ascii=False, indent=1))
+            self.zip.close()
+            self.arquivo.close()
+        finally:
+            if self.anterior is not None:
+                self.anterior.close()
+        if sucesso:
+            os.replace(self.caminho_temporario, self.caminho)
+        else:
+            os.remove(self.caminho_temporario)
@@ -0,0 +1,492 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, quote, urlsplit
+
+import pandas as pd
+
+from configuracoes import ARQUIVO_ENTRADA_LIMPO, COLUNA_PACIENTE, COLUNA_ID_PACIENTE
+from agregacao import IndiceAgregado, construir_indice, resumo_do_paciente
+from carregamento import carregar_dados_limpos
+from nomes import chave_do_nome
+from graficos import DPI_PADRAO, gerar_grafico_pizza
+from exportacao_excel import salvar_planilha, salvar_planilhas
+from analise_faltas_completas import nome_pasta_paciente, nome_arquivo_procedimento
+from instrumentacao import ARQUIVO_METRICAS, ativar_metricas, medir_etapa, registrar
+
+# Serviço local de consultas: carrega a base limpa uma vez, monta o índice por
+# paciente e procedimento e responde na hora com os números do kit de um
+# paciente, o gráfico de pizza e a planilha, sem gerar os kits de todos.
+# Só usa a biblioteca padrão (asyncio); é feito para rodar na rede da clínica.
+HOST_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8765
+
+# De quanto em quanto tempo o arquivo .arrow é conferido para recarregar a base.
+INTERVALO_RECARGA_S = 2.0
+
+# Limites do cache dos gráficos e planilhas já gerados (os menos usados saem primeiro).
+ITENS_CACHE = 256
+BYTES_CACHE = 64 * 2**20
+
+LIMITE_BUSCA = 50
+TEMPO_OCIOSO_S = 15
+TAMANHO_MAXIMO_CABECALHO = 16 * 1024
+
+TIPO_JSON = 'application/json; charset=utf-8'
+TIPO_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+AJUDA_ROTAS = {
+    '/saude': "estado do serviço e da base carregada",
+    '/pacientes?busca=TEXTO&limite=N': "pacientes cujo nome contém TEXTO",
+    '/paciente?nome=NOME': "presenças, faltas, cancelados e taxa de falta, por procedimento e no total",
+    '/grafico.png?nome=NOME[&procedimento=PROC]': "gráfico de pizza (PNG) do procedimento ou do total",
+    '/grafico.svg?nome=NOME[&procedimento=PROC]': "o mesmo gráfico em SVG",
+    '/planilha.xlsx?nome=NOME[&procedimento=PROC]': "consultas do procedimento, ou do paciente com uma aba por procedimento",
+    'NOME': "nome do paciente, com qualquer acentuação, maiúsculas e espaços, ou o Paciente_ID",
+}
+
+
+class ErroConsulta(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+@dataclass
+class Resposta:
+    status: int
+    tipo: str
+    corpo: bytes
+    cabecalhos: dict = field(default_factory=dict)
+    origem: str = 'gerado'   # 'cache' quando o conteúdo veio do cache
+
+
+def resposta_json(dados, status=HTTPStatus.OK):
+    return Resposta(status, TIPO_JSON, json.dumps(dados, ensure_ascii=False).encode('utf-8'))
+
+
+# --- BASE EM MEMÓRIA ---
+@dataclass
+class BaseCarregada:
+    df: pd.DataFrame
+    indice: IndiceAgregado
+    versao: int
+    assinatura: tuple           # (mtime, tamanho, inode) do arquivo quando foi lido
+    carregada_em: str
+    nomes_busca: pd.Series      # nomes dos pacientes em minúsculas, para a busca
+    pacientes_por_chave: dict   # nome normalizado e Paciente_ID -> nome do paciente no índice
+
+
+def assinatura_do_arquivo(caminho):
+    """Identifica a versão do arquivo em disco, ou None se ele não existir."""
+    try:
+        info = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return (info.st_mtime_ns, info.st_size, info.st_ino)
+
+
+def _pacientes_por_chave(df, pacientes):
+    """
+    O nome pedido é procurado pela mesma chave com que o limpador junta as
+    grafias ('JOSÉ  da silva' acha 'José da Silva') ou pelo Paciente_ID.
+    """
+    chaves = {chave_do_nome(str(nome)): nome for nome in pacientes}
+    if COLUNA_ID_PACIENTE in df.columns:
+        pares = df[[COLUNA_ID_PACIENTE, COLUNA_PACIENTE]].dropna().drop_duplicates()
+        chaves.update(zip(pares[COLUNA_ID_PACIENTE].astype(str), pares[COLUNA_PACIENTE]))
+    return chaves
+
+
+def carregar_base_em_memoria(caminho, versao):
+    """
+    Lê a base (sem mapear o arquivo, para o limpador poder substituí-lo) e
+    monta o índice por paciente. A assinatura é tirada antes da leitura: se o
+    arquivo mudar durante ela, a próxima conferência carrega de novo.
+    """
+    assinatura = assinatura_do_arquivo(caminho)
+    with medir_etapa('carregar_servidor', arquivo=caminho, versao=versao) as metricas:
+        df = carregar_dados_limpos(caminho, mapear_memoria=False)
+        indice = construir_indice(df)
+        metricas['linhas'] = len(df)
+        metricas['pacientes'] = len(indice.pacientes)
+    return BaseCarregada(
+        df=df,
+        indice=indice,
+        versao=versao,
+        assinatura=assinatura,
+        carregada_em=datetime.now().isoformat(timespec='seconds'),
+        nomes_busca=pd.Series(indice.pacientes.astype(str)).str.casefold(),
+        pacientes_por_chave=_pacientes_por_chave(df, indice.pacientes),
+    )
+
+
+class CacheLRU:
+    """Respostas já geradas (PNG, SVG, XLSX), limitadas em quantidade e em bytes."""
+
+    def __init__(self, max_itens=ITENS_CACHE, max_bytes=BYTES_CACHE):
+        self.max_itens = max_itens
+        self.max_bytes = max_bytes
+        self.itens = OrderedDict()
+        self.bytes = 0
+        self.acertos = 0
+        self.perdas = 0
+
+    def obter(self, chave):
+        resposta = self.itens.get(chave)
+        if resposta is None:
+            self.perdas += 1
+            return None
+        self.itens.move_to_end(chave)
+        self.acertos += 1
+        return resposta
+
+    def guardar(self, chave, resposta):
+        if self.max_itens <= 0 or len(resposta.corpo) > self.max_bytes:
+            return
+        anterior = self.itens.pop(chave, None)
+        if anterior is not None:
+            self.bytes -= len(anterior.corpo)
+        self.itens[chave] = resposta
+        self.bytes += len(resposta.corpo)
+        while len(self.itens) > self.max_itens or self.bytes > self.max_bytes:
+            _, removida = self.itens.popitem(last=False)
+            self.bytes -= len(removida.corpo)
+
+    def limpar(self):
+        self.itens.clear()
+        self.bytes = 0
+
+    def estatisticas(self):
+        return {'itens': len(self.itens), 'bytes': self.bytes, 'acertos': self.acertos, 'perdas': self.perdas}
+
+
+# --- GERAÇÃO DOS ARQUIVOS (rodam fora do laço de eventos) ---
+def _valores_da_pizza(fatias):
+    presencas = sum(int(f[2]) for f in fatias)
+    faltas = sum(int(f[3]) for f in fatias)
+    cancelados = sum(int(f[4]) for f in fatias)
+    return [presencas, faltas, cancelados]
+
+
+def _titulo_do_grafico(nome_do_paciente, procedimento):
+    # Com procedimento, o mesmo título dos gráficos dos kits; o resumo geral
+    # (todos os procedimentos juntos) só existe aqui, os kits não têm esse gráfico.
+    if procedimento is None:
+        return f'Resumo geral\nPaciente: {nome_do_paciente}'
+    return f'Resumo de: {procedimento}\nPaciente: {nome_do_paciente}'
+
+
+def gerar_planilha(df, fatias, procedimento):
+    """Planilha do procedimento (como no modo 'por_procedimento') ou do paciente (uma aba por procedimento)."""
+    destino = io.BytesIO()
+    if procedimento is not None:
+        salvar_planilha(df.iloc[fatias[0][1]], destino)
+    else:
+        salvar_planilhas([(proc, df.iloc[linhas], False) for proc, linhas, *_ in fatias], destino)
+    return destino.getvalue()
+
+
+def _cabecalho_download(nome_arquivo):
+    return {'Content-Disposition': f"attachment; filename=\"{nome_arquivo.encode('ascii', 'replace').decode()}\"; "
+                                   f"filename*=UTF-8''{quote(nome_arquivo)}"}
+
+
+# --- SERVIDOR ---
+class ServidorConsultas:
+
+    def __init__(self, caminho_dados=ARQUIVO_ENTRADA_LIMPO, dpi=DPI_PADRAO,
+                 intervalo_recarga=INTERVALO_RECARGA_S, cache=None):
+        self.caminho_dados = caminho_dados
+        self.dpi = dpi
+        self.intervalo_recarga = intervalo_recarga
+        self.cache = cache if cache is not None else CacheLRU()
+        self.base = None
+        self.assinatura_com_erro = None
+        # O matplotlib não é seguro entre threads: os gráficos e planilhas são
+        # gerados um de cada vez, numa thread só, sem travar o laço de eventos.
+        self.geracao = ThreadPoolExecutor(max_workers=1, thread_name_prefix='geracao')
+        self.rotas = {
+            '/': self.rota_saude,
+            '/saude': self.rota_saude,
+            '/pacientes': self.rota_pacientes,
+            '/paciente': self.rota_paciente,
+            '/grafico.png': self.rota_grafico_png,
+            '/grafico.svg': self.rota_grafico_svg,
+            '/planilha.xlsx': self.rota_planilha,
+        }
+
+    async def carregar(self):
+        """Carrega (ou recarrega) a base numa thread e troca a versão em uso de uma vez só."""
+        versao = self.base.versao + 1 if self.base is not None else 1
+        inicio = time.perf_counter()
+        base = await asyncio.get_running_loop().run_in_executor(
+            None, carregar_base_em_memoria, self.caminho_dados, versao)
+        self.base = base
+        self.cache.limpar()
+        print(f"✅ Base carregada (versão {versao}): {len(base.df)} linhas, {len(base.indice.pacientes)} "
+              f"pacientes, em {time.perf_counter() - inicio:.1f}s.")
+
+    async def vigiar_arquivo(self):
+        """Recarrega a base sempre que o limpador grava um novo arquivo .arrow."""
+        while True:
+            await asyncio.sleep(self.intervalo_recarga)
+            assinatura = assinatura_do_arquivo(self.caminho_dados)
+            if assinatura is None or assinatura in (self.base.assinatura, self.assinatura_com_erro):
+                continue
+            print(f"Nova versão de '{self.caminho_dados}' encontrada, recarregando...")
+            try:
+                await self.carregar()
+            except Exception as e:
+                # Um arquivo com problema não derruba o serviço: a versão anterior continua no ar.
+                self.assinatura_com_erro = assinatura
+                print(f"[ERRO] Falha ao recarregar a base, a versão anterior continua em uso: {e}")
+
+    # --- Rotas ---
+    async def rota_saude(self, base, parametros):
+        return resposta_json({
+            'status': 'ok',
+            'arquivo': self.caminho_dados,
+            'versao': base.versao,
+            'carregada_em': base.carregada_em,
+            'linhas': len(base.df),
+            'pacientes': len(base.indice.pacientes),
+            'procedimentos': len(base.indice.procedimentos),
+            'cache': self.cache.estatisticas(),
+            'rotas': AJUDA_ROTAS,
+        })
+
+    async def rota_pacientes(self, base, parametros):
+        busca = parametros.get('busca', '').strip().casefold()
+        limite = _inteiro(parametros.get('limite'), LIMITE_BUSCA)
+        if busca:
+            encontrados = base.nomes_busca.index[base.nomes_busca.str.contains(busca, regex=False)]
+        else:
+            encontrados = base.nomes_busca.index
+        nomes = base.indice.pacientes[encontrados[:limite]]
+        return resposta_json({'total': len(encontrados), 'pacientes': [str(nome) for nome in nomes]})
+
+    async def rota_paciente(self, base, parametros):
+        nome = _paciente_pedido(base, parametros)
+        resumo = resumo_do_paciente(base.indice, nome)
+        if resumo is None:
+            raise ErroConsulta(HTTPStatus.NOT_FOUND, f"Paciente '{nome}' não encontrado.")
+        return resposta_json(resumo)
+
+    async def rota_grafico_png(self, base, parametros):
+        nome, procedimento, fatias = _fatias_pedidas(base, parametros)
+        valores = _valores_para_grafico(fatias)
+        return await self._gerar_com_cache(
+            (base.versao, 'png', nome, procedimento, self.dpi), 'image/png',
+            gerar_grafico_pizza, valores, _titulo_do_grafico(nome, procedimento), 'png', self.dpi)
+
+    async def rota_grafico_svg(self, base, parametros):
+        nome, procedimento, fatias = _fatias_pedidas(base, parametros)
+        valores = _valores_para_grafico(fatias)
+        svg = gerar_grafico_pizza(valores, _titulo_do_grafico(nome, procedimento), 'svg')
+        return Resposta(HTTPStatus.OK, 'image/svg+xml; charset=utf-8', svg)
+
+    async def rota_planilha(self, base, parametros):
+        nome, procedimento, fatias = _fatias_pedidas(base, parametros)
+        if procedimento is None:
+            nome_arquivo = f'relatorio_procedimentos_{nome_pasta_paciente(nome)}.xlsx'
+        else:
+            nome_arquivo = f'relatorio_{nome_pasta_paciente(nome)}_{nome_arquivo_procedimento(procedimento)}.xlsx'
+        return await self._gerar_com_cache(
+            (base.versao, 'xlsx', nome, procedimento), TIPO_XLSX,
+            gerar_planilha, base.df, fatias, procedimento, cabecalhos=_cabecalho_download(nome_arquivo))
+
+    async def _gerar_com_cache(self, chave, tipo, funcao, *argumentos, cabecalhos=None):
+        resposta = self.cache.obter(chave)
+        if resposta is not None:
+            return Resposta(resposta.status, resposta.tipo, resposta.corpo, resposta.cabecalhos, 'cache')
+        corpo = await asyncio.get_running_loop().run_in_executor(self.geracao, funcao, *argumentos)
+        resposta = Resposta(HTTPStatus.OK, tipo, corpo, cabecalhos or {})
+        self.cache.guardar(chave, resposta)
+        return resposta
+
+    async def responder(self, metodo, alvo):
+        if metodo not in ('GET', 'HEAD'):
+            return resposta_json({'erro': "Só GET e HEAD são aceitos."}, HTTPStatus.METHOD_NOT_ALLOWED)
+        partes = urlsplit(alvo)
+        rota = self.rotas.get(partes.path.rstrip('/') or '/')
+        if rota is None:
+            return resposta_json({'erro': f"Rota '{partes.path}' não existe.", 'rotas': AJUDA_ROTAS},
+                                 HTTPStatus.NOT_FOUND)
+        # A base em uso é lida uma vez: uma recarga no meio da consulta não mistura versões.
+        base = self.base
+        parametros = {chave: valores[-1] for chave, valores in parse_qs(partes.query).items()}
+        try:
+            return await rota(base, parametros)
+        except ErroConsulta as e:
+            return resposta_json({'erro': str(e)}, e.status)
+        except Exception as e:
+            print(f"[ERRO] Falha ao responder '{alvo}': {type(e).__name__}: {e}")
+            return resposta_json({'erro': f"{type(e).__name__}: {e}"}, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    # --- HTTP ---
+    async def atender(self, leitor, escritor):
+        """Atende uma conexão, com várias requisições seguidas (keep-alive do HTTP/1.1)."""
+        try:
+            while True:
+                try:
+                    linha = await asyncio.wait_for(leitor.readline(), TEMPO_OCIOSO_S)
+                except asyncio.TimeoutError:
+                    break
+                if not linha.strip():
+                    break
+                cabecalhos = await _ler_cabecalhos(leitor)
+                inicio = time.perf_counter()
+                try:
+                    metodo, alvo, versao_http = linha.decode('latin-1').split()
+                except ValueError:
+                    metodo, alvo, versao_http = '?', linha.decode('latin-1').strip(), 'HTTP/1.0'
+                    resposta = resposta_json({'erro': "Requisição inválida."}, HTTPStatus.BAD_REQUEST)
+                else:
+                    resposta = await self.responder(metodo, alvo)
+
+                manter_conexao = (versao_http == 'HTTP/1.1' and metodo in ('GET', 'HEAD')
+                                  and cabecalhos.get('connection', '').lower() != 'close')
+                _escrever_resposta(escritor, resposta, manter_conexao, incluir_corpo=metodo != 'HEAD')
+                await escritor.drain()
+
+                duracao = time.perf_counter() - inicio
+                print(f"{int(resposta.status)} {metodo} {alvo} ({duracao * 1000:.1f} ms, {resposta.origem})")
+                registrar('consulta', rota=urlsplit(alvo).path, status=int(resposta.status),
+                          duracao_s=round(duracao, 4), origem=resposta.origem, bytes=len(resposta.corpo))
+                if not manter_conexao:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+
+async def _ler_cabecalhos(leitor):
+    cabecalhos = {}
+    lidos = 0
+    while True:
+        linha = await asyncio.wait_for(leitor.readline(), TEMPO_OCIOSO_S)
+        lidos += len(linha)
+        if lidos > TAMANHO_MAXIMO_CABECALHO:
+            raise ValueError("cabeçalho grande demais")
+        if linha in (b'\r\n', b'\n', b''):
+            return cabecalhos
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        cabecalhos[nome.strip().lower()] = valor.strip()
+
+
+def _escrever_resposta(escritor, resposta, manter_conexao, incluir_corpo=True):
+    status = HTTPStatus(resposta.status)
+    linhas = [
+        f'HTTP/1.1 {status.value} {status.phrase}',
+        f'Content-Type: {resposta.tipo}',
+        f'Content-Length: {len(resposta.corpo)}',
+        f"Connection: {'keep-alive' if manter_conexao else 'close'}",
+        'Cache-Control: no-cache',
+    ]
+    linhas += [f'{nome}: {valor}' for nome, valor in resposta.cabecalhos.items()]
+    escritor.write(('\r\n'.join(linhas) + '\r\n\r\n').encode('latin-1'))
+    if incluir_corpo:
+        escritor.write(resposta.corpo)
+
+
+def _inteiro(texto, padrao):
+    try:
+        return max(int(texto), 0)
+    except (TypeError, ValueError):
+        return padrao
+
+
+def _parametro_obrigatorio(parametros, nome):
+    valor = parametros.get(nome, '').strip()
+    if not valor:
+        raise ErroConsulta(HTTPStatus.BAD_REQUEST, f"Informe o parâmetro '{nome}'.")
+    return valor
+
+
+def _paciente_pedido(base, parametros):
+    """Nome do paciente no índice para o parâmetro 'nome' (nome ou Paciente_ID), ou ErroConsulta 400/404."""
+    pedido = _parametro_obrigatorio(parametros, 'nome')
+    nome = base.pacientes_por_chave.get(pedido)
+    if nome is None:
+        nome = base.pacientes_por_chave.get(chave_do_nome(pedido))
+    if nome is None:
+        raise ErroConsulta(HTTPStatus.NOT_FOUND, f"Paciente '{pedido}' não encontrado.")
+    return nome
+
+
+def _fatias_pedidas(base, parametros):
+    """(paciente, procedimento ou None, fatias do índice) do pedido, ou ErroConsulta 400/404."""
+    nome = _paciente_pedido(base, parametros)
+    fatias = base.indice.fatias_do_paciente(nome)
+    if not fatias:
+        raise ErroConsulta(HTTPStatus.NOT_FOUND, f"Paciente '{nome}' não encontrado.")
+    procedimento = parametros.get('procedimento')
+    if procedimento is not None:
+        fatias = [fatia for fatia in fatias if str(fatia[0]) == procedimento]
+        if not fatias:
+            raise ErroConsulta(HTTPStatus.NOT_FOUND,
+                               f"O paciente '{nome}' não tem consultas de '{procedimento}'.")
+    return nome, procedimento, fatias
+
+
+def _valores_para_grafico(fatias):
+    valores = _valores_da_pizza(fatias)
+    if sum(valores) == 0:
+        raise ErroConsulta(HTTPStatus.NOT_FOUND, "Não há presenças, faltas ou cancelamentos para desenhar.")
+    return valores
+
+
+async def servir(servidor, host=HOST_PADRAO, porta=PORTA_PADRAO):
+    try:
+        await servidor.carregar()
+    except FileNotFoundError:
+        print(f"[ERRO] O arquivo '{servidor.caminho_dados}' não foi encontrado. Rode o 'limpador.py' antes.")
+        return 1
+
+    tcp = await asyncio.start_server(servidor.atender, host, porta)
+    vigia = asyncio.create_task(servidor.vigiar_arquivo())
+    print(f"✅ Servidor de consultas em http://{host}:{porta}/ (Ctrl+C para encerrar)")
+    try:
+        async with tcp:
+            await tcp.serve_forever()
+    finally:
+        vigia.cancel()
+        servidor.geracao.shutdown(wait=False)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serviço HTTP local com os números, gráficos e planilhas de cada paciente, sob demanda.")
+    parser.add_argument('--host', default=HOST_PADRAO,
+                        help=f"Endereço de escuta (padrão: {HOST_PADRAO}; use 0.0.0.0 para a rede da clínica).")
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--dados', default=ARQUIVO_ENTRADA_LIMPO,
+                        help=f"Base limpa a servir (padrão: {ARQUIVO_ENTRADA_LIMPO}); é recarregada quando muda.")
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_RECARGA_S,
+                        help=f"Segundos entre as conferências do arquivo (padrão: {INTERVALO_RECARGA_S}).")
+    parser.add_argument('--cache', type=int, default=ITENS_CACHE,
+                        help=f"Quantos gráficos/planilhas ficam no cache (padrão: {ITENS_CACHE}; 0 desliga).")
+    parser.add_argument('--dpi', type=int, default=DPI_PADRAO)
+    parser.add_argument('--metricas', nargs='?', const=ARQUIVO_METRICAS, default=None, metavar='ARQUIVO',
+                        help=f"Grava cada consulta e recarga em JSON lines (padrão: {ARQUIVO_METRICAS}).")
+    args = parser.parse_args()
+
+    if args.metricas:
+        ativar_metricas(args.metricas)
+    servidor = ServidorConsultas(args.dados, args.dpi, args.intervalo, CacheLRU(args.cache))
+    try:
+        sys.exit(asyncio.run(servir(servidor, args.host, args.porta)))
+    except KeyboardInterrupt:
+        print("\nServidor encerrado.")
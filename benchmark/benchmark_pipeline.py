@@ -0,0 +1,209 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analise'))
+from gerador_sintetico import gerar_exportacao, salvar_exportacao
+from instrumentacao import pico_memoria_mb, pico_memoria_filhos_mb
+
+PASTA_BENCHMARK = os.path.dirname(os.path.abspath(__file__))
+PASTA_PROJETO = os.path.dirname(PASTA_BENCHMARK)
+
+ETAPAS = ['limpeza', 'individual', 'consolidado']
+TAMANHOS_PADRAO = [1_000, 10_000, 100_000, 1_000_000]
+
+ARQUIVO_BASE = os.path.join(PASTA_BENCHMARK, 'resultados_base.json')
+ARQUIVO_ULTIMA_EXECUCAO = os.path.join(PASTA_BENCHMARK, 'resultados_ultima_execucao.json')
+PASTA_TRABALHO = os.path.join(PASTA_BENCHMARK, 'trabalho')
+
+# Uma etapa é considerada mais lenta/pesada que a base acima desta margem.
+TOLERANCIA_PADRAO = 0.20
+# Tempos menores que isso variam demais entre execuções para serem comparados.
+TEMPO_MINIMO_COMPARAVEL = 0.5
+
+
+def _rodar_etapa(etapa, pasta_trabalho, opcoes, fila):
+    """
+    Executa uma etapa do pipeline num processo novo, a partir da mesma pasta
+    em que o script seria rodado (os caminhos do projeto são relativos, '..').
+    A saída dos scripts é descartada; só o tempo e a memória voltam pela fila.
+    """
+    pasta_scripts = 'limpeza' if etapa == 'limpeza' else 'analise'
+    sys.path.insert(0, os.path.join(PASTA_PROJETO, pasta_scripts))
+    os.chdir(os.path.join(pasta_trabalho, pasta_scripts))
+
+    try:
+        with open(os.devnull, 'w', encoding='utf-8') as nulo, contextlib.redirect_stdout(nulo):
+            inicio = time.perf_counter()
+            if etapa == 'limpeza':
+                import limpador
+                limpador.limpar_e_salvar_planilha_excel()
+            elif etapa == 'individual':
+                import analise_faltas_completas
+                analise_faltas_completas.rodar_analise_individual(
+                    workers=opcoes['workers'], modo_graficos=opcoes['graficos'], modo_excel=opcoes['excel'],
+                    modo_saida=opcoes['saida'])
+            else:
+                import analise_faltas_completas
+                from carregamento import carregar_dados_limpos
+                analise_faltas_completas.gerar_relatorio_geral_consolidado(
+                    carregar_dados_limpos(), painel=opcoes['painel'])
+            tempo = time.perf_counter() - inicio
+        # O pico da etapa e o do maior trabalhador ficam separados: somá-los daria
+        # um número que nenhum processo chegou a usar.
+        fila.put({'tempo_s': round(tempo, 3), 'pico_memoria_mb': pico_memoria_mb(),
+                  'pico_memoria_filhos_mb': pico_memoria_filhos_mb()})
+    except Exception as e:
+        fila.put({'erro': f"{type(e).__name__}: {e}"})
+
+
+def medir_etapa(etapa, pasta_trabalho, opcoes):
+    contexto = multiprocessing.get_context('spawn')
+    fila = contexto.Queue()
+    processo = contexto.Process(target=_rodar_etapa, args=(etapa, pasta_trabalho, opcoes, fila))
+    processo.start()
+    processo.join()
+    if fila.empty():
+        return {'erro': f"processo terminou com código {processo.exitcode}"}
+    return fila.get()
+
+
+def preparar_pasta(linhas, opcoes):
+    """Cria uma pasta de trabalho com a estrutura do projeto e a exportação sintética."""
+    pasta = os.path.join(PASTA_TRABALHO, str(linhas))
+    shutil.rmtree(pasta, ignore_errors=True)
+    for subpasta in ('limpeza', 'analise'):
+        os.makedirs(os.path.join(pasta, subpasta))
+
+    df = gerar_exportacao(linhas, procedimentos=opcoes['procedimentos'], semente=opcoes['semente'])
+    salvar_exportacao(df, os.path.join(pasta, 'limpeza', 'amplimed.xlsx'))
+    return pasta
+
+
+def rodar_benchmark(tamanhos, etapas, opcoes):
+    resultados = []
+    for linhas in tamanhos:
+        print(f"\n--- {linhas} linhas ---")
+        inicio = time.perf_counter()
+        pasta = preparar_pasta(linhas, opcoes)
+        print(f"Exportação sintética gerada em {time.perf_counter() - inicio:.1f}s.")
+
+        for etapa in ETAPAS:
+            if etapa not in etapas:
+                continue
+            if etapa == 'individual' and opcoes['limite_individual'] and linhas > opcoes['limite_individual']:
+                print(f"  {etapa:<12} pulada (acima de --limite-individual {opcoes['limite_individual']})")
+                continue
+            resultado = {'etapa': etapa, 'linhas': linhas, **medir_etapa(etapa, pasta, opcoes)}
+            resultados.append(resultado)
+            if 'erro' in resultado:
+                print(f"  {etapa:<12} [ERRO] {resultado['erro']}")
+            else:
+                memoria, filhos = resultado['pico_memoria_mb'], resultado['pico_memoria_filhos_mb']
+                print(f"  {etapa:<12} {resultado['tempo_s']:>9.2f}s   "
+                      f"{'?' if memoria is None else f'{memoria:.0f}'} MB"
+                      + (f"   (maior trabalhador: {filhos:.0f} MB)" if filhos else ''))
+
+        if not opcoes['manter_arquivos']:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    if not opcoes['manter_arquivos']:
+        shutil.rmtree(PASTA_TRABALHO, ignore_errors=True)
+    return resultados
+
+
+def comparar_com_base(base, atual, tolerancia):
+    """Devolve a lista de textos descrevendo cada etapa que piorou além da tolerância."""
+    anteriores = {(r['etapa'], r['linhas']): r for r in base['resultados'] if 'erro' not in r}
+    regressoes = []
+    for resultado in atual['resultados']:
+        anterior = anteriores.get((resultado['etapa'], resultado['linhas']))
+        if anterior is None or 'erro' in resultado:
+            continue
+        rotulo = f"{resultado['etapa']} ({resultado['linhas']} linhas)"
+        if (anterior['tempo_s'] >= TEMPO_MINIMO_COMPARAVEL
+                and resultado['tempo_s'] > anterior['tempo_s'] * (1 + tolerancia)):
+            regressoes.append(f"{rotulo}: tempo {anterior['tempo_s']:.2f}s -> {resultado['tempo_s']:.2f}s")
+        # Bases antigas, sem 'pico_memoria_filhos_mb', guardavam a soma dos dois
+        # picos; não dá para comparar a memória com elas.
+        if 'pico_memoria_filhos_mb' not in anterior:
+            continue
+        for campo, nome in (('pico_memoria_mb', 'memória'), ('pico_memoria_filhos_mb', 'memória do maior trabalhador')):
+            if (anterior.get(campo) and resultado.get(campo)
+                    and resultado[campo] > anterior[campo] * (1 + tolerancia)):
+                regressoes.append(f"{rotulo}: {nome} {anterior[campo]:.0f} MB -> {resultado[campo]:.0f} MB")
+    return regressoes
+
+
+def salvar_resultados(caminho, resultados):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mede o tempo e o pico de memória da limpeza e das análises com exportações sintéticas.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO,
+                        help="Quantidades de linhas da exportação sintética (padrão: 1k a 1M).")
+    parser.add_argument('--etapas', nargs='+', choices=ETAPAS, default=ETAPAS)
+    parser.add_argument('--limite-individual', type=int, default=100_000,
+                        help="Não roda a análise individual acima deste número de linhas (0 = sem limite).")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--graficos', default='png', help="Modo dos gráficos dos kits (ver graficos.py).")
+    parser.add_argument('--excel', default='por_procedimento', help="Modo das planilhas dos kits (ver exportacao_excel.py).")
+    parser.add_argument('--saida', default='pastas', help="Onde gravar os kits: 'pastas' ou 'zip' (ver saidas.py).")
+    parser.add_argument('--painel', action='store_true', help="Inclui o painel .html no relatório consolidado.")
+    parser.add_argument('--procedimentos', type=int, default=12)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO,
+                        help="Piora relativa aceita antes de apontar regressão (padrão: 0.20).")
+    parser.add_argument('--base', default=ARQUIVO_BASE, help="Arquivo JSON com os resultados de referência.")
+    parser.add_argument('--atualizar-base', action='store_true',
+                        help="Grava os resultados desta execução como a nova referência.")
+    parser.add_argument('--manter-arquivos', action='store_true',
+                        help="Não apaga as pastas de trabalho (relatórios e gráficos gerados).")
+    args = parser.parse_args()
+
+    opcoes = {
+        'workers': args.workers, 'graficos': args.graficos, 'excel': args.excel, 'saida': args.saida,
+        'painel': args.painel, 'procedimentos': args.procedimentos, 'semente': args.semente,
+        'limite_individual': args.limite_individual, 'manter_arquivos': args.manter_arquivos,
+    }
+    atual = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'opcoes': {k: v for k, v in opcoes.items() if k != 'manter_arquivos'},
+        'resultados': rodar_benchmark(args.tamanhos, args.etapas, opcoes),
+    }
+
+    if not os.path.exists(args.base) or args.atualizar_base:
+        salvar_resultados(args.base, atual)
+        print(f"\n✅ Resultados salvos como referência em: '{args.base}'")
+        return 0
+
+    salvar_resultados(ARQUIVO_ULTIMA_EXECUCAO, atual)
+    with open(args.base, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    if base.get('opcoes') != atual['opcoes']:
+        print("\n[AVISO] A referência foi medida com outras opções; a comparação pode não fazer sentido.")
+
+    regressoes = comparar_com_base(base, atual, args.tolerancia)
+    if regressoes:
+        print(f"\n[AVISO] {len(regressoes)} regressão(ões) em relação a '{args.base}':")
+        for regressao in regressoes:
+            print(f"     - {regressao}")
+        return 1
+    print(f"\n✅ Nenhuma regressão em relação a '{args.base}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analise'))
+from exportacao_excel import abrir_livro, escrever_linhas
+
+# Cabeçalho no formato da exportação do Amplimed, com os espaços sobrando
+# em alguns nomes de coluna (a limpeza remove com str.strip()).
+COLUNAS_EXPORTACAO = ['Data e Hora agendada', ' Paciente ', 'Procedimento', 'Status ', 'Profissional']
+
+STATUS_PADRAO = {'Finalizado': 0.62, 'Ncompareceu': 0.18, 'Cancelado': 0.15, 'Agendado': 0.05}
+
+SILABAS = ['ma', 'ri', 'na', 'jo', 'ão', 'sil', 'va', 'so', 'u', 'za', 'an', 'to', 'ni', 'o', 'lu', 'ci',
+           'a', 'pe', 'dro', 'fer', 'nan', 'des', 'al', 'mei', 'da', 'cos', 'ta', 'bar', 'bo', 'sa']
+
+PROCEDIMENTOS_BASE = ['Fisioterapia', 'Psicologia / Adulto', 'Fonoaudiologia', 'Terapia Ocupacional',
+                      'Psicopedagogia', 'Nutrição', 'Psicologia / Infantil', 'Musicoterapia',
+                      'Hidroterapia', 'Neuropediatria', 'Avaliação Inicial', 'Retorno']
+
+
+def _palavra(rng, tamanho):
+    partes = []
+    while sum(len(p) for p in partes) < tamanho:
+        partes.append(SILABAS[rng.integers(len(SILABAS))])
+    return ''.join(partes).capitalize()
+
+
+def gerar_nomes(rng, quantidade, tamanho_min=8, tamanho_max=40):
+    """Nomes distintos de pacientes, com comprimento total entre os limites dados."""
+    nomes = set()
+    while len(nomes) < quantidade:
+        alvo = int(rng.integers(tamanho_min, tamanho_max + 1))
+        palavras = []
+        while sum(len(p) + 1 for p in palavras) < alvo:
+            palavras.append(_palavra(rng, int(rng.integers(3, 9))))
+        nomes.add(' '.join(palavras)[:tamanho_max].strip())
+    return sorted(nomes)
+
+
+def gerar_exportacao(linhas, pacientes=None, procedimentos=12, status=None,
+                     tamanho_nome=(8, 40), inicio='2023-01-01', dias=730, semente=42):
+    """
+    Monta um DataFrame no formato da exportação do Amplimed.
+
+    Alguns pacientes concentram muitas consultas (distribuição de Zipf), como
+    acontece na clínica. 'status' é um dicionário {status: proporção}.
+    """
+    rng = np.random.default_rng(semente)
+    pacientes = pacientes or max(10, linhas // 20)
+    status = status or STATUS_PADRAO
+
+    nomes = np.array(gerar_nomes(rng, pacientes, *tamanho_nome), dtype=object)
+    lista_procedimentos = PROCEDIMENTOS_BASE[:procedimentos] + [
+        f'Procedimento {i}' for i in range(len(PROCEDIMENTOS_BASE), procedimentos)
+    ]
+
+    pesos = 1.0 / np.arange(1, pacientes + 1) ** 0.8
+    pesos /= pesos.sum()
+    codigos_paciente = rng.permutation(pacientes)[rng.choice(pacientes, size=linhas, p=pesos)]
+
+    probabilidades = np.array(list(status.values()), dtype=float)
+    codigos_status = rng.choice(len(status), size=linhas, p=probabilidades / probabilidades.sum())
+
+    # Horários em meia hora cheia, das 7h às 19h.
+    dia = rng.integers(0, dias, size=linhas)
+    meia_hora = rng.integers(14, 38, size=linhas)
+    datas = pd.Timestamp(inicio) + pd.to_timedelta(dia, unit='D') + pd.to_timedelta(meia_hora * 30, unit='m')
+
+    return pd.DataFrame({
+        COLUNAS_EXPORTACAO[0]: datas,
+        COLUNAS_EXPORTACAO[1]: nomes[codigos_paciente],
+        COLUNAS_EXPORTACAO[2]: np.array(lista_procedimentos, dtype=object)[rng.integers(0, procedimentos, size=linhas)],
+        COLUNAS_EXPORTACAO[3]: np.array(list(status.keys()), dtype=object)[codigos_status],
+        COLUNAS_EXPORTACAO[4]: np.array([f'Profissional {i}' for i in range(20)], dtype=object)[rng.integers(0, 20, size=linhas)],
+    })
+
+
+def salvar_exportacao(df, caminho):
+    """Grava a exportação sintética como .xlsx, linha a linha (memória constante)."""
+    livro = abrir_livro(caminho)
+    try:
+        escrever_linhas(livro.nova_aba('Sheet1'), df.columns, df.itertuples(index=False, name=None))
+    finally:
+        livro.fechar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera uma exportação sintética do Amplimed (.xlsx).")
+    parser.add_argument('saida', help="Caminho do .xlsx gerado (ex: ../limpeza/amplimed.xlsx).")
+    parser.add_argument('--linhas', type=int, default=10_000)
+    parser.add_argument('--pacientes', type=int, default=None, help="Padrão: linhas / 20.")
+    parser.add_argument('--procedimentos', type=int, default=12)
+    parser.add_argument('--faltas', type=float, default=STATUS_PADRAO['Ncompareceu'],
+                        help="Proporção de consultas 'Ncompareceu' (as demais são reescaladas).")
+    parser.add_argument('--nome-min', type=int, default=8)
+    parser.add_argument('--nome-max', type=int, default=40)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    outros = {k: v for k, v in STATUS_PADRAO.items() if k != 'Ncompareceu'}
+    escala = (1 - args.faltas) / sum(outros.values())
+    mix_status = {**{k: v * escala for k, v in outros.items()}, 'Ncompareceu': args.faltas}
+
+    df = gerar_exportacao(args.linhas, args.pacientes, args.procedimentos, mix_status,
+                          (args.nome_min, args.nome_max), semente=args.semente)
+    salvar_exportacao(df, args.saida)
+    print(f"✅ Exportação sintética com {len(df)} linhas salva em: '{args.saida}'")
@@ -1,52 +1,927 @@
-import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils.datetime import from_excel
+from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import glob
+import hashlib
+import itertools
 import os
+import re
+import shutil
+import sqlite3
+import sys
+import time
+import unicodedata
+
+# As métricas usam o mesmo formato (e o mesmo código) das da análise, e os
+# nomes são normalizados pela mesma função da busca de duplicados.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analise'))
+from instrumentacao import ARQUIVO_METRICAS, ativar_metricas, registrar, iniciar_perfil, encerrar_perfil
+from nomes import chave_do_nome
 
 # --- Configurações ---
 ARQUIVO_ENTRADA_EXCEL = 'amplimed.xlsx' 
+ARQUIVO_SAIDA_ARROW = 'dados_limpos.arrow'
 ARQUIVO_SAIDA_EXCEL = 'dados_limpos.xlsx'
-COLUNA_PARA_REMOVER = 'Data e Hora agendada'
+# Pasta onde o arquivo limpo é gravado (a análise lê dali).
+PASTA_SAIDA = os.path.join('..', 'analise')
+
+# A data e hora da consulta é mantida como timestamp, para as análises por
+# período (ver analise/analise_temporal.py). Datas que vierem como texto são
+# lidas nestes formatos, na ordem.
+COLUNA_DATA = 'Data e Hora agendada'
+FORMATOS_DATA = ['%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']
+
+# Além do arquivo único, a base é gravada particionada por mês da consulta
+# (PASTA_SAIDA_PARTICIONADA/ano_mes=AAAA-MM/parte-0.arrow), para que consultas
+# de um período leiam só os meses necessários.
+PASTA_SAIDA_PARTICIONADA = 'dados_por_mes'
+PARTICAO_SEM_DATA = 'sem_data'
+
+# Uma consulta é identificada por paciente, procedimento e data e hora, mais
+# o número da ocorrência (0, 1, ...) entre as linhas da mesma exportação com
+# esses três campos iguais (ex: dois profissionais atendendo o mesmo
+# procedimento no mesmo horário). As ocorrências seguem a ordem do
+# profissional, quando a exportação tem essa coluna, e depois a da planilha;
+# o profissional não faz parte da chave, para que exportações com e sem a
+# coluna reconheçam as mesmas consultas. Quando várias exportações são limpas
+# juntas, uma consulta que aparece em mais de uma fica só com a versão da
+# exportação mais recente.
+CHAVE_CONSULTA = ['Paciente', 'Procedimento', COLUNA_DATA]
+COLUNA_PROFISSIONAL = 'Profissional'
+
+# Os nomes dos pacientes são normalizados: espaços repetidos e nas pontas saem,
+# e nomes que só diferem em acentos, maiúsculas ou espaços (ex: 'José  Silva' e
+# 'JOSE SILVA') passam a ser o mesmo paciente, com a grafia da primeira vez em
+# que aparecem. Cada paciente ganha um identificador estável (Paciente_ID),
+# calculado do nome normalizado, que é o mesmo em todas as exportações.
+COLUNA_PACIENTE = 'Paciente'
+COLUNA_ID_PACIENTE = 'Paciente_ID'
+
+# Com --historico, cada exportação também é acrescentada a um banco SQLite que
+# acumula o histórico de todas as exportações. Se uma consulta aparecer de novo
+# numa exportação posterior, a linha existente é atualizada (ex: 'Agendado' que
+# virou 'Finalizado') em vez de duplicada. A análise consulta o banco direto
+# pelo SQL (ver analise/historico.py).
+ARQUIVO_HISTORICO = 'historico.sqlite'
+TABELA_HISTORICO = 'consultas'
+
+# O .xlsx limpo é só para consulta humana; a análise lê o arquivo .arrow.
+EXPORTAR_XLSX = False
 
-def limpar_e_salvar_planilha_excel():
+# Apelidos para cada status. Eles recebem os códigos fixos 0, 1 e 2 na coluna
+# 'Status' do arquivo .arrow; outros status ganham os códigos seguintes.
+STATUS_PRESENTE = 'Finalizado'
+STATUS_FALTOU = 'Ncompareceu'
+STATUS_CANCELADO = 'Cancelado'
+
+# Colunas gravadas como categoria (código inteiro + dicionário de textos),
+# com o tipo do código de cada uma.
+COLUNAS_CATEGORICAS = {
+    'Paciente': pa.int32(),
+    'Procedimento': pa.int32(),
+    'Status': pa.int8(),
+}
+
+# Quantas linhas da planilha são processadas por vez. A memória usada pela
+# limpeza depende deste valor, e não do tamanho do arquivo.
+TAMANHO_BLOCO = 50_000
+
+# Com --metricas, o tempo de cada parte da limpeza é gravado no mesmo arquivo
+# JSON lines das métricas da análise (ver analise/instrumentacao.py).
+
+def abrir_planilha_em_blocos(caminho, tamanho_bloco=TAMANHO_BLOCO):
     """
-    Lê o arquivo .xlsx, remove a coluna de data e salva a nova versão.
+    Abre a primeira aba da planilha em modo somente leitura (streaming).
+    Devolve a lista de colunas (já sem espaços nas pontas) e um gerador de
+    blocos de até 'tamanho_bloco' linhas. Linhas totalmente vazias são ignoradas.
     """
-    print("--- INICIANDO SCRIPT DE LIMPEZA (SEM DATA) ---")
+    livro = load_workbook(caminho, read_only=True, data_only=True)
+    linhas = livro.worksheets[0].iter_rows(values_only=True)
+    cabecalho = next(linhas, None) or ()
+    colunas = [str(c).strip() if c is not None else f'Unnamed: {i}' for i, c in enumerate(cabecalho)]
+
+    def gerar_blocos():
+        n_colunas = len(colunas)
+        bloco = []
+        try:
+            for linha in linhas:
+                if all(valor is None for valor in linha):
+                    continue
+                # No modo streaming as linhas podem vir mais curtas ou mais longas que o cabeçalho.
+                bloco.append(tuple(linha[:n_colunas]) + (None,) * (n_colunas - len(linha)))
+                if len(bloco) == tamanho_bloco:
+                    yield bloco
+                    bloco = []
+            if bloco:
+                yield bloco
+        finally:
+            livro.close()
+
+    return colunas, gerar_blocos()
+
+class DicionarioCategorias:
+    """
+    Dicionário de uma coluna categórica que cresce ao longo dos blocos.
+    Os códigos já atribuídos nunca mudam, então cada bloco só acrescenta
+    valores novos ao fim do dicionário (um 'delta' no arquivo Arrow).
+    """
+
+    def __init__(self, tipo_codigo, valores_iniciais=()):
+        self.tipo_codigo = tipo_codigo
+        self.valores = list(valores_iniciais)
+        self.codigos = {valor: i for i, valor in enumerate(self.valores)}
+
+    def codificar(self, valores):
+        codigos = []
+        for valor in valores:
+            if valor is None:
+                codigos.append(None)
+                continue
+            valor = str(valor)
+            codigo = self.codigos.get(valor)
+            if codigo is None:
+                codigo = len(self.valores)
+                self.codigos[valor] = codigo
+                self.valores.append(valor)
+            codigos.append(codigo)
+        if self.tipo_codigo == pa.int8() and len(self.valores) > 127:
+            raise ValueError(f"Mais de 127 valores distintos de status: {self.valores[:10]}...")
+        return pa.DictionaryArray.from_arrays(
+            pa.array(codigos, type=self.tipo_codigo), pa.array(self.valores, type=pa.string()))
+
+    def codificar_arrow(self, textos):
+        """Como codificar(), mas para uma coluna Arrow de textos, sem passar valor a valor pelo Python."""
+        for valor in pc.unique(textos.drop_null()).to_pylist():
+            if valor not in self.codigos:
+                self.codigos[valor] = len(self.valores)
+                self.valores.append(valor)
+        if self.tipo_codigo == pa.int8() and len(self.valores) > 127:
+            raise ValueError(f"Mais de 127 valores distintos de status: {self.valores[:10]}...")
+        dicionario = pa.array(self.valores, type=pa.string())
+        codigos = pc.index_in(textos, value_set=dicionario).cast(self.tipo_codigo)
+        return pa.DictionaryArray.from_arrays(codigos, dicionario)
+
+def id_do_paciente(nome):
+    return 'P' + hashlib.sha1(chave_do_nome(nome).encode('utf-8')).hexdigest()[:12].upper()
+
+class DicionarioPacientes(DicionarioCategorias):
+    """
+    Dicionário da coluna Paciente: normaliza cada grafia antes de codificar
+    (uma vez por grafia distinta) e mantém, com os mesmos códigos, o
+    dicionário da coluna Paciente_ID.
+    """
+
+    def __init__(self, tipo_codigo):
+        super().__init__(tipo_codigo)
+        self.grafias = {}
+        self.nome_por_chave = {}
+        self.ids = []
+        self.unificadas = 0
+
+    def normalizar(self, valor):
+        if valor is None:
+            return None
+        if valor in self.grafias:
+            return self.grafias[valor]
+        texto = ' '.join(unicodedata.normalize('NFC', str(valor)).split())
+        nome = self.nome_por_chave.setdefault(chave_do_nome(texto), texto) if texto else None
+        if nome is not None and nome != texto:
+            self.unificadas += 1
+        self.grafias[valor] = nome
+        return nome
+
+    def codificar(self, valores):
+        return super().codificar([self.normalizar(valor) for valor in valores])
+
+    def codificar_arrow(self, textos):
+        unicos = pc.unique(textos)
+        normalizados = pa.array([self.normalizar(valor) for valor in unicos.to_pylist()], type=pa.string())
+        return super().codificar_arrow(pc.take(normalizados, pc.index_in(textos, value_set=unicos)))
+
+    def codificar_ids(self, pacientes):
+        """Coluna Paciente_ID com os mesmos códigos da coluna Paciente já codificada."""
+        self.ids += [id_do_paciente(nome) for nome in self.valores[len(self.ids):]]
+        return pa.DictionaryArray.from_arrays(pacientes.indices, pa.array(self.ids, type=pa.string()))
+
+def criar_dicionarios(colunas, posicoes):
+    dicionarios = {}
+    for posicao in posicoes:
+        tipo_codigo = COLUNAS_CATEGORICAS.get(colunas[posicao])
+        if tipo_codigo is None:
+            continue
+        if colunas[posicao] == COLUNA_PACIENTE:
+            dicionarios[posicao] = DicionarioPacientes(tipo_codigo)
+            continue
+        iniciais = [STATUS_PRESENTE, STATUS_FALTOU, STATUS_CANCELADO] if colunas[posicao] == 'Status' else []
+        dicionarios[posicao] = DicionarioCategorias(tipo_codigo, iniciais)
+    return dicionarios
+
+def inferir_tipo(valores):
+    """
+    Tipo Arrow de uma coluna, pelos valores não vazios do primeiro bloco
+    (como o openpyxl os devolve): só números inteiros -> int64, números ->
+    float64, datas -> timestamp, verdadeiro/falso -> bool; qualquer mistura
+    com texto (ou coluna vazia) -> string.
+    """
+    tipos = {type(valor) for valor in valores if valor is not None}
+    if not tipos:
+        return pa.string()
+    if tipos == {bool}:
+        return pa.bool_()
+    if tipos == {int}:
+        return pa.int64()
+    if tipos <= {int, float}:
+        return pa.float64()
+    if tipos <= {datetime, date}:
+        return pa.timestamp('s')
+    return pa.string()
+
+def inferir_tipos(colunas, bloco):
+    """{coluna: tipo} das colunas que não são categorias nem a data da consulta."""
+    valores = list(zip(*bloco)) if bloco else [()] * len(colunas)
+    return {coluna: inferir_tipo(valores[i]) for i, coluna in enumerate(colunas)
+            if coluna not in COLUNAS_CATEGORICAS and coluna != COLUNA_DATA}
+
+def montar_esquema(colunas, posicoes, com_categorias=True, tipos=None):
+    """
+    Esquema das colunas em 'posicoes': Paciente/Procedimento/Status como
+    categorias, a data da consulta como timestamp e as demais com o tipo de
+    'tipos' (de inferir_tipos; texto se não estiverem lá).
+    """
+    tipos = tipos or {}
+    def tipo(coluna):
+        if coluna in COLUNAS_CATEGORICAS:
+            return pa.dictionary(COLUNAS_CATEGORICAS[coluna], pa.string()) if com_categorias else pa.string()
+        return pa.timestamp('s') if coluna == COLUNA_DATA else tipos.get(coluna, pa.string())
+    return pa.schema([(colunas[i], tipo(colunas[i])) for i in posicoes])
+
+def esquema_com_id_paciente(esquema):
+    """Esquema gravado: o da planilha com a coluna Paciente_ID logo depois de Paciente."""
+    posicao = esquema.get_field_index(COLUNA_PACIENTE)
+    if posicao < 0:
+        return esquema
+    tipo = pa.dictionary(COLUNAS_CATEGORICAS[COLUNA_PACIENTE], pa.string())
+    return esquema.insert(posicao + 1, pa.field(COLUNA_ID_PACIENTE, tipo))
+
+def acrescentar_id_paciente(tabela, dicionario_pacientes):
+    posicao = tabela.schema.get_field_index(COLUNA_PACIENTE)
+    pacientes = tabela.column(posicao).combine_chunks()
+    return tabela.add_column(posicao + 1, COLUNA_ID_PACIENTE, dicionario_pacientes.codificar_ids(pacientes))
+
+def converter_numero(valor, tipo):
+    """Célula para int/float (ou None se não for um número daquele tipo). Textos numéricos também valem."""
+    if isinstance(valor, bool):
+        return None
+    if isinstance(valor, str):
+        try:
+            valor = float(valor.strip().replace(',', '.'))
+        except ValueError:
+            return None
+    if not isinstance(valor, (int, float)):
+        return None
+    if tipo == pa.int64():
+        return int(valor) if float(valor).is_integer() else None
+    return float(valor)
+
+def converter_data(valor, cache):
+    """
+    Converte uma célula de data para datetime (ou None se não for uma data).
+    O openpyxl já devolve datetime para células de data; textos e números
+    seriais do Excel também são aceitos. Textos repetidos são lidos uma vez só.
+    """
+    if isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime(valor.year, valor.month, valor.day)
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        try:
+            return from_excel(valor)
+        except (ValueError, OverflowError):
+            return None
+    if not isinstance(valor, str):
+        return None
+    if valor not in cache:
+        cache[valor] = None
+        for formato in FORMATOS_DATA:
+            try:
+                cache[valor] = datetime.strptime(valor.strip(), formato)
+                break
+            except ValueError:
+                continue
+    return cache[valor]
+
+class EscritorParticionado:
+    """
+    Grava cada bloco na partição do mês de cada linha (formato 'hive':
+    ano_mes=AAAA-MM), com um arquivo Arrow IPC aberto por mês. Tudo é gravado
+    numa pasta temporária, que só substitui a anterior em fechar().
+    """
+
+    def __init__(self, pasta, esquema):
+        self.pasta = pasta
+        self.pasta_temporaria = pasta + '.tmp'
+        self.esquema = esquema
+        self.escritores = {}
+        shutil.rmtree(self.pasta_temporaria, ignore_errors=True)
+
+    def escrever(self, tabela):
+        meses = pc.fill_null(pc.strftime(tabela[COLUNA_DATA], format='%Y-%m'), PARTICAO_SEM_DATA)
+        for mes in pc.unique(meses).to_pylist():
+            parte = tabela.filter(pc.equal(meses, mes))
+            if mes not in self.escritores:
+                pasta_mes = os.path.join(self.pasta_temporaria, f'ano_mes={mes}')
+                os.makedirs(pasta_mes)
+                self.escritores[mes] = ipc.new_file(
+                    os.path.join(pasta_mes, 'parte-0.arrow'), self.esquema,
+                    options=ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+            self.escritores[mes].write_table(parte)
+
+    def fechar(self, sucesso=True):
+        for escritor in self.escritores.values():
+            escritor.close()
+        if not sucesso:
+            shutil.rmtree(self.pasta_temporaria, ignore_errors=True)
+            return
+        shutil.rmtree(self.pasta, ignore_errors=True)
+        if self.escritores:
+            os.replace(self.pasta_temporaria, self.pasta)
+
+def nome_sql(nome):
+    return '"' + str(nome).replace('"', '""') + '"'
+
+def numerar_ocorrencias_sql(colunas):
+    """Expressão SQL da ocorrência (ver CHAVE_CONSULTA) de cada linha de uma tabela com estas 'colunas'."""
+    ordem = ([f"IFNULL({nome_sql(COLUNA_PROFISSIONAL)}, '')"] if COLUNA_PROFISSIONAL in colunas else []) + ['rowid']
+    return (f'ROW_NUMBER() OVER (PARTITION BY {", ".join(nome_sql(c) for c in CHAVE_CONSULTA)} '
+            f'ORDER BY {", ".join(ordem)}) - 1')
+
+class GravadorHistorico:
+    """
+    Acrescenta os blocos de uma exportação ao banco do histórico, numa única
+    transação: se a limpeza falhar no meio, o banco fica como estava. O banco
+    é criado com as colunas da primeira exportação, na mesma ordem, e colunas
+    que aparecerem depois são acrescentadas ao fim; linhas sem algum campo da
+    chave (paciente, procedimento, data) ficam de fora. O nome de cada
+    Paciente_ID fica fixo na primeira grafia gravada (tabela 'pacientes'),
+    para que uma exportação que traga o nome escrito de outro jeito atualize
+    as mesmas consultas em vez de duplicá-las.
+
+    Linhas com a mesma chave (CHAVE_CONSULTA) dentro de uma exportação são
+    consultas diferentes, numeradas na coluna 'ocorrencia', que entra no
+    índice único. Para numerá-las é preciso ver a exportação inteira: os
+    blocos vão para uma tabela temporária e só passam para o histórico em
+    fechar(), que também confere as contagens por status das linhas desta
+    exportação no banco com as das linhas recebidas.
+    """
+
+    chave_sql = ', '.join(nome_sql(c) for c in CHAVE_CONSULTA + ['ocorrencia'])
+
+    def __init__(self, caminho, colunas, arquivo_origem):
+        self.conexao = sqlite3.connect(caminho, isolation_level=None)
+        self.conexao.execute('PRAGMA journal_mode=WAL')
+        self.conexao.execute('PRAGMA synchronous=NORMAL')
+        self.colunas = list(colunas)
+        self.posicoes_chave = [self.colunas.index(coluna) for coluna in CHAVE_CONSULTA]
+        self.posicao_paciente = self.colunas.index(COLUNA_PACIENTE)
+        self.posicao_status = self.colunas.index('Status')
+        self.posicao_id = self.colunas.index(COLUNA_ID_PACIENTE) if COLUNA_ID_PACIENTE in self.colunas else None
+        self._criar_esquema()
+        self.nomes = dict(self.conexao.execute(f'SELECT {COLUNA_ID_PACIENTE}, {COLUNA_PACIENTE} FROM pacientes'))
+
+        self.conexao.execute('BEGIN')
+        self.exportacao = self.conexao.execute(
+            'INSERT INTO exportacoes (arquivo, importada_em) VALUES (?, ?)',
+            (os.path.abspath(arquivo_origem), datetime.now().isoformat(timespec='seconds'))).lastrowid
+        self.linhas_antes = self._contar()
+        self.recebidas = 0
+        self.ignoradas = 0
+        self.por_status = {}
+
+        nomes = ', '.join(nome_sql(c) for c in self.colunas)
+        self.conexao.execute(
+            f'CREATE TEMP TABLE recebidas ({", ".join(nome_sql(c) + " TEXT" for c in self.colunas)})')
+        self.sql_recebidas = f'INSERT INTO temp.recebidas VALUES ({", ".join("?" * len(self.colunas))})'
+        atualizacoes = ', '.join(f'{nome_sql(c)} = excluded.{nome_sql(c)}'
+                                 for c in self.colunas + ['exportacao_id'] if c not in CHAVE_CONSULTA)
+        # O 'WHERE true' separa o SELECT do ON CONFLICT (exigência do SQLite).
+        self.sql_insercao = (
+            f'INSERT INTO {TABELA_HISTORICO} ({nomes}, ocorrencia, exportacao_id) '
+            f'SELECT {nomes}, {numerar_ocorrencias_sql(self.colunas)}, ? FROM temp.recebidas WHERE true '
+            f'ORDER BY rowid ON CONFLICT ({self.chave_sql}) DO UPDATE SET {atualizacoes}'
+        )
+
+    def _criar_esquema(self):
+        self.conexao.executescript(f"""
+            CREATE TABLE IF NOT EXISTS exportacoes (
+                id INTEGER PRIMARY KEY, arquivo TEXT, importada_em TEXT,
+                linhas INTEGER, novas INTEGER, atualizadas INTEGER, ignoradas INTEGER);
+            CREATE TABLE IF NOT EXISTS pacientes ({COLUNA_ID_PACIENTE} TEXT PRIMARY KEY, {COLUNA_PACIENTE} TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS {TABELA_HISTORICO} (
+                {', '.join(nome_sql(c) + (' TEXT NOT NULL' if c in CHAVE_CONSULTA else ' TEXT')
+                           for c in self.colunas)},
+                ocorrencia INTEGER NOT NULL DEFAULT 0,
+                exportacao_id INTEGER REFERENCES exportacoes(id));
+            CREATE INDEX IF NOT EXISTS {TABELA_HISTORICO}_paciente ON {TABELA_HISTORICO} ("Paciente", "Status");
+            CREATE INDEX IF NOT EXISTS {TABELA_HISTORICO}_procedimento ON {TABELA_HISTORICO} ("Procedimento", "Status");
+            CREATE INDEX IF NOT EXISTS {TABELA_HISTORICO}_status ON {TABELA_HISTORICO} ("Status");
+            CREATE INDEX IF NOT EXISTS {TABELA_HISTORICO}_data ON {TABELA_HISTORICO} ({nome_sql(COLUNA_DATA)});
+        """)
+        existentes = [linha[1] for linha in self.conexao.execute(f'PRAGMA table_info({TABELA_HISTORICO})')]
+        for coluna in self.colunas:
+            if coluna not in existentes:
+                self.conexao.execute(f'ALTER TABLE {TABELA_HISTORICO} ADD COLUMN {nome_sql(coluna)} TEXT')
+        if 'ocorrencia' not in existentes:
+            self.conexao.execute(f'ALTER TABLE {TABELA_HISTORICO} ADD COLUMN ocorrencia INTEGER NOT NULL DEFAULT 0')
+        indice = f'chave_consulta_{TABELA_HISTORICO}'
+        if self.conexao.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+                                (indice,)).fetchone() is None:
+            # Bancos de versões anteriores tinham outro índice único (sem a
+            # ocorrência, ou com o profissional); as ocorrências são numeradas
+            # de novo com a regra atual antes de criar o índice.
+            colunas_banco = existentes + [c for c in self.colunas if c not in existentes]
+            self.conexao.executescript(f"""
+                BEGIN;
+                DROP INDEX IF EXISTS chave_{TABELA_HISTORICO};
+                DROP INDEX IF EXISTS chave_ocorrencia_{TABELA_HISTORICO};
+                UPDATE {TABELA_HISTORICO} SET ocorrencia = numeradas.ocorrencia
+                    FROM (SELECT rowid AS linha, {numerar_ocorrencias_sql(colunas_banco)} AS ocorrencia
+                          FROM {TABELA_HISTORICO}) AS numeradas
+                    WHERE {TABELA_HISTORICO}.rowid = numeradas.linha;
+                CREATE UNIQUE INDEX {indice} ON {TABELA_HISTORICO} ({self.chave_sql});
+                COMMIT;
+            """)
+
+    def _contar(self):
+        return self.conexao.execute(f'SELECT COUNT(*) FROM {TABELA_HISTORICO}').fetchone()[0]
+
+    def escrever(self, tabela):
+        valores = [tabela.column(coluna).to_pylist() for coluna in self.colunas]
+        # Datas no formato ISO ('AAAA-MM-DD HH:MM:SS'), que o SQLite compara e ordena como texto.
+        for posicao, coluna in enumerate(self.colunas):
+            if pa.types.is_timestamp(tabela.schema.field(coluna).type):
+                valores[posicao] = [None if d is None else d.isoformat(sep=' ') for d in valores[posicao]]
+        if self.posicao_id is not None:
+            ids = valores[self.posicao_id]
+            novos = {i: nome for i, nome in zip(ids, valores[self.posicao_paciente])
+                     if i is not None and i not in self.nomes}
+            if novos:
+                self.conexao.executemany('INSERT INTO pacientes VALUES (?, ?)', novos.items())
+                self.nomes.update(novos)
+            valores[self.posicao_paciente] = [None if i is None else self.nomes[i] for i in ids]
+        linhas = [linha for linha in zip(*valores) if all(linha[i] is not None for i in self.posicoes_chave)]
+        for linha in linhas:
+            status = linha[self.posicao_status]
+            self.por_status[status] = self.por_status.get(status, 0) + 1
+        self.recebidas += tabela.num_rows
+        self.ignoradas += tabela.num_rows - len(linhas)
+        self.conexao.executemany(self.sql_recebidas, linhas)
+
+    def fechar(self, sucesso=True):
+        """Confirma (ou desfaz) a exportação e devolve as contagens de linhas novas e atualizadas."""
+        try:
+            if not sucesso:
+                self.conexao.execute('ROLLBACK')
+                return None
+            self.conexao.execute(self.sql_insercao, (self.exportacao,))
+            no_banco = dict(self.conexao.execute(
+                f'SELECT "Status", COUNT(*) FROM {TABELA_HISTORICO} WHERE exportacao_id = ? GROUP BY 1',
+                (self.exportacao,)))
+            if no_banco != self.por_status:
+                self.conexao.execute('ROLLBACK')
+                raise RuntimeError(f"o histórico ficaria com contagens por status {no_banco} para esta "
+                                   f"exportação, mas ela tem {self.por_status}; nada foi gravado no histórico")
+            novas = self._contar() - self.linhas_antes
+            resumo = {'linhas': self.recebidas, 'novas': novas, 'ignoradas': self.ignoradas,
+                      'atualizadas': self.recebidas - self.ignoradas - novas}
+            self.conexao.execute(
+                'UPDATE exportacoes SET linhas = ?, novas = ?, atualizadas = ?, ignoradas = ? WHERE id = ?',
+                (resumo['linhas'], resumo['novas'], resumo['atualizadas'], resumo['ignoradas'], self.exportacao))
+            self.conexao.execute('COMMIT')
+            return resumo
+        finally:
+            self.conexao.close()
+
+class TiposIncompativeis(Exception):
+    """Valores de um bloco que não cabem no tipo inferido das 'colunas' (ver bloco_para_tabela)."""
+
+    def __init__(self, colunas):
+        super().__init__(f"valores que não combinam com o tipo das colunas {colunas}")
+        self.colunas = colunas
+
+def alargar_tipos(tipos, colunas, origem=''):
+    """Passa para texto as 'colunas' que tiveram valores de outro tipo, avisando de cada uma."""
+    for coluna in colunas:
+        print(f"[AVISO] {origem}A coluna '{coluna}' tem valores que não são do tipo das primeiras linhas "
+              f"({tipos.get(coluna)}) e será gravada como texto.")
+        tipos[coluna] = pa.string()
+
+def bloco_para_tabela(bloco, posicoes, esquema, dicionarios):
+    """
+    Monta uma tabela Arrow só com as colunas em 'posicoes'. Paciente,
+    Procedimento e Status viram códigos de categoria; as demais colunas são
+    convertidas para o tipo do esquema (inferido do primeiro bloco), para que
+    ele seja o mesmo em todos os blocos. Um valor que não cabe no tipo da
+    coluna (ex: um texto numa coluna de números) não é descartado: o bloco
+    levanta TiposIncompativeis com essas colunas, para que a planilha seja
+    lida de novo com elas como texto (ver alargar_tipos).
+    """
+    colunas = list(zip(*bloco))
+    cache_datas = {}
+    arrays = []
+    incompativeis = []
+    for posicao, campo in zip(posicoes, esquema):
+        valores = colunas[posicao]
+        if posicao in dicionarios:
+            arrays.append(dicionarios[posicao].codificar(valores))
+            continue
+        if pa.types.is_string(campo.type):
+            convertidos = [None if valor is None else str(valor) for valor in valores]
+        elif pa.types.is_timestamp(campo.type):
+            convertidos = [converter_data(valor, cache_datas) for valor in valores]
+        elif pa.types.is_boolean(campo.type):
+            convertidos = [valor if isinstance(valor, bool) else None for valor in valores]
+        else:
+            convertidos = [converter_numero(valor, campo.type) for valor in valores]
+        if not pa.types.is_string(campo.type) and any(
+                valor is not None and convertido is None for valor, convertido in zip(valores, convertidos)):
+            incompativeis.append(campo.name)
+        arrays.append(pa.array(convertidos, type=campo.type))
+    if incompativeis:
+        raise TiposIncompativeis(incompativeis)
+    return pa.Table.from_arrays(arrays, schema=esquema)
+
+def ordem_natural(caminho):
+    """Chave de ordenação em que 'arquivo (2)' vem antes de 'arquivo (14)'."""
+    return [int(parte) if parte.isdigit() else parte.lower()
+            for parte in re.split(r'(\d+)', os.path.basename(caminho))]
+
+def listar_entradas(caminho):
+    """
+    Planilhas a limpar: o próprio arquivo, os .xlsx de uma pasta ou os que
+    casam com um padrão (ex: 'exportacoes/Amplimed*.xlsx'), em ordem natural
+    de nome, que é a ordem em que o navegador numera os downloads.
+    """
+    if os.path.isdir(caminho):
+        arquivos = glob.glob(os.path.join(caminho, '*.xlsx'))
+    elif glob.has_magic(caminho):
+        arquivos = glob.glob(caminho)
+    else:
+        return [caminho]
+    # '~$...' são os arquivos temporários do Excel com a planilha aberta.
+    return sorted((a for a in arquivos if not os.path.basename(a).startswith('~$')), key=ordem_natural)
+
+def primeiro_bloco(blocos):
+    """(primeiro bloco ou [], gerador com todos os blocos, inclusive o primeiro)."""
+    primeiro = next(blocos, None)
+    if primeiro is None:
+        return [], iter(())
+    return primeiro, itertools.chain([primeiro], blocos)
+
+def ler_planilha_como_tabela(caminho):
+    """
+    Lê uma planilha inteira e devolve (colunas, tabela Arrow, colunas que
+    passaram a texto), com a data já convertida, as categorias como texto e
+    os tipos das demais colunas inferidos do primeiro bloco; uma coluna com
+    valores de outro tipo mais adiante faz a planilha ser lida de novo com
+    ela como texto. Roda num processo trabalhador; os dicionários das
+    categorias são montados depois, no processo principal.
+    """
+    colunas, blocos = abrir_planilha_em_blocos(caminho)
+    primeiro, blocos = primeiro_bloco(blocos)
+    posicoes = list(range(len(colunas)))
+    tipos = inferir_tipos(colunas, primeiro)
+    alargadas = []
+    while True:
+        esquema = montar_esquema(colunas, posicoes, com_categorias=False, tipos=tipos)
+        try:
+            tabelas = [bloco_para_tabela(bloco, posicoes, esquema, {}) for bloco in blocos]
+            break
+        except TiposIncompativeis as e:
+            alargadas += e.colunas
+            tipos.update(dict.fromkeys(e.colunas, pa.string()))
+            _, blocos = abrir_planilha_em_blocos(caminho)
+    return colunas, pa.concat_tables(tabelas) if tabelas else esquema.empty_table(), alargadas
+
+def unificar_tipos(tipos):
+    """Tipo comum de uma coluna que veio com tipos diferentes de cada exportação."""
+    tipos = set(tipos)
+    if len(tipos) == 1:
+        return tipos.pop()
+    if tipos <= {pa.int64(), pa.float64()}:
+        return pa.float64()
+    return pa.string()
+
+def unir_tabelas(resultados):
+    """
+    Junta as tabelas de várias exportações. As colunas são unidas pelo nome
+    (já sem espaços nas pontas), na ordem em que aparecem; a coluna que faltar
+    numa exportação fica vazia nela. Uma consulta (CHAVE_CONSULTA e a
+    ocorrência, pela mesma regra do histórico) presente em mais de uma
+    exportação fica só com a linha da mais recente (a última da lista). Devolve (colunas, tabela, linhas removidas).
+    """
+    colunas = []
+    for colunas_arquivo, _ in resultados:
+        colunas += [c for c in colunas_arquivo if c not in colunas]
+    # Uma coluna com tipos diferentes em cada exportação fica com o tipo comum (ver unificar_tipos).
+    tipos = {coluna: unificar_tipos(tabela.schema.field(coluna).type for _, tabela in resultados
+                                    if coluna in tabela.column_names)
+             for coluna in colunas}
+    esquema = pa.schema([(coluna, tipos[coluna]) for coluna in colunas])
+
+    tabelas = []
+    for _, tabela in resultados:
+        tabelas.append(pa.Table.from_arrays(
+            [tabela.column(campo.name).cast(campo.type) if campo.name in tabela.column_names
+             else pa.nulls(tabela.num_rows, type=campo.type) for campo in esquema],
+            schema=esquema))
+    unida = pa.concat_tables(tabelas) if tabelas else esquema.empty_table()
+    if not all(coluna in colunas for coluna in CHAVE_CONSULTA) or len(tabelas) < 2:
+        return colunas, unida, 0
+
+    chaves = unida.select(CHAVE_CONSULTA).to_pandas()
+    # A mesma consulta com o nome escrito de outro jeito também conta como repetida.
+    chaves[COLUNA_PACIENTE] = chaves[COLUNA_PACIENTE].map(
+        {nome: chave_do_nome(nome) for nome in chaves[COLUNA_PACIENTE].dropna().unique()})
+    chaves['arquivo'] = np.repeat(np.arange(len(tabelas)), [t.num_rows for t in tabelas])
+    # Ocorrência dentro de cada exportação, pela ordem do profissional (vazio
+    # na exportação que não tem a coluna) e depois pela da planilha, como em
+    # numerar_ocorrencias_sql.
+    por_exportacao = ['arquivo'] + CHAVE_CONSULTA
+    if COLUNA_PROFISSIONAL in colunas:
+        chaves['ordem'] = unida.column(COLUNA_PROFISSIONAL).to_pandas().astype('string').fillna('')
+        chaves['ocorrencia'] = (chaves.sort_values('ordem', kind='stable')
+                                .groupby(por_exportacao, dropna=False, sort=False).cumcount())
+    else:
+        chaves['ocorrencia'] = chaves.groupby(por_exportacao, dropna=False, sort=False).cumcount()
+    ultimo_arquivo = (chaves.groupby(CHAVE_CONSULTA + ['ocorrencia'], dropna=False, sort=False)['arquivo']
+                      .transform('max'))
+    # Linhas sem chave completa não são mexidas.
+    manter = (chaves['arquivo'] == ultimo_arquivo) | chaves[CHAVE_CONSULTA].isna().any(axis=1)
+    return colunas, unida.filter(pa.array(manter.to_numpy())), int((~manter).sum())
+
+def ler_planilhas_em_paralelo(entradas, workers=None):
+    """
+    Lê várias exportações ao mesmo tempo, uma por processo (as maiores
+    primeiro, para nenhum processo ficar com a maior no fim), e devolve
+    (colunas, {coluna: tipo}, lotes de até TAMANHO_BLOCO linhas, linhas
+    duplicadas removidas). Avisa das colunas que passaram a texto em cada
+    arquivo por terem valores de outro tipo.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(entradas))
+    ordem = sorted(range(len(entradas)), key=lambda i: os.path.getsize(entradas[i]), reverse=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = {i: executor.submit(ler_planilha_como_tabela, entradas[i]) for i in ordem}
+        resultados = []
+        for i, entrada in enumerate(entradas):
+            try:
+                colunas, tabela, alargadas = futuros[i].result()
+            except Exception as e:
+                raise RuntimeError(f"'{entrada}': {e}") from e
+            resultados.append((colunas, tabela))
+            alargar_tipos(dict(zip(tabela.schema.names, tabela.schema.types)), alargadas,
+                          origem=f"'{os.path.basename(entrada)}': ")
+    colunas, tabela, duplicadas = unir_tabelas(resultados)
+    tipos = dict(zip(tabela.schema.names, tabela.schema.types))
+    return colunas, tipos, tabela.to_batches(TAMANHO_BLOCO), duplicadas
+
+def lote_para_tabela(lote, posicoes, esquema, dicionarios):
+    """Converte um lote já lido (ver ler_planilha_como_tabela) para o esquema com categorias."""
+    arrays = []
+    for posicao in posicoes:
+        coluna = lote.column(posicao)
+        arrays.append(dicionarios[posicao].codificar_arrow(coluna) if posicao in dicionarios else coluna)
+    return pa.Table.from_arrays(arrays, schema=esquema)
+
+def linhas_do_bloco(bloco):
+    if isinstance(bloco, list):
+        return bloco
+    return zip(*(coluna.to_pylist() for coluna in bloco.columns))
+
+def limpar_e_salvar_planilha_excel(caminho_metricas=None, caminho_entrada=ARQUIVO_ENTRADA_EXCEL,
+                                   pasta_saida=PASTA_SAIDA, caminho_historico=None, workers=None):
+    """
+    Lê o arquivo .xlsx em blocos, converte a coluna de data para timestamp e
+    salva a nova versão em formato colunar (Arrow IPC / Feather), pronto para
+    a análise, além da cópia particionada por mês.
+    Cada bloco é gravado assim que é limpo, sem carregar a planilha inteira.
+    Com 'caminho_metricas', grava o tempo gasto lendo, convertendo e gravando.
+    Com 'caminho_historico', acrescenta a exportação ao banco do histórico.
+
+    'caminho_entrada' pode ser uma pasta ou um padrão (ex: '*.xlsx'): as
+    exportações são lidas em paralelo (até 'workers' processos; padrão: um
+    por núcleo), unidas numa só base e as consultas repetidas entre elas
+    ficam só com a versão mais recente. Nesse caso a base unida é montada
+    em memória antes de ser gravada.
+    Devolve True se tudo foi salvo e False se houve algum erro.
+    """
+    inicio = time.perf_counter()
+    tempos = {'leitura': 0.0, 'conversao': 0.0, 'escrita_arrow': 0.0, 'escrita_xlsx': 0.0,
+              'escrita_historico': 0.0}
+    print("--- INICIANDO SCRIPT DE LIMPEZA ---")
     
+    entradas = listar_entradas(caminho_entrada)
+    duplicadas = 0
     try:
-        print(f"Lendo o arquivo Excel: '{ARQUIVO_ENTRADA_EXCEL}' com o leitor 'calamine'...")
-        df = pd.read_excel(ARQUIVO_ENTRADA_EXCEL, engine='calamine')
-        print("Arquivo Excel lido com sucesso!")
+        if not entradas:
+            raise FileNotFoundError(caminho_entrada)
+        if len(entradas) == 1:
+            print(f"Lendo o arquivo Excel: '{entradas[0]}' em blocos de {TAMANHO_BLOCO} linhas...")
+            colunas, blocos = abrir_planilha_em_blocos(entradas[0])
+            marca = time.perf_counter()
+            primeiro, blocos = primeiro_bloco(blocos)
+            tempos['leitura'] += time.perf_counter() - marca
+            tipos = inferir_tipos(colunas, primeiro)
+        else:
+            print(f"Lendo {len(entradas)} arquivos Excel em paralelo:")
+            for entrada in entradas:
+                print(f"     - {entrada}")
+            marca = time.perf_counter()
+            colunas, tipos, blocos, duplicadas = ler_planilhas_em_paralelo(entradas, workers)
+            tempos['leitura'] += time.perf_counter() - marca
+            print(f"{duplicadas} consulta(s) repetida(s) entre as exportações removida(s) "
+                  "(ficou a versão da exportação mais recente).")
+        print("Arquivo Excel aberto com sucesso!")
 
     except FileNotFoundError:
-        print(f"\n[ERRO FATAL]: O arquivo '{ARQUIVO_ENTRADA_EXCEL}' não foi encontrado na pasta 'limpeza'.")
-        return
+        print(f"\n[ERRO FATAL]: O arquivo '{caminho_entrada}' não foi encontrado.")
+        return False
     except Exception as e:
         print(f"\n[ERRO FATAL] Ocorreu um problema ao ler o arquivo Excel. Erro: {e}")
-        return
+        return False
 
     print("Realizando limpeza dos dados...")
-    df.columns = df.columns.str.strip()
-    
-    # --- A MUDANÇA ESTÁ AQUI ---
-    # Verificamos se a coluna de data existe e a removemos.
-    if COLUNA_PARA_REMOVER in df.columns:
-        df = df.drop(columns=[COLUNA_PARA_REMOVER])
-        print(f"Coluna '{COLUNA_PARA_REMOVER}' removida com sucesso.")
+
+    # A coluna de data é mantida (convertida para timestamp) para as análises por período.
+    if COLUNA_DATA in colunas:
+        print(f"Coluna '{COLUNA_DATA}' convertida para data e hora.")
     else:
-        print(f"Aviso: A coluna '{COLUNA_PARA_REMOVER}' não foi encontrada para ser removida.")
+        print(f"Aviso: A coluna '{COLUNA_DATA}' não foi encontrada; a base não será particionada por mês.")
+    # Um Paciente_ID que já venha na planilha é descartado e calculado de novo.
+    posicoes = [i for i, coluna in enumerate(colunas)
+                if coluna != COLUNA_ID_PACIENTE or COLUNA_PACIENTE not in colunas]
+    caminho_saida = os.path.join(pasta_saida, ARQUIVO_SAIDA_ARROW)
+    caminho_temporario = caminho_saida + '.tmp'
+    caminho_excel = os.path.join(pasta_saida, ARQUIVO_SAIDA_EXCEL)
+    pasta_particionada = os.path.join(pasta_saida, PASTA_SAIDA_PARTICIONADA)
+    # Um valor que não cabe no tipo que as primeiras linhas deram à coluna (ex:
+    # um texto numa coluna de números) faz a coluna passar a texto, e a planilha
+    # é lida de novo desde o começo; nada da tentativa anterior fica gravado.
+    while True:
+        esquema = montar_esquema(colunas, posicoes, tipos=tipos)
+        esquema_saida = esquema_com_id_paciente(esquema)
+        dicionarios = criar_dicionarios(colunas, posicoes)
+        if len(entradas) == 1:
+            converter = lambda bloco: bloco_para_tabela(bloco, posicoes, esquema, dicionarios)
+        else:
+            converter = lambda lote: lote_para_tabela(lote, posicoes, esquema, dicionarios)
+        dicionario_pacientes = dicionarios.get(colunas.index(COLUNA_PACIENTE)) if COLUNA_PACIENTE in colunas else None
 
-    print(f"Total de registros a serem salvos: {len(df)}")
+        total_registros = 0
+        particionado = None
+        historico = None
+        try:
+            if blocos is None:
+                _, blocos = abrir_planilha_em_blocos(entradas[0])
+            os.makedirs(os.path.dirname(caminho_saida), exist_ok=True)
+            print(f"Salvando os dados limpos em: '{caminho_saida}'...")
 
-    caminho_saida = os.path.join('..', 'analise', ARQUIVO_SAIDA_EXCEL)
-    try:
-        os.makedirs(os.path.dirname(caminho_saida), exist_ok=True)
-        print(f"Salvando a planilha limpa em: '{caminho_saida}'...")
-        df.to_excel(caminho_saida, index=False, engine='openpyxl')
-        print("-" * 40)
-        print(" SUCESSO! O arquivo limpo (sem data) foi salvo na pasta 'analise'!")
-        print("-" * 40)
-    except Exception as e:
-        print(f"[ERRO FATAL] Não foi possível salvar o novo arquivo Excel. Erro: {e}")
+            planilha_consulta = None
+            if EXPORTAR_XLSX:
+                livro_consulta = Workbook(write_only=True)
+                planilha_consulta = livro_consulta.create_sheet()
+                planilha_consulta.append([colunas[i] for i in posicoes])
+
+            if COLUNA_DATA in colunas:
+                particionado = EscritorParticionado(pasta_particionada, esquema_saida)
+            else:
+                shutil.rmtree(pasta_particionada, ignore_errors=True)
+
+            if caminho_historico:
+                faltando = [coluna for coluna in CHAVE_CONSULTA + ['Status'] if coluna not in colunas]
+                if faltando:
+                    raise ValueError(f"A exportação não tem as colunas {faltando}, necessárias no histórico.")
+                os.makedirs(os.path.dirname(caminho_historico) or '.', exist_ok=True)
+                historico = GravadorHistorico(caminho_historico, esquema_saida.names, caminho_entrada)
+
+            # Sem compressão para que a análise possa mapear o arquivo em memória.
+            # Os dicionários das categorias crescem em deltas de um bloco para o outro.
+            # O arquivo é gravado ao lado e só substitui o anterior no fim, para que
+            # quem já o estiver lendo (ex: o servidor_consultas.py) nunca veja um
+            # arquivo pela metade.
+            opcoes = ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            with ipc.new_file(caminho_temporario, esquema_saida, options=opcoes) as escritor:
+                marca = time.perf_counter()
+                for bloco in blocos:
+                    agora = time.perf_counter()
+                    tempos['leitura'] += agora - marca
+                    tabela = converter(bloco)
+                    if dicionario_pacientes is not None:
+                        tabela = acrescentar_id_paciente(tabela, dicionario_pacientes)
+                    marca, agora = agora, time.perf_counter()
+                    tempos['conversao'] += agora - marca
+                    escritor.write_table(tabela)
+                    if particionado is not None:
+                        particionado.escrever(tabela)
+                    marca, agora = agora, time.perf_counter()
+                    tempos['escrita_arrow'] += agora - marca
+                    if historico is not None:
+                        historico.escrever(tabela)
+                        marca, agora = agora, time.perf_counter()
+                        tempos['escrita_historico'] += agora - marca
+                    if planilha_consulta is not None:
+                        for linha in linhas_do_bloco(bloco):
+                            planilha_consulta.append([linha[i] for i in posicoes])
+                        tempos['escrita_xlsx'] += time.perf_counter() - agora
+                    total_registros += len(bloco)
+                    print(f"     {total_registros} registros processados...")
+                    marca = time.perf_counter()
+
+            # O histórico é confirmado antes: se a conferência dele falhar, o
+            # arquivo .arrow anterior também fica como estava.
+            if historico is not None:
+                gravador, historico = historico, None
+                marca = time.perf_counter()
+                resumo = gravador.fechar()
+                tempos['escrita_historico'] += time.perf_counter() - marca
+            os.replace(caminho_temporario, caminho_saida)
+            if particionado is not None:
+                particionado.fechar()
+                print(f"Cópia particionada por mês salva em: '{pasta_particionada}' "
+                      f"({len(particionado.escritores)} partições)")
+            if caminho_historico:
+                print(f"Histórico atualizado em '{caminho_historico}': {resumo['novas']} consulta(s) nova(s), "
+                      f"{resumo['atualizadas']} atualizada(s), {resumo['ignoradas']} sem paciente/procedimento/data.")
+            if dicionario_pacientes is not None:
+                print(f"{len(dicionario_pacientes.valores)} paciente(s) distinto(s); {dicionario_pacientes.unificadas} "
+                      "grafia(s) com acento, maiúsculas ou espaços diferentes unificada(s) com outro nome.")
+            print(f"Total de registros salvos: {total_registros}")
+            print("-" * 40)
+            print(f" SUCESSO! O arquivo limpo foi salvo na pasta '{pasta_saida}'!")
+            print("-" * 40)
+        except Exception as e:
+            if particionado is not None:
+                particionado.fechar(sucesso=False)
+            if historico is not None:
+                historico.fechar(sucesso=False)
+            if os.path.exists(caminho_temporario):
+                os.remove(caminho_temporario)
+            if isinstance(e, TiposIncompativeis):
+                alargar_tipos(tipos, e.colunas)
+                blocos = None
+                continue
+            print(f"[ERRO FATAL] Não foi possível salvar o arquivo de dados limpos. Erro: {e}")
+            return False
+        break
+
+    sucesso = True
+    if planilha_consulta is not None:
+        try:
+            print(f"Exportando também a planilha para consulta em: '{caminho_excel}'...")
+            marca = time.perf_counter()
+            livro_consulta.save(caminho_excel)
+            tempos['escrita_xlsx'] += time.perf_counter() - marca
+        except Exception as e:
+            print(f"[ERRO] Não foi possível salvar a planilha .xlsx de consulta. Erro: {e}")
+            sucesso = False
+
+    if caminho_metricas:
+        # Dentro do rodar_pipeline.py as métricas já estão ativas, com o mesmo identificador de execução.
+        ativar_metricas(caminho_metricas)
+        registrar('limpeza', arquivo=caminho_entrada, arquivos=len(entradas),
+                  duplicadas_removidas=duplicadas, linhas=total_registros,
+                  duracao_s=round(time.perf_counter() - inicio, 4),
+                  subtotais_s={nome: round(tempo, 4) for nome, tempo in tempos.items()})
+    return sucesso
 
 if __name__ == "__main__":
-    limpar_e_salvar_planilha_excel()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Limpa a exportação do Amplimed e grava o arquivo .arrow da análise.")
+    parser.add_argument('entrada', nargs='?', default=ARQUIVO_ENTRADA_EXCEL,
+                        help=f"Planilha exportada (padrão: {ARQUIVO_ENTRADA_EXCEL}), uma pasta com várias exportações "
+                             "ou um padrão entre aspas (ex: \"Amplimed*.xlsx\"), para limpar e unir todas.")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processos usados para ler várias exportações ao mesmo tempo (padrão: um por núcleo).")
+    parser.add_argument('--metricas', nargs='?', const=ARQUIVO_METRICAS, default=None, metavar='ARQUIVO',
+                        help=f"Grava o tempo de cada parte da limpeza em JSON lines (padrão: {ARQUIVO_METRICAS}).")
+    parser.add_argument('--profile', action='store_true',
+                        help="Perfila a limpeza com cProfile e salva o .prof na pasta de métricas.")
+    parser.add_argument('--historico', nargs='?', const=os.path.join(PASTA_SAIDA, ARQUIVO_HISTORICO), default=None,
+                        metavar='ARQUIVO',
+                        help=f"Acrescenta a exportação ao banco do histórico "
+                             f"(padrão: {os.path.join(PASTA_SAIDA, ARQUIVO_HISTORICO)}).")
+    args = parser.parse_args()
+
+    opcoes = dict(caminho_metricas=args.metricas, caminho_entrada=args.entrada,
+                  caminho_historico=args.historico, workers=args.workers)
+    perfil = iniciar_perfil() if args.profile else None
+    try:
+        sucesso = limpar_e_salvar_planilha_excel(**opcoes)
+    finally:
+        if perfil is not None:
+            encerrar_perfil(perfil)
+    sys.exit(0 if sucesso else 1)
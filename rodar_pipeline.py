@@ -0,0 +1,198 @@
+import argparse
+import os
+import sys
+
+# Entrada não interativa para rodar a limpeza e as análises de uma vez (ex: pelo
+# agendador de tarefas), sem o menu do 'analise_faltas_completas.py'. A base é
+# carregada e agregada uma única vez e compartilhada pelos kits e pelo consolidado.
+PASTA_PROJETO = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(PASTA_PROJETO, 'limpeza'))
+sys.path.insert(0, os.path.join(PASTA_PROJETO, 'analise'))
+
+import pandas as pd
+
+import limpador
+from configuracoes import ARQUIVO_ENTRADA_LIMPO, ARQUIVO_HISTORICO
+from analise_faltas_completas import (
+    carregar_base, agregar_base, procurar_duplicados, rodar_analise_individual, gerar_relatorio_geral_consolidado,
+)
+from analise_temporal import JANELA_PADRAO_DIAS, carregar_ultimos_dias, gerar_relatorio_temporal
+from historico import HistoricoConsultas
+from graficos import MODOS_GRAFICOS, DPI_PADRAO
+from exportacao_excel import MODOS_EXCEL
+from saidas import MODOS_SAIDA, ARQUIVO_PACOTE
+from painel_html import ARQUIVO_PAINEL
+from instrumentacao import ativar_metricas, iniciar_perfil, encerrar_perfil
+
+COMANDOS = ['limpar', 'individual', 'consolidado', 'temporal', 'todos']
+
+# Códigos de saída
+SAIDA_OK = 0
+SAIDA_ERRO = 1             # entrada não encontrada ou falha ao salvar
+SAIDA_FALHAS_PARCIAIS = 3  # análise concluída, mas o kit de algum paciente falhou
+
+
+def montar_parser():
+    parser = argparse.ArgumentParser(
+        description="Roda a limpeza e as análises de faltas sem o menu interativo.",
+        epilog=f"Códigos de saída: {SAIDA_OK} = sucesso, {SAIDA_ERRO} = erro, 2 = argumentos inválidos, "
+               f"{SAIDA_FALHAS_PARCIAIS} = algum kit individual falhou.",
+    )
+    parser.add_argument('comando', choices=COMANDOS,
+                        help="'limpar' gera o arquivo .arrow; 'individual' e 'consolidado' geram os relatórios; "
+                             "'temporal' gera as taxas de falta por período; "
+                             "'todos' faz a limpeza e os relatórios individual e consolidado, carregando a base uma vez só.")
+
+    caminhos = parser.add_argument_group("caminhos (padrão: as pastas do projeto)")
+    caminhos.add_argument('--pasta-base', default=PASTA_PROJETO,
+                          help="Pasta com 'limpeza/' e 'analise/'; as demais pastas são relativas a ela.")
+    caminhos.add_argument('--entrada', help=f"Exportação do Amplimed (padrão: limpeza/{limpador.ARQUIVO_ENTRADA_EXCEL}), "
+                                            "ou uma pasta/padrão com várias exportações para unir.")
+    caminhos.add_argument('--pasta-dados', help=f"Pasta do '{ARQUIVO_ENTRADA_LIMPO}' (padrão: analise/).")
+    caminhos.add_argument('--pasta-relatorios', help="Pasta dos relatórios (padrão: relatorios/).")
+    caminhos.add_argument('--pasta-graficos', help="Pasta dos gráficos (padrão: graficos/).")
+    caminhos.add_argument('--historico', nargs='?', const='', default=None, metavar='ARQUIVO',
+                          help=f"Usa o banco do histórico (padrão: analise/{ARQUIVO_HISTORICO}): 'limpar' acrescenta "
+                               "a exportação a ele e as análises leem o histórico acumulado em vez do .arrow.")
+
+    processos = parser.add_argument_group("processos (limpeza e análise individual)")
+    processos.add_argument('--workers', type=int, default=None,
+                           help="Processos em paralelo: na limpeza, para ler várias exportações ao mesmo tempo "
+                                "(padrão: um por núcleo); nos kits individuais (padrão: 1).")
+
+    kits = parser.add_argument_group("análise individual")
+    kits.add_argument('--incremental', action='store_true')
+    kits.add_argument('--graficos', choices=MODOS_GRAFICOS, default='png')
+    kits.add_argument('--dpi', type=int, default=DPI_PADRAO)
+    kits.add_argument('--excel', choices=MODOS_EXCEL, default='por_procedimento')
+    kits.add_argument('--saida', choices=MODOS_SAIDA, default='pastas',
+                      help=f"'zip' grava todos os kits num único '{ARQUIVO_PACOTE}' na pasta dos relatórios, "
+                           "com um índice paciente -> arquivos.")
+
+    consolidado = parser.add_argument_group("relatório consolidado")
+    consolidado.add_argument('--painel', action='store_true',
+                             help=f"Gera também o '{ARQUIVO_PAINEL}': tabelas ordenáveis e gráficos num único .html.")
+
+    temporal = parser.add_argument_group("análise temporal")
+    temporal.add_argument('--dias', type=int, help="Analisa só os últimos N dias (lê só os meses necessários).")
+    temporal.add_argument('--janela', type=int, default=JANELA_PADRAO_DIAS,
+                          help=f"Janela móvel em dias (padrão: {JANELA_PADRAO_DIAS}).")
+
+    diagnostico = parser.add_argument_group("diagnóstico")
+    diagnostico.add_argument('--metricas', nargs='?', const='', default=None, metavar='ARQUIVO',
+                             help="Grava as métricas das etapas em JSON lines (padrão: metricas/metricas.jsonl).")
+    diagnostico.add_argument('--profile', action='store_true',
+                             help="Perfila a execução com cProfile (arquivos .prof na pasta metricas/).")
+    return parser
+
+
+def executar(args, caminhos):
+    if args.comando in ('limpar', 'todos'):
+        if not limpador.limpar_e_salvar_planilha_excel(caminhos['metricas'], caminhos['entrada'],
+                                                       caminhos['dados'], caminhos['historico'],
+                                                       workers=args.workers):
+            return SAIDA_ERRO
+        if args.comando == 'limpar':
+            return SAIDA_OK
+
+    if caminhos['historico']:
+        try:
+            historico = HistoricoConsultas(caminhos['historico'])
+        except FileNotFoundError:
+            print(f"[ERRO] O histórico '{caminhos['historico']}' não foi encontrado. "
+                  "Rode o comando 'limpar' com --historico antes.")
+            return SAIDA_ERRO
+        with historico:
+            return executar_analises(args, caminhos, historico)
+    return executar_analises(args, caminhos)
+
+
+def executar_analises(args, caminhos, historico=None):
+    """
+    Roda as análises a partir do .arrow ou, com 'historico', do banco do
+    histórico: o consolidado é contado pelo SQLite e os demais comandos
+    carregam só as consultas de que precisam.
+    """
+    caminho_dados = os.path.join(caminhos['dados'], ARQUIVO_ENTRADA_LIMPO)
+    if historico is not None:
+        if args.comando == 'consolidado':
+            sucesso = gerar_relatorio_geral_consolidado(None, pasta_relatorios=caminhos['relatorios'],
+                                                        historico=historico, painel=args.painel)
+            return SAIDA_OK if sucesso else SAIDA_ERRO
+        inicio = (pd.Timestamp.now().normalize() - pd.Timedelta(days=args.dias - 1)
+                  if args.comando == 'temporal' and args.dias else None)
+        df = historico.carregar(inicio=inicio)
+        if args.comando == 'temporal':
+            descricao = f"últimos {args.dias} dias" if args.dias else 'todo o histórico'
+            return SAIDA_OK if gerar_relatorio_temporal(df, caminhos['relatorios'], args.janela, descricao) else SAIDA_ERRO
+        return executar_kits_e_consolidado(args, caminhos, df, historico)
+
+    if args.comando == 'temporal' and args.dias:
+        try:
+            df = carregar_ultimos_dias(args.dias, pasta_dados=caminhos['dados'])
+        except FileNotFoundError:
+            print(f"[ERRO] O arquivo '{caminho_dados}' não foi encontrado. Rode o comando 'limpar' antes.")
+            return SAIDA_ERRO
+        sucesso = gerar_relatorio_temporal(df, caminhos['relatorios'], args.janela, f"últimos {args.dias} dias")
+        return SAIDA_OK if sucesso else SAIDA_ERRO
+
+    try:
+        df = carregar_base(caminho_dados)
+    except FileNotFoundError:
+        print(f"[ERRO] O arquivo '{caminho_dados}' não foi encontrado. Rode o comando 'limpar' antes.")
+        return SAIDA_ERRO
+    if args.comando == 'temporal':
+        return SAIDA_OK if gerar_relatorio_temporal(df, caminhos['relatorios'], args.janela) else SAIDA_ERRO
+    return executar_kits_e_consolidado(args, caminhos, df)
+
+
+def executar_kits_e_consolidado(args, caminhos, df, historico=None):
+    indice = agregar_base(df)
+    # Os nomes parecidos são procurados uma vez para os kits e o consolidado.
+    duplicados = procurar_duplicados(indice.pacientes)
+
+    codigo = SAIDA_OK
+    if args.comando in ('individual', 'todos'):
+        falhas = rodar_analise_individual(
+            workers=args.workers or 1, incremental=args.incremental, modo_graficos=args.graficos, dpi=args.dpi,
+            modo_excel=args.excel, modo_saida=args.saida, df=df, indice=indice, duplicados=duplicados,
+            pasta_relatorios=caminhos['relatorios'], pasta_graficos=caminhos['graficos'],
+        )
+        if falhas:
+            codigo = SAIDA_FALHAS_PARCIAIS
+
+    if args.comando in ('consolidado', 'todos'):
+        if not gerar_relatorio_geral_consolidado(df, indice, pasta_relatorios=caminhos['relatorios'],
+                                                 historico=historico, duplicados=duplicados, painel=args.painel):
+            codigo = SAIDA_ERRO
+    return codigo
+
+
+def main(argv=None):
+    args = montar_parser().parse_args(argv)
+    base = args.pasta_base
+    pasta_metricas = os.path.join(base, 'metricas')
+    caminhos = {
+        'entrada': args.entrada or os.path.join(base, 'limpeza', limpador.ARQUIVO_ENTRADA_EXCEL),
+        'dados': args.pasta_dados or os.path.join(base, 'analise'),
+        'relatorios': args.pasta_relatorios or os.path.join(base, 'relatorios'),
+        'graficos': args.pasta_graficos or os.path.join(base, 'graficos'),
+        'metricas': None,
+        'historico': None,
+    }
+    if args.historico is not None:
+        caminhos['historico'] = args.historico or os.path.join(caminhos['dados'], ARQUIVO_HISTORICO)
+    if args.metricas is not None:
+        caminhos['metricas'] = args.metricas or os.path.join(pasta_metricas, 'metricas.jsonl')
+        ativar_metricas(caminhos['metricas'])
+
+    perfil = iniciar_perfil(pasta_metricas) if args.profile else None
+    try:
+        return executar(args, caminhos)
+    finally:
+        if perfil is not None:
+            encerrar_perfil(perfil)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'limpeza'))
+import limpador
+
+# Duas consultas no mesmo horário e procedimento, com profissionais diferentes,
+# e uma terceira sozinha: (paciente, procedimento, data, profissional, status).
+CONSULTAS = [
+    ('Ana Souza', 'Fisioterapia', datetime(2024, 3, 4, 9), 'Dra. Lima', 'Finalizado'),
+    ('Ana Souza', 'Fisioterapia', datetime(2024, 3, 4, 9), 'Dr. Reis', 'Ncompareceu'),
+    ('Bruno Dias', 'Psicologia', datetime(2024, 3, 5, 14), 'Dra. Lima', 'Cancelado'),
+]
+
+
+def salvar_exportacao(caminho, linhas, com_profissional):
+    livro = Workbook()
+    planilha = livro.active
+    planilha.append(['Paciente', 'Procedimento', 'Data e Hora agendada', 'Status']
+                    + ['Profissional'] * com_profissional)
+    for paciente, procedimento, data, profissional, status in linhas:
+        planilha.append([paciente, procedimento, data, status] + [profissional] * com_profissional)
+    livro.save(caminho)
+
+
+def importar(tmp_path, nome, linhas, com_profissional):
+    caminho = str(tmp_path / nome)
+    salvar_exportacao(caminho, linhas, com_profissional)
+    assert limpador.limpar_e_salvar_planilha_excel(
+        None, caminho, str(tmp_path / 'saida'), str(tmp_path / 'historico.sqlite'))
+
+
+def contar_por_status(tmp_path):
+    with sqlite3.connect(tmp_path / 'historico.sqlite') as conexao:
+        return dict(conexao.execute('SELECT "Status", COUNT(*) FROM consultas GROUP BY 1'))
+
+
+def test_exportacoes_com_e_sem_profissional_atualizam_as_mesmas_consultas(tmp_path):
+    importar(tmp_path, 'com_profissional.xlsx', CONSULTAS, com_profissional=True)
+    assert contar_por_status(tmp_path) == {'Finalizado': 1, 'Ncompareceu': 1, 'Cancelado': 1}
+
+    importar(tmp_path, 'sem_profissional.xlsx', CONSULTAS, com_profissional=False)
+    importar(tmp_path, 'com_profissional.xlsx', CONSULTAS, com_profissional=True)
+    assert contar_por_status(tmp_path) == {'Finalizado': 1, 'Ncompareceu': 1, 'Cancelado': 1}
+
+
+def test_ocorrencias_seguem_o_profissional_e_nao_a_ordem_da_planilha(tmp_path):
+    importar(tmp_path, 'a.xlsx', CONSULTAS, com_profissional=True)
+    importar(tmp_path, 'b.xlsx', CONSULTAS[::-1], com_profissional=True)
+
+    with sqlite3.connect(tmp_path / 'historico.sqlite') as conexao:
+        linhas = conexao.execute(
+            'SELECT "Profissional", "Status" FROM consultas WHERE "Paciente" = ? ORDER BY ocorrencia',
+            ('Ana Souza',)).fetchall()
+    assert linhas == [('Dr. Reis', 'Ncompareceu'), ('Dra. Lima', 'Finalizado')]
@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analise'))
+from manifesto import comparar_manifestos
+
+
+def manifesto(pacientes, colunas=('Paciente', 'Status'), **opcoes):
+    return {'colunas': list(colunas), 'saida': 'pastas', **opcoes,
+            'pacientes': {nome: {'hash': nome, 'procedimentos': {}} for nome in pacientes}}
+
+
+def test_pacientes_removidos_quando_as_colunas_mudam():
+    alteracoes, _, removidos = comparar_manifestos(
+        manifesto(['Ana', 'Bruno']), manifesto(['Ana'], colunas=('Paciente', 'Status', 'Profissional')))
+    assert alteracoes == {'Ana': None}
+    assert removidos == ['Bruno']
+
+
+def test_pacientes_removidos_quando_as_opcoes_mudam():
+    alteracoes, _, removidos = comparar_manifestos(
+        manifesto(['Ana', 'Bruno'], graficos='png'), manifesto(['Ana'], graficos='svg'))
+    assert alteracoes == {'Ana': None}
+    assert removidos == ['Bruno']
+
+
+def test_sem_manifesto_anterior_nada_e_removido():
+    assert comparar_manifestos(None, manifesto(['Ana'])) == ({'Ana': None}, {}, [])
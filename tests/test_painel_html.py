@@ -0,0 +1,21 @@
+import json
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analise'))
+from configuracoes import STATUS_CANCELADO, STATUS_FALTOU, STATUS_PRESENTE
+import painel_html
+
+
+def test_nomes_com_marcadores_do_modelo_ficam_como_estao(tmp_path):
+    nomes = ['__ITENS_POR_GRAFICO__', '__DADOS__']
+    resumo = pd.DataFrame({STATUS_FALTOU: [1, 0], STATUS_PRESENTE: [2, 3], STATUS_CANCELADO: [0, 1]}, index=nomes)
+    caminho = painel_html.salvar_painel_html(str(tmp_path / 'painel.html'), resumo, resumo, (5, 1, 1))
+
+    with open(caminho, encoding='utf-8') as f:
+        html = f.read()
+    assert f'const ITENS_POR_GRAFICO = {painel_html.ITENS_POR_GRAFICO};' in html
+    dados = html.split('<script type="application/json" id="dados">')[1].split('</script>')[0]
+    assert json.loads(dados)['pacientes']['nomes'] == nomes
@@ -0,0 +1,45 @@
+import os
+import sys
+from datetime import datetime
+
+import pyarrow as pa
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'limpeza'))
+import limpador
+
+# 'Valor' só tem números nas primeiras linhas; o texto aparece num bloco posterior.
+LINHAS = [('Ana Souza', 'Fisioterapia', datetime(2024, 3, 4, 9 + i), 'Finalizado', 100 + i) for i in range(4)]
+LINHAS.append(('Bruno Dias', 'Psicologia', datetime(2024, 3, 5, 14), 'Cancelado', 'isento'))
+
+
+def salvar_planilha(caminho):
+    livro = Workbook()
+    planilha = livro.active
+    planilha.append(['Paciente', 'Procedimento', 'Data e Hora agendada', 'Status', 'Valor'])
+    for linha in LINHAS:
+        planilha.append(list(linha))
+    livro.save(caminho)
+
+
+def test_coluna_com_texto_depois_do_primeiro_bloco_vira_texto_sem_perder_valores(tmp_path, monkeypatch):
+    monkeypatch.setattr(limpador.abrir_planilha_em_blocos, '__defaults__', (2,))
+    caminho = str(tmp_path / 'exportacao.xlsx')
+    salvar_planilha(caminho)
+
+    assert limpador.limpar_e_salvar_planilha_excel(None, caminho, str(tmp_path / 'saida'))
+
+    with pa.memory_map(str(tmp_path / 'saida' / limpador.ARQUIVO_SAIDA_ARROW)) as fonte:
+        tabela = pa.ipc.open_file(fonte).read_all()
+    assert tabela.schema.field('Valor').type == pa.string()
+    assert tabela.column('Valor').to_pylist() == ['100', '101', '102', '103', 'isento']
+
+
+def test_leitura_em_paralelo_tambem_alarga_a_coluna(tmp_path, monkeypatch):
+    monkeypatch.setattr(limpador.abrir_planilha_em_blocos, '__defaults__', (2,))
+    caminho = str(tmp_path / 'exportacao.xlsx')
+    salvar_planilha(caminho)
+
+    _, tabela, alargadas = limpador.ler_planilha_como_tabela(caminho)
+    assert alargadas == ['Valor']
+    assert tabela.column('Valor').to_pylist() == ['100', '101', '102', '103', 'isento']
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pyarrow.ipc as ipc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from test_historico import CONSULTAS, salvar_exportacao
+import limpador
+
+
+def limpar_pasta(tmp_path, formatos):
+    """Limpa juntas as exportações com ou sem Profissional (uma por item de 'formatos', na ordem)."""
+    pasta = tmp_path / 'exportacoes'
+    pasta.mkdir()
+    for i, com_profissional in enumerate(formatos):
+        salvar_exportacao(str(pasta / f'{i}.xlsx'), CONSULTAS[::-1] if i % 2 else CONSULTAS, com_profissional)
+    assert limpador.limpar_e_salvar_planilha_excel(None, str(pasta), str(tmp_path / 'saida'), workers=1)
+    with ipc.open_file(str(tmp_path / 'saida' / limpador.ARQUIVO_SAIDA_ARROW)) as leitor:
+        return leitor.read_all()
+
+
+def test_exportacao_sem_profissional_substitui_a_com_profissional(tmp_path):
+    tabela = limpar_pasta(tmp_path, [True, False])
+    assert tabela.num_rows == len(CONSULTAS)
+
+
+def test_exportacao_com_profissional_substitui_a_sem_profissional(tmp_path):
+    tabela = limpar_pasta(tmp_path, [False, True])
+    assert tabela.num_rows == len(CONSULTAS)
+    assert sorted(tabela.column('Profissional').to_pylist()) == sorted(c[3] for c in CONSULTAS)